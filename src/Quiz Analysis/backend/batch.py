@@ -0,0 +1,261 @@
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from cache import DEFAULT_CACHE_DIR, DEFAULT_TTL, cached_fetcher
+
+# Populated once per worker process by _init_worker
+_pipeline = None
+_storage = None
+_cube = None
+_profiling = None
+_fetcher = None
+
+def load_manifest(manifest_path):
+    # A manifest is either a JSON list or a CSV file with one student per row:
+    # student_id, quiz_endpoint, historical (URLs or local file paths)
+    if manifest_path.endswith('.csv'):
+        with open(manifest_path, newline='') as f:
+            return list(csv.DictReader(f))
+    with open(manifest_path) as f:
+        return json.load(f)
+
+def is_url(source):
+    return source.startswith(('http://', 'https://'))
+
+def load_payloads(sources):
+    # URLs are fetched concurrently through the worker's pooled fetcher, paths are read from disk
+    payloads, errors = _fetcher.fetch_many([s for s in sources if is_url(s)])
+    if errors:
+        raise next(iter(errors.values()))
+    for source in sources:
+        if not is_url(source):
+            with open(source) as f:
+                payloads[source] = json.load(f)
+    return [payloads[source] for source in sources]
+
+def _init_worker(fetch_options):
+    # Import the heavy libraries once per worker and reuse them for every student
+    global _pipeline, _storage, _cube, _profiling, _fetcher
+    import matplotlib
+    matplotlib.use('Agg')
+    import cube
+    import pipeline
+    import profiling
+    import storage
+    _pipeline = pipeline
+    _storage = storage
+    _cube = cube
+    _profiling = profiling
+    _fetcher = cached_fetcher(max_concurrency=4, **fetch_options)
+
+def merge_submissions(historical_quiz_data, submissions):
+    # Submissions pushed to the service ahead of the upstream history; ids already present win
+    known = {submission['id'] for submission in historical_quiz_data}
+    return historical_quiz_data + [s for s in submissions if s['id'] not in known]
+
+def run_student(entry, student_dir, options, profiler=None):
+    # entry may carry extra 'submissions' that are not in its historical source yet
+    from rolling import DEFAULT_WINDOWS
+    from rules import load_rules
+    student_id = str(entry['student_id'])
+    submissions = entry.get('submissions') or []
+    profiler = profiler or _profiling.NULL_PROFILER
+    windows = options.get('windows') or DEFAULT_WINDOWS
+    rules = load_rules(options.get('rules_path'))
+    cohort_options = {}
+    if options.get('cube_path'):
+        cohort_options = {'cube': _cube.cached_cube(options['cube_path']),
+                          'cohort': str(entry.get('cohort') or _cube.ALL_COHORTS)}
+    if options.get('state_dir'):
+        with profiler.stage('load'):
+            historical_quiz_data, = load_payloads([entry['historical']])
+        outputs = _pipeline.run_incremental_pipeline(merge_submissions(historical_quiz_data, submissions),
+                                                     os.path.join(options['state_dir'], f"{student_id}.json"),
+                                                     output_dir=student_dir, check=options.get('check', False),
+                                                     profiler=profiler, windows=windows, rules=rules, **cohort_options)
+        upstream_ids = {submission['id'] for submission in historical_quiz_data} if submissions else set()
+    elif options.get('store_dir'):
+        with profiler.stage('load'):
+            current_quiz_endpoint_data, = load_payloads([entry['quiz_endpoint']])
+            historical_quiz_df = _storage.load_student_history(options['store_dir'], student_id)
+            upstream_ids = set(historical_quiz_df['submission_id']) if submissions else set()
+            if submissions:
+                historical_quiz_df = _storage.append_submissions(historical_quiz_df, submissions)
+        outputs = _pipeline.run_pipeline(current_quiz_endpoint_data, None, output_dir=student_dir,
+                                         render_charts=options.get('render_charts', True), verbose=False,
+                                         historical_quiz_df=historical_quiz_df, chart_workers=1,
+                                         chart_data_only=options.get('chart_data_only', False), profiler=profiler,
+                                         windows=windows, rules=rules, **cohort_options)
+    else:
+        with profiler.stage('load'):
+            current_quiz_endpoint_data, historical_quiz_data = load_payloads(
+                [entry['quiz_endpoint'], entry['historical']])
+        outputs = _pipeline.run_pipeline(current_quiz_endpoint_data,
+                                         merge_submissions(historical_quiz_data, submissions),
+                                         output_dir=student_dir, render_charts=options.get('render_charts', True),
+                                         verbose=False, chart_workers=1,
+                                         chart_data_only=options.get('chart_data_only', False), profiler=profiler,
+                                         windows=windows, rules=rules, **cohort_options)
+        upstream_ids = {submission['id'] for submission in historical_quiz_data} if submissions else set()
+    # Extra submissions the source has caught up with; the service stops carrying them
+    outputs['upstream_submission_ids'] = [s['id'] for s in submissions if s['id'] in upstream_ids]
+    return outputs
+
+def write_topic_stats(path, topic_stats):
+    from viz_export import write_json
+    write_json(path, topic_stats.reset_index().astype({'quiz_topic': str}).to_dict('records'))
+
+def analyze_student(entry, output_root, options):
+    # options['profile'] returns per-stage timings with the result; options['profile_dumps']
+    # also writes cProfile/tracemalloc dumps into the student's directory, and
+    # options['topic_stats'] writes topic_stats.json next to viz_data.json (see shard.py)
+    student_id = str(entry['student_id'])
+    student_dir = os.path.join(output_root, student_id)
+    profiler = None
+    if options.get('profile') or options.get('profile_dumps'):
+        dumps = options.get('profile_dumps', False)
+        profiler = _profiling.Profiler(trace_memory=dumps, cprofile=dumps)
+    started = time.perf_counter()
+    try:
+        with (profiler or _profiling.NULL_PROFILER).student(student_id):
+            outputs = run_student(entry, student_dir, options, profiler)
+        if options.get('topic_stats') and 'topic_stats' in outputs:
+            write_topic_stats(os.path.join(student_dir, 'topic_stats.json'), outputs['topic_stats'])
+        result = {'student_id': student_id, 'ok': True, 'seconds': time.perf_counter() - started}
+    except Exception as e:
+        result = {'student_id': student_id, 'ok': False, 'seconds': time.perf_counter() - started,
+                  'error': f"{type(e).__name__}: {e}"}
+    if profiler:
+        result['stages'] = profiler.records
+        if options.get('profile_dumps'):
+            profiler.dump_profiles(os.path.join(student_dir, 'profile'))
+    return result
+
+def _analyze_student_star(args):
+    return analyze_student(*args)
+
+def run_batch(manifest, output_root, workers=None, chunksize=8, progress_every=1000, fetch_options=None,
+              analysis_options=None, on_result=None):
+    # analysis_options: render_charts, chart_data_only, state_dir + check (incremental mode),
+    # store_dir (Parquet store). Students already run in parallel, so charts render serially.
+    # on_result is called with each student's result as it comes back (shard.py checkpoints them).
+    os.makedirs(output_root, exist_ok=True)
+    started = time.perf_counter()
+    results = []
+    tasks = ((entry, output_root, analysis_options or {}) for entry in manifest)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(fetch_options or {},)) as executor:
+        for result in executor.map(_analyze_student_star, tasks, chunksize=chunksize):
+            results.append(result)
+            if on_result:
+                on_result(result)
+            if progress_every and len(results) % progress_every == 0:
+                elapsed = time.perf_counter() - started
+                print(f"• {len(results)} students processed ({len(results) / elapsed:.1f} students/sec)")
+
+    elapsed = time.perf_counter() - started
+    stage_records = [record for r in results for record in r.pop('stages', [])]
+    failures = [r for r in results if not r['ok']]
+    report = {
+        'students': len(results),
+        'succeeded': len(results) - len(failures),
+        'failed': len(failures),
+        'elapsed_seconds': round(elapsed, 3),
+        'students_per_second': round(len(results) / elapsed, 3) if elapsed > 0 else 0.0,
+        'failures': failures
+    }
+    if stage_records:
+        # Per-student records go to their own file; the report and metrics carry per-stage totals
+        from profiling import merge_records
+        profiler = merge_records(stage_records)
+        report['stages'] = profiler.summary()
+        profiler.write_json(os.path.join(output_root, 'batch_profile.json'))
+        profiler.write_prometheus(os.path.join(output_root, 'batch_metrics.prom'))
+    with open(os.path.join(output_root, 'batch_report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+def add_run_arguments(parser):
+    # Worker, fetch and analysis options shared by batch.py and shard.py
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--chunksize', type=int, default=8, help="Students handed to a worker at a time")
+    parser.add_argument('--no-charts', action='store_true', help="Skip PNG rendering, only export viz_data.json")
+    parser.add_argument('--chart-data-only', action='store_true',
+                        help="Write chart_data.json for the dashboard instead of rendering PNGs")
+    parser.add_argument('--fixtures', help="Serve manifest URLs from a local directory of <id>.json files")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="Local payload cache directory")
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_TTL, help="Seconds before cached payloads are revalidated")
+    network = parser.add_mutually_exclusive_group()
+    network.add_argument('--no-cache', action='store_true', help="Always fetch from the network")
+    network.add_argument('--offline', action='store_true', help="Run purely from the local cache")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only fold in submissions newer than each student's stored state (no charts)")
+    parser.add_argument('--state-dir', default='output/state', help="Per-student incremental state directory")
+    parser.add_argument('--check', action='store_true',
+                        help="With --incremental, verify results against a full recompute")
+    parser.add_argument('--store', help="Read histories from this Parquet store (see storage.py) instead of JSON")
+    parser.add_argument('--profile', action='store_true',
+                        help="Record per-stage time and memory (batch_profile.json, batch_metrics.prom)")
+    parser.add_argument('--profile-dumps', action='store_true',
+                        help="Also write cProfile and tracemalloc dumps into each student's directory")
+    parser.add_argument('--windows', nargs='+',
+                        help="Rolling/trend windows: attempt counts or durations (default: 3 7D 30D)")
+    parser.add_argument('--rules', help="Rules file for personas, labels and recommendations (default: rules.json)")
+    parser.add_argument('--cube', help="Cohort cube from cube.py; adds per-topic cohort percentiles (manifest "
+                                       "'cohort' picks the cohort)")
+
+def run_options(args):
+    # (fetch_options, analysis_options) for run_batch from add_run_arguments' options
+    fetch_options = {
+        'fixtures_dir': args.fixtures,
+        'cache_dir': None if args.no_cache else args.cache_dir,
+        'ttl': args.cache_ttl,
+        'offline': args.offline
+    }
+    analysis_options = {
+        'render_charts': not args.no_charts,
+        'chart_data_only': args.chart_data_only,
+        'state_dir': args.state_dir if args.incremental else None,
+        'check': args.check,
+        'store_dir': args.store,
+        'profile': args.profile,
+        'profile_dumps': args.profile_dumps,
+        'windows': args.windows,
+        'rules_path': args.rules,
+        'cube_path': args.cube
+    }
+    return fetch_options, analysis_options
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the quiz analysis pipeline for a cohort of students")
+    parser.add_argument('manifest', help="JSON or CSV manifest with student_id, quiz_endpoint and historical")
+    parser.add_argument('--output-dir', default='output/students', help="Root directory for per-student outputs")
+    add_run_arguments(parser)
+    args = parser.parse_args()
+
+    fetch_options, analysis_options = run_options(args)
+    report = run_batch(load_manifest(args.manifest), args.output_dir, workers=args.workers, chunksize=args.chunksize,
+                       fetch_options=fetch_options, analysis_options=analysis_options)
+
+    print("\n" + "="*50)
+    print("            COHORT BATCH RUN SUMMARY            ")
+    print("="*50)
+    print(f"• Students: {report['students']}")
+    print(f"• Succeeded: {report['succeeded']}")
+    print(f"• Failed: {report['failed']}")
+    print(f"• Elapsed: {report['elapsed_seconds']:.1f}s")
+    print(f"• Throughput: {report['students_per_second']:.2f} students/sec")
+    for failure in report['failures'][:10]:
+        print(f"  - {failure['student_id']}: {failure['error']}")
+    print("="*50 + "\n")
+    if 'stages' in report:
+        from profiling import print_summary
+        print_summary(report['stages'])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import math
+import time
+
+from cohort import cohort_insights
+from synthetic import generate_cohort_frame
+from utils import add_rolling_metrics, analyze_and_recommend, calculate_topic_stats
+
+def per_student_insights(cohort_df):
+    results = {}
+    for student_id, student_df in cohort_df.groupby('student_id', sort=False):
+        student_df = add_rolling_metrics(student_df.sort_values('submitted_at').reset_index(drop=True))
+        topic_stats = calculate_topic_stats(student_df)
+        results[student_id] = analyze_and_recommend(student_df, topic_stats)
+    return results
+
+def same_output(left, right):
+    if isinstance(left, dict):
+        return left.keys() == right.keys() and all(same_output(left[k], right[k]) for k in left)
+    if isinstance(left, (list, tuple)):
+        return len(left) == len(right) and all(same_output(a, b) for a, b in zip(left, right))
+    if isinstance(left, float):
+        return left == right or (math.isnan(left) and math.isnan(right))
+    return left == right
+
+def run(students, attempts, topics, sample):
+    cohort_df = generate_cohort_frame(students, attempts_per_student=attempts, topics=topics)
+
+    started = time.perf_counter()
+    cohort_results = cohort_insights(cohort_df)
+    cohort_seconds = time.perf_counter() - started
+
+    # The scalar path is timed on a sample and extrapolated; at 100k students a full loop takes minutes
+    sample_ids = cohort_df['student_id'].drop_duplicates().iloc[:sample]
+    sample_df = cohort_df[cohort_df['student_id'].isin(sample_ids)]
+    started = time.perf_counter()
+    scalar_results = per_student_insights(sample_df)
+    scalar_seconds = (time.perf_counter() - started) * students / len(sample_ids)
+
+    mismatches = [s for s in scalar_results if not same_output(scalar_results[s], cohort_results[s])]
+    print(f"{students:>8} students | {len(cohort_df):>9} attempts | per-student ~{scalar_seconds:8.2f}s "
+          f"| cohort {cohort_seconds:6.2f}s | speedup {scalar_seconds / cohort_seconds:6.1f}x "
+          f"| {len(mismatches)} mismatches in {len(sample_ids)} checked")
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cohort insight engine against per-student analysis")
+    parser.add_argument('--students', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--attempts', type=int, default=10, help="Mean attempts per student")
+    parser.add_argument('--topics', type=int, default=8)
+    parser.add_argument('--sample', type=int, default=1000, help="Students timed on the per-student path")
+    args = parser.parse_args()
+
+    failed = False
+    for students in args.students:
+        failed |= bool(run(students, args.attempts, args.topics, min(args.sample, students)))
+    if failed:
+        raise SystemExit("cohort results differ from per-student results")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark import find_regressions, git_revision, load_history
+from synthetic import generate_historical_payload
+
+DEFAULT_HISTORY = 'output/benchmarks/startup.jsonl'
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+# Modules whose import dominates cold start; each scenario reports which of them it loaded
+HEAVY_MODULES = ['pandas', 'matplotlib', 'seaborn', 'requests']
+
+def scenarios(history_path, output_dir):
+    # name -> interpreter arguments, each run in a fresh process from the backend directory
+    cli = ['cli.py', history_path, '--output-dir', output_dir, '--stages']
+    return {
+        'interpreter': ['-c', 'pass'],
+        'import_utils': ['-c', 'import utils'],
+        'import_main': ['-c', 'import main'],
+        'cli_help': ['cli.py', '--help'],
+        'cli_insights': cli + ['insights'],
+        'cli_viz': cli + ['insights', 'viz'],
+        'cli_charts': cli + ['charts']
+    }
+
+def time_scenario(arguments, repeat, output_dir):
+    # Outputs are cleared before every run so chart fingerprints never skip the rendering
+    totals = []
+    for _ in range(repeat):
+        shutil.rmtree(output_dir, ignore_errors=True)
+        started = time.perf_counter()
+        subprocess.run([sys.executable] + arguments, cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL)
+        totals.append(time.perf_counter() - started)
+    return totals
+
+def loaded_modules(arguments, output_dir):
+    # Heavy top-level packages imported by the scenario, from -X importtime
+    shutil.rmtree(output_dir, ignore_errors=True)
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + arguments, cwd=BACKEND_DIR, check=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    names = {line.rsplit('|', 1)[-1].strip() for line in result.stderr.splitlines() if line.startswith('import time:')}
+    return [module for module in HEAVY_MODULES if module in names]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold start of the CLI entry points in fresh processes")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per scenario; the median is compared")
+    parser.add_argument('--attempts', type=int, default=20, help="Attempts in the synthetic student history")
+    parser.add_argument('--only', nargs='+', help="Run only these scenarios")
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help="JSONL file runs are appended to and compared with")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Relative slowdown flagged as a regression")
+    parser.add_argument('--no-save', action='store_true', help="Compare against history without appending this run")
+    parser.add_argument('--fail-on-regression', action='store_true', help="Exit non-zero when a regression is flagged")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        history_path = os.path.join(scratch_dir, 'historical.json')
+        with open(history_path, 'w') as f:
+            json.dump(generate_historical_payload('s000001', attempts=args.attempts), f)
+        output_dir = os.path.join(scratch_dir, 'output')
+        for name, arguments in scenarios(history_path, output_dir).items():
+            if args.only and name not in args.only:
+                continue
+            totals = time_scenario(arguments, args.repeat, output_dir)
+            results[name] = {
+                'calls': 1,
+                'median_seconds': statistics.median(totals),
+                'best_seconds': min(totals),
+                'per_call_ms': statistics.median(totals) * 1000,
+                'modules': loaded_modules(arguments, output_dir)
+            }
+
+    params = {'attempts': args.attempts}
+    baseline = {}
+    for run in load_history(args.history):
+        if run['params'] == params and run['python'] == platform.python_version():
+            for name, result in run['results'].items():
+                baseline[name] = dict(result, timestamp=run['timestamp'], revision=run.get('revision'))
+    regressions = find_regressions(results, baseline, args.threshold)
+
+    print("\n" + "="*50)
+    print("             STARTUP BENCHMARK RESULTS             ")
+    print("="*50)
+    for name, result in results.items():
+        previous = baseline.get(name)
+        change = (f" ({result['per_call_ms'] / previous['per_call_ms'] - 1:+.1%} vs "
+                  f"{previous['revision'] or previous['timestamp']})") if previous else ""
+        print(f"• {name:<14} {result['per_call_ms']:8.0f} ms  [{', '.join(result['modules']) or 'stdlib only'}]{change}")
+    for regression in regressions:
+        print(f"  ! REGRESSION {regression['function']}: {regression['previous_ms']:.0f} -> "
+              f"{regression['current_ms']:.0f} ms ({regression['change']:+.1%})")
+    print("="*50 + "\n")
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(args.history) or '.', exist_ok=True)
+        with open(args.history, 'a') as f:
+            f.write(json.dumps({
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'params': params,
+                'repeat': args.repeat,
+                'results': results,
+                'regressions': regressions
+            }) + '\n')
+    if regressions and args.fail_on_regression:
+        raise SystemExit(f"{len(regressions)} startup regression(s) above {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import pandas as pd
+
+import utils
+from synthetic import generate_quiz_payload, generate_student_payloads
+
+DEFAULT_HISTORY = 'output/benchmarks/history.jsonl'
+
+# Functions timed per run, in pipeline order
+BENCHMARKS = [
+    'process_current_quiz_data',
+    'create_expanded_options',
+    'process_historical_quiz_data',
+    'clean_historical_quiz_data',
+    'add_rolling_metrics',
+    'calculate_topic_stats',
+    'analyze_and_recommend',
+    'prepare_visualization_data',
+    'create_visualizations'
+]
+
+def prepare_inputs(quiz_payload, student_payloads):
+    # Builds every function's arguments up front so each benchmark times only its own function
+    current_quiz_df = utils.process_current_quiz_data(quiz_payload)
+    students = []
+    for student_id, historical_quiz_data in student_payloads:
+        processed_df = utils.process_historical_quiz_data(historical_quiz_data)
+        cleaned_df = utils.clean_historical_quiz_data(processed_df.copy())
+        rolling_df = utils.add_rolling_metrics(cleaned_df.copy())
+        topic_stats = utils.calculate_topic_stats(rolling_df)
+        insights, recommendations, persona, performance_labels = utils.analyze_and_recommend(rolling_df, topic_stats)
+        students.append({
+            'student_id': student_id,
+            'historical_quiz_data': historical_quiz_data,
+            'processed_df': processed_df,
+            'cleaned_df': cleaned_df,
+            'rolling_df': rolling_df,
+            'topic_stats': topic_stats,
+            'insights': insights,
+            'recommendations': recommendations,
+            'persona': persona,
+            'performance_labels': performance_labels
+        })
+    return current_quiz_df, students
+
+def benchmark_calls(name, quiz_payload, current_quiz_df, students, scratch_dir):
+    # One zero-argument call per student; frames are copied because add_rolling_metrics and
+    # clean_historical_quiz_data modify their input in place
+    calls = []
+    for s in students:
+        if name == 'process_current_quiz_data':
+            calls.append(lambda: utils.process_current_quiz_data(quiz_payload))
+        elif name == 'create_expanded_options':
+            calls.append(lambda: utils.create_expanded_options(current_quiz_df))
+        elif name == 'process_historical_quiz_data':
+            calls.append(lambda s=s: utils.process_historical_quiz_data(s['historical_quiz_data']))
+        elif name == 'clean_historical_quiz_data':
+            calls.append(lambda s=s: utils.clean_historical_quiz_data(s['processed_df'].copy()))
+        elif name == 'add_rolling_metrics':
+            calls.append(lambda s=s: utils.add_rolling_metrics(s['cleaned_df'].copy()))
+        elif name == 'calculate_topic_stats':
+            calls.append(lambda s=s: utils.calculate_topic_stats(s['rolling_df']))
+        elif name == 'analyze_and_recommend':
+            calls.append(lambda s=s: utils.analyze_and_recommend(s['rolling_df'], s['topic_stats']))
+        elif name == 'prepare_visualization_data':
+            path = os.path.join(scratch_dir, 'viz', f"{s['student_id']}.json")
+            calls.append(lambda s=s, path=path: utils.prepare_visualization_data(
+                s['rolling_df'], s['insights'], s['topic_stats'], s['recommendations'], s['persona'],
+                s['performance_labels'], output_path=path))
+        elif name == 'create_visualizations':
+            calls.append(lambda s=s: utils.create_visualizations(
+                s['rolling_df'], s['topic_stats'], s['insights'],
+                output_dir=tempfile.mkdtemp(dir=scratch_dir), verbose=False, workers=1))
+    return calls
+
+def time_calls(calls, repeat):
+    # Total seconds for all calls, once per repetition
+    totals = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for call in calls:
+            call()
+        totals.append(time.perf_counter() - started)
+    return totals
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(params, repeat=3, chart_students=1, only=None):
+    quiz_payload = generate_quiz_payload(questions=params['questions'], topics=params['topics'],
+                                         options_per_question=params['options'], seed=params['seed'])
+    student_payloads = generate_student_payloads(params['students'], attempts_per_student=params['attempts'],
+                                                 topics=params['topics'], questions_per_quiz=params['questions'],
+                                                 options_per_question=params['options'], seed=params['seed'])
+    current_quiz_df, students = prepare_inputs(quiz_payload, student_payloads)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        for name in only or BENCHMARKS:
+            # Charts take seconds per student, so they run on a small sample
+            sample = students[:chart_students] if name == 'create_visualizations' else students
+            if not sample:
+                continue
+            totals = time_calls(benchmark_calls(name, quiz_payload, current_quiz_df, sample, scratch_dir), repeat)
+            results[name] = {
+                'calls': len(sample),
+                'median_seconds': statistics.median(totals),
+                'best_seconds': min(totals),
+                'per_call_ms': statistics.median(totals) / len(sample) * 1000
+            }
+    return results
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def baseline_results(history, params):
+    # Latest result per function among earlier runs with the same workload (runs made with
+    # --only still count for the functions they timed)
+    baseline = {}
+    for run in history:
+        if run['params'] == params:
+            for name, result in run['results'].items():
+                baseline[name] = dict(result, timestamp=run['timestamp'], revision=run.get('revision'))
+    return baseline
+
+def find_regressions(results, baseline, threshold=0.2, min_ms=0.05):
+    # Flags functions whose median per-call time grew by more than threshold versus the
+    # baseline; calls under min_ms are too noisy to compare
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or max(current['per_call_ms'], previous['per_call_ms']) < min_ms:
+            continue
+        change = current['per_call_ms'] / previous['per_call_ms'] - 1
+        if change > threshold:
+            regressions.append({'function': name, 'previous_ms': previous['per_call_ms'],
+                                'current_ms': current['per_call_ms'], 'change': change})
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the utils.py pipeline functions on synthetic quiz data")
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--attempts', type=int, default=10, help="Mean attempts per student")
+    parser.add_argument('--topics', type=int, default=8)
+    parser.add_argument('--questions', type=int, default=10, help="Questions per quiz")
+    parser.add_argument('--options', type=int, default=4, help="Options per question")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3, help="Repetitions; the median is compared")
+    parser.add_argument('--chart-students', type=int, default=1, help="Students timed on create_visualizations")
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, help="Benchmark only these functions")
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help="JSONL file runs are appended to and compared with")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Relative slowdown flagged as a regression")
+    parser.add_argument('--no-save', action='store_true', help="Compare against history without appending this run")
+    parser.add_argument('--fail-on-regression', action='store_true', help="Exit non-zero when a regression is flagged")
+    args = parser.parse_args()
+
+    params = {name: getattr(args, name) for name in ['students', 'attempts', 'topics', 'questions', 'options', 'seed']}
+    results = run_benchmarks(params, repeat=args.repeat, chart_students=args.chart_students, only=args.only)
+    run = {
+        'timestamp': pd.Timestamp.now(tz='UTC').isoformat(),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'params': params,
+        'repeat': args.repeat,
+        'results': results
+    }
+
+    # Only runs with the same workload are comparable
+    baseline = baseline_results(load_history(args.history), params)
+    regressions = find_regressions(results, baseline, args.threshold)
+
+    print("\n" + "="*50)
+    print("              UTILS BENCHMARK RESULTS              ")
+    print("="*50)
+    print(f"• Workload: {params}")
+    for name, result in results.items():
+        previous = baseline.get(name)
+        change = (f" ({result['per_call_ms'] / previous['per_call_ms'] - 1:+.1%} vs "
+                  f"{previous['revision'] or previous['timestamp']})") if previous else ""
+        print(f"• {name:<30} {result['per_call_ms']:10.3f} ms/call x {result['calls']}{change}")
+    for regression in regressions:
+        print(f"  ! REGRESSION {regression['function']}: {regression['previous_ms']:.3f} -> "
+              f"{regression['current_ms']:.3f} ms/call ({regression['change']:+.1%})")
+    print("="*50 + "\n")
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(args.history) or '.', exist_ok=True)
+        with open(args.history, 'a') as f:
+            f.write(json.dumps(dict(run, regressions=regressions)) + '\n')
+    if regressions and args.fail_on_regression:
+        raise SystemExit(f"{len(regressions)} benchmark regression(s) above {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
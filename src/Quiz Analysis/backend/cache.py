@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import time
+
+import requests
+
+from fetch import Fetcher, FetchResponse, FixtureTransport
+from viz_export import temp_file
+
+DEFAULT_CACHE_DIR = '.cache/quiz_payloads'
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# store() prunes down to this fraction of max_bytes, so the next few stores don't prune again
+PRUNE_TARGET = 0.9
+# Unreferenced blobs younger than this are left alone: another process may have written the
+# blob and not yet its entry
+ORPHAN_GRACE = 60
+
+def _remove(path):
+    # Concurrent prunes may race to delete the same file
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+def _atomic_write(path, data):
+    fd, tmp_path = temp_file(os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+class PayloadCache:
+    # Bodies are stored once per content hash under blobs/, and each URL gets a small
+    # metadata file under entries/ so concurrent batch workers never share a mutable index
+    def __init__(self, directory=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.blobs_dir = os.path.join(directory, 'blobs')
+        self.entries_dir = os.path.join(directory, 'entries')
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        os.makedirs(self.entries_dir, exist_ok=True)
+        self.size = None  # bytes of blobs on disk, read on the first store and tracked from there
+
+    def _entry_path(self, url):
+        return os.path.join(self.entries_dir, hashlib.sha256(url.encode()).hexdigest() + '.json')
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blobs_dir, digest + '.json')
+
+    def lookup(self, url):
+        # Returns (entry, body) or None when the URL is not cached or its blob is gone
+        try:
+            with open(self._entry_path(url)) as f:
+                entry = json.load(f)
+            with open(self._blob_path(entry['digest']), 'rb') as f:
+                body = f.read()
+        except (OSError, ValueError, KeyError):
+            return None
+        return entry, body
+
+    def is_fresh(self, entry, now=None):
+        return ((now or time.time()) - entry['stored_at']) < self.ttl
+
+    def _write_entry(self, url, entry):
+        _atomic_write(self._entry_path(url), json.dumps(entry).encode())
+
+    def store(self, url, body, headers):
+        digest = hashlib.sha256(body).hexdigest()
+        blob_path = self._blob_path(digest)
+        new_blob = not os.path.exists(blob_path)
+        if new_blob:
+            _atomic_write(blob_path, body)
+        now = time.time()
+        entry = {
+            'url': url,
+            'digest': digest,
+            'size': len(body),
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'stored_at': now,
+            'accessed_at': now
+        }
+        self._write_entry(url, entry)
+        if new_blob:
+            self._enforce_limit(len(body))
+        return entry
+
+    def _blobs_size(self):
+        size = 0
+        for item in os.scandir(self.blobs_dir):
+            if item.name.endswith('.json'):
+                try:
+                    size += item.stat().st_size
+                except FileNotFoundError:
+                    continue
+        return size
+
+    def _enforce_limit(self, added):
+        # Every process writing to the cache (batch workers, the service, main.py) bounds it here.
+        # Blobs other processes add since our last look are only seen at the next prune, which
+        # re-reads the real total, so the bound can be overshot by what they stored meanwhile.
+        self.size = self._blobs_size() if self.size is None else self.size + added
+        if self.size > self.max_bytes:
+            self.size = self.prune(int(self.max_bytes * PRUNE_TARGET))
+
+    def touch(self, url, entry, revalidated=False):
+        entry['accessed_at'] = time.time()
+        if revalidated:
+            entry['stored_at'] = entry['accessed_at']
+        self._write_entry(url, entry)
+
+    def expire(self, url):
+        # Forces the next fetch of url to revalidate, without discarding the body for 304s
+        cached = self.lookup(url)
+        if cached is not None:
+            entry, _ = cached
+            entry['stored_at'] = 0
+            self._write_entry(url, entry)
+
+    def prune(self, max_bytes=None):
+        # Evict least recently used entries until the unique blobs they reference fit
+        # within max_bytes, then delete blobs no entry points at any more
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = []
+        for name in os.listdir(self.entries_dir):
+            path = os.path.join(self.entries_dir, name)
+            try:
+                with open(path) as f:
+                    entries.append((path, json.load(f)))
+            except (OSError, ValueError):
+                continue
+
+        entries.sort(key=lambda item: item[1]['accessed_at'], reverse=True)
+        kept_digests, total = set(), 0
+        for path, entry in entries:
+            if entry['digest'] in kept_digests:
+                continue
+            if total + entry['size'] <= max_bytes:
+                kept_digests.add(entry['digest'])
+                total += entry['size']
+            else:
+                _remove(path)
+
+        cutoff = time.time() - ORPHAN_GRACE
+        for item in os.scandir(self.blobs_dir):
+            if item.name.endswith('.json') and item.name[:-len('.json')] not in kept_digests:
+                try:
+                    if item.stat().st_mtime < cutoff:
+                        _remove(item.path)
+                except FileNotFoundError:
+                    continue
+        return total
+
+class CachingTransport:
+    # Wraps another transport: fresh entries skip the network, stale ones are revalidated
+    # with If-None-Match/If-Modified-Since, and offline mode never touches the network
+    def __init__(self, transport, cache, offline=False):
+        self.transport = transport
+        self.cache = cache
+        self.offline = offline
+
+    def get(self, url, headers=None, timeout=10):
+        cached = self.cache.lookup(url)
+        if cached is not None:
+            entry, body = cached
+            if self.offline or self.cache.is_fresh(entry):
+                self.cache.touch(url, entry)
+                return FetchResponse(200, {'X-Cache': 'HIT'}, body)
+        elif self.offline:
+            return FetchResponse(404, {'X-Cache': 'MISS'}, b'')
+
+        request_headers = dict(headers or {})
+        if cached is not None:
+            if entry.get('etag'):
+                request_headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                request_headers['If-Modified-Since'] = entry['last_modified']
+
+        try:
+            response = self.transport.get(url, headers=request_headers, timeout=timeout)
+        except (requests.RequestException, OSError):
+            # Connection errors and timeouts are the common outage; a stale copy beats failing
+            if cached is not None:
+                return FetchResponse(200, {'X-Cache': 'STALE'}, body)
+            raise
+        if response.status == 304 and cached is not None:
+            self.cache.touch(url, entry, revalidated=True)
+            return FetchResponse(200, {'X-Cache': 'REVALIDATED'}, body)
+        if response.status == 200:
+            self.cache.store(url, response.body, response.headers)
+            return response
+        if response.status >= 500 and cached is not None:
+            # Serve stale content rather than failing the student outright
+            return FetchResponse(200, {'X-Cache': 'STALE'}, body)
+        return response
+
+def cached_fetcher(fixtures_dir=None, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL, offline=False,
+                   max_concurrency=8):
+    if offline and not cache_dir:
+        raise ValueError("offline mode needs a cache directory to serve from")
+    transport = FixtureTransport(fixtures_dir) if fixtures_dir else None
+    fetcher = Fetcher(transport, max_concurrency=max_concurrency)
+    if cache_dir:
+        fetcher.transport = CachingTransport(fetcher.transport, PayloadCache(cache_dir, ttl=ttl), offline=offline)
+    return fetcher
@@ -0,0 +1,191 @@
+import argparse
+import gzip
+import json
+import os
+import time
+from itertools import islice
+
+import pandas as pd
+
+import incremental
+from rolling import DEFAULT_WINDOWS
+from rules import load_rules
+from utils import process_historical_quiz_data, clean_historical_quiz_data, recommend_from_summary
+
+# Rough resident cost of one buffered submission: the parsed JSON dict (with its response_map)
+# plus its share of the processed, cleaned and rolling DataFrames
+BYTES_PER_SUBMISSION = 8 * 1024
+# Per-student state kept between chunks (tail, topic sums, moments)
+BYTES_PER_STUDENT = 2 * 1024
+DEFAULT_MEMORY_MB = 512
+READ_BLOCK = 1 << 20
+
+def chunk_rows_for(memory_mb, students=0):
+    budget = memory_mb * 2**20 - students * BYTES_PER_STUDENT
+    return max(100, int(budget // BYTES_PER_SUBMISSION))
+
+def _open_text(path):
+    return gzip.open(path, 'rt') if path.endswith('.gz') else open(path)
+
+def _iter_json_array(f):
+    # Decodes a top-level JSON array one element at a time, reading fixed-size blocks
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    while True:
+        block = f.read(READ_BLOCK)
+        buffer = buffer[position:] + block
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started:
+                if position < len(buffer):
+                    if buffer[position] != '[':
+                        raise ValueError("Expected a JSON array of submissions")
+                    started = True
+                    position += 1
+                    continue
+                break
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if not block:
+                    raise
+                break  # element continues in the next block
+            yield item
+            position = end
+        if not block:
+            return
+
+def iter_submissions(path):
+    # Submissions from NDJSON (one per line) or a JSON array like the historical API payload; .gz is decompressed
+    with _open_text(path) as f:
+        if path.endswith(('.ndjson', '.ndjson.gz', '.jsonl', '.jsonl.gz')):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from _iter_json_array(f)
+
+def _unseen(states, chunk_df, student_key):
+    # Drops submissions already folded in (same timestamp and id as a student's last one); anything
+    # older than a student's state means the export isn't time-ordered for that student
+    last = {student_id: (pd.Timestamp(states[student_id]['last_submitted_at']), states[student_id]['last_submission_ids'])
+            for student_id in chunk_df[student_key].unique() if student_id in states}
+    if not last:
+        return chunk_df
+    students = chunk_df[student_key]
+    last_submitted_at = pd.to_datetime(students.map({s: ts for s, (ts, _) in last.items()}))
+    late = chunk_df['submitted_at'] < last_submitted_at
+    if late.any():
+        raise ValueError(f"Submissions for {students[late].iloc[0]} are out of order across chunks; "
+                         "chunked mode needs each student's submissions in submitted_at order")
+    seen_keys = {(s, i) for s, (_, ids) in last.items() for i in ids}
+    seen = (chunk_df['submitted_at'] == last_submitted_at) & pd.Series(
+        [key in seen_keys for key in zip(students, chunk_df['submission_id'])], index=chunk_df.index)
+    return chunk_df[~seen]
+
+def fold_chunk(states, chunk, student_key='user_id', windows=DEFAULT_WINDOWS):
+    # Folds one chunk of raw submissions into per-student states; returns the chunk's rows with
+    # the rolling columns for every window and improvement_rate computed across chunk boundaries.
+    # The timeline grows with the whole history, so it isn't kept in memory here.
+    chunk_df = clean_historical_quiz_data(process_historical_quiz_data(chunk))
+    chunk_df, states = incremental.fold_cohort_submissions(states, _unseen(states, chunk_df, student_key),
+                                                           student_key, timeline=False, windows=windows)
+    return chunk_df
+
+def run_chunked(path, memory_mb=DEFAULT_MEMORY_MB, student_key='user_id', rows_output=None, chunk_rows=None,
+                windows=DEFAULT_WINDOWS):
+    # Streams a history export through bounded chunks. Returns {student_id: state}; with
+    # rows_output, the enriched rows are appended to a CSV as each chunk completes.
+    states = {}
+    chunks = 0
+    rows = 0
+    fixed_chunk_rows = chunk_rows
+    if rows_output and os.path.exists(rows_output):
+        os.remove(rows_output)
+    submissions = iter_submissions(path)
+    while True:
+        # Re-size every chunk as the per-student states take up more of the budget
+        chunk_rows = fixed_chunk_rows or chunk_rows_for(memory_mb, len(states))
+        chunk = list(islice(submissions, chunk_rows))
+        if not chunk:
+            break
+        chunk_df = fold_chunk(states, chunk, student_key, windows)
+        if rows_output:
+            chunk_df.to_csv(rows_output, mode='a', header=chunks == 0, index=False)
+        chunks += 1
+        rows += len(chunk)
+    return states, {'chunks': chunks, 'submissions': rows, 'students': len(states)}
+
+def student_results(states, rules=None):
+    # Per-student topic stats and insights derived from the folded aggregates
+    for student_id, state in states.items():
+        topic_stats = incremental.topic_stats_from_state(state)
+        insights, recommendations, persona, performance_labels = recommend_from_summary(
+            incremental.summary_from_state(state), topic_stats, rules)
+        yield {
+            'student_id': str(student_id),
+            'topic_stats': topic_stats.reset_index().to_dict('records'),
+            'insights': insights,
+            'recommendations': recommendations,
+            'persona': persona,
+            'performance_labels': performance_labels
+        }
+
+def check_against_memory(path, states, student_key='user_id'):
+    # Loads the whole export in memory and compares calculate_topic_stats per student
+    from utils import add_rolling_metrics, calculate_topic_stats
+    history_df = clean_historical_quiz_data(process_historical_quiz_data(list(iter_submissions(path))))
+    mismatches = []
+    for student_id, student_df in history_df.groupby(student_key, sort=False):
+        expected = calculate_topic_stats(add_rolling_metrics(student_df.reset_index(drop=True)))
+        actual = incremental.topic_stats_from_state(states[student_id])
+        try:
+            pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_names=False, check_exact=True,
+                                          check_index_type=False, check_categorical=False)
+        except AssertionError as e:
+            mismatches.append(f"{student_id}: {e}")
+    return mismatches
+
+def main():
+    from viz_export import write_ndjson
+
+    parser = argparse.ArgumentParser(description="Analyze historical submissions too large for memory, chunk by chunk")
+    parser.add_argument('input', help="NDJSON or JSON-array export of submissions (.gz accepted)")
+    parser.add_argument('--memory-mb', type=float, default=DEFAULT_MEMORY_MB,
+                        help="Memory for chunks and per-student state, on top of the interpreter and libraries")
+    parser.add_argument('--chunk-rows', type=int, help="Fixed submissions per chunk instead of deriving from --memory-mb")
+    parser.add_argument('--student-key', default='user_id', help="Submission field identifying the student")
+    parser.add_argument('--output', default='output/chunked_results.ndjson',
+                        help="Per-student topic stats and insights (NDJSON, add .gz to compress)")
+    parser.add_argument('--rows-output', help="Also write every submission with its rolling metrics to this CSV")
+    parser.add_argument('--check', action='store_true',
+                        help="Compare topic stats with the in-memory path (loads everything; for testing)")
+    parser.add_argument('--windows', nargs='+', default=list(DEFAULT_WINDOWS),
+                        help="Rolling/trend windows: attempt counts (3) or durations (7D, 30D)")
+    parser.add_argument('--rules', help="Rules file for personas, labels and recommendations (default: rules.json)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    states, stats = run_chunked(args.input, args.memory_mb, args.student_key, args.rows_output, args.chunk_rows,
+                                args.windows)
+    count = write_ndjson(args.output, student_results(states, load_rules(args.rules)))
+    elapsed = time.perf_counter() - started
+    print(f"Folded {stats['submissions']} submissions for {count} students in {stats['chunks']} chunks "
+          f"in {elapsed:.1f}s -> {args.output}")
+
+    if args.check:
+        mismatches = check_against_memory(args.input, states, args.student_key)
+        for mismatch in mismatches[:10]:
+            print(f"  - {mismatch}")
+        if mismatches:
+            raise SystemExit(f"{len(mismatches)} students differ from the in-memory topic stats")
+        print("Topic stats match the in-memory path for every student")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import gzip
+import json
+import os
+import time
+
+# Stages in run order. Only the modules a requested stage needs are imported: pandas and the
+# analysis modules for insights/viz/chart-data, matplotlib and seaborn only for charts.
+STAGES = ['insights', 'viz', 'chart-data', 'charts']
+DEFAULT_STAGES = ['insights', 'viz']
+DEFAULT_OUTPUT_DIR = 'output/cli'
+
+def load_history(path):
+    # Historical payload as a JSON array, or NDJSON with one submission per line; .gz is decompressed
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt') as f:
+        if path.endswith(('.ndjson', '.ndjson.gz', '.jsonl', '.jsonl.gz')):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+def run(historical_path, stages=DEFAULT_STAGES, output_dir=DEFAULT_OUTPUT_DIR, windows=None, rules_path=None,
+        cube_path=None, cohort=None):
+    # Runs the requested stages for one student and returns {stage: seconds}
+    timings = {}
+    started = time.perf_counter()
+    import utils
+    from rolling import DEFAULT_WINDOWS
+    from rules import load_rules
+    windows = windows or DEFAULT_WINDOWS
+    historical_quiz_df = utils.clean_historical_quiz_data(
+        utils.process_historical_quiz_data(load_history(historical_path)))
+    historical_quiz_df = utils.add_rolling_metrics(historical_quiz_df, windows)
+    topic_stats = utils.calculate_topic_stats(historical_quiz_df)
+    insights, recommendations, persona, performance_labels = utils.analyze_and_recommend(
+        historical_quiz_df, topic_stats, windows, load_rules(rules_path))
+    timings['analysis'] = time.perf_counter() - started
+
+    if 'insights' in stages:
+        from viz_export import write_json
+        write_json(os.path.join(output_dir, 'insights.json'), {
+            'insights': insights,
+            'recommendations': recommendations,
+            'persona': persona,
+            'performance_labels': performance_labels
+        })
+    if 'viz' in stages:
+        started = time.perf_counter()
+        cube_options = {}
+        if cube_path:
+            from cube import ALL_COHORTS, load_cube
+            cube_options = {'cube': load_cube(cube_path), 'cohort': cohort or ALL_COHORTS}
+        utils.prepare_visualization_data(historical_quiz_df, insights, topic_stats, recommendations, persona,
+                                         performance_labels, output_path=os.path.join(output_dir, 'viz_data.json'),
+                                         **cube_options)
+        timings['viz'] = time.perf_counter() - started
+    if 'chart-data' in stages:
+        import render
+        started = time.perf_counter()
+        render.render_charts(historical_quiz_df, topic_stats, insights, output_dir=output_dir, data_only=True)
+        timings['chart-data'] = time.perf_counter() - started
+    if 'charts' in stages:
+        import render
+        started = time.perf_counter()
+        render.render_charts(historical_quiz_df, topic_stats, insights,
+                             output_dir=os.path.join(output_dir, 'visualizations'))
+        timings['charts'] = time.perf_counter() - started
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze one student's history from a local file, importing only "
+                                                 "what the requested stages need")
+    parser.add_argument('historical', help="Historical submissions: JSON array or NDJSON (.gz accepted)")
+    parser.add_argument('--student-id', help="Write outputs to OUTPUT_DIR/<student-id> (the batch.py layout)")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=DEFAULT_STAGES,
+                        help="insights.json, viz_data.json, chart_data.json and/or PNG charts (default: insights viz)")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help="Directory outputs are written to")
+    parser.add_argument('--windows', nargs='+', help="Rolling/trend windows: attempt counts or durations (default: 3 7D 30D)")
+    parser.add_argument('--rules', help="Rules file for personas, labels and recommendations (default: rules.json)")
+    parser.add_argument('--cube', help="Cohort cube from cube.py; adds per-topic cohort percentiles to viz_data.json")
+    parser.add_argument('--cohort', help="Cohort in the cube to compare with (default: everyone)")
+    args = parser.parse_args()
+
+    output_dir = os.path.join(args.output_dir, args.student_id) if args.student_id else args.output_dir
+    timings = run(args.historical, args.stages, output_dir, args.windows, args.rules, args.cube, args.cohort)
+    print(f"{', '.join(args.stages)} -> {output_dir} "
+          f"({', '.join(f'{stage} {seconds:.2f}s' for stage, seconds in timings.items())})")
+
+if __name__ == "__main__":
+    main()
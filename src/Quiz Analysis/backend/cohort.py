@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+from rolling import DEFAULT_WINDOWS, RECENT_WINDOW, window_label, window_masks
+from rules import load_rules, student_table
+
+# Cohort-wide equivalents of analyze_and_recommend and friends. Input is one long frame
+# of cleaned historical submissions with a student_id column; every step is a grouped
+# pandas/NumPy operation over all students at once.
+
+def prepare_cohort_frame(cohort_df):
+    cohort_df = cohort_df.sort_values(['student_id', 'submitted_at'], kind='stable').reset_index(drop=True)
+    cohort_df['improvement_rate'] = cohort_df.groupby('student_id', sort=False)['accuracy'].diff()
+    return cohort_df
+
+def cohort_topic_stats(cohort_df):
+    # Same columns and rounding as calculate_topic_stats, indexed by (student_id, quiz_topic)
+    # and ordered by accuracy within each student
+    topic_stats = cohort_df.groupby(['student_id', 'quiz_topic'], observed=True).agg(
+        avg_accuracy=('accuracy', 'mean'),
+        attempt_count=('accuracy', 'count'),
+        total_mistakes_corrected=('mistakes_corrected', 'sum'),
+        avg_mistakes_corrected=('mistakes_corrected', 'mean'),
+        avg_improvement=('improvement_rate', 'mean')
+    ).round(3)
+    topic_stats = topic_stats.reset_index().sort_values(['student_id', 'avg_accuracy'], ascending=[True, False],
+                                                        kind='stable')
+    return topic_stats.set_index(['student_id', 'quiz_topic'])
+
+def _topic_group(topic_stats, mask, students):
+    # Topics passing `mask` per student, in topic_stats order, and the accuracy of each student's
+    # first such topic (NaN when none), without a Python-level groupby
+    selected = topic_stats[mask]
+    student_positions = students.get_indexer(selected.index.get_level_values('student_id'))
+    order = np.argsort(student_positions, kind='stable')
+    topics = selected.index.get_level_values('quiz_topic').to_numpy(dtype=object)[order].tolist()
+    counts = np.bincount(student_positions, minlength=len(students))
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    first_accuracy = np.full(len(students), np.nan)
+    first_accuracy[counts > 0] = selected['avg_accuracy'].to_numpy()[order][starts[counts > 0]]
+    return [topics[start:end] for start, end in zip(starts.tolist(), ends.tolist())], first_accuracy
+
+def _group_boundaries(student_ids):
+    # Start offset and length of each student's run of rows in a frame sorted by student
+    student_ids = np.asarray(student_ids)
+    starts = np.flatnonzero(np.r_[True, student_ids[1:] != student_ids[:-1]])
+    return starts, np.diff(np.r_[starts, len(student_ids)])
+
+def _group_sum(values, starts, counts):
+    # Students with the same number of rows are summed together as rows of a 2-D block. A
+    # row-wise np.add.reduce uses the same pairwise summation as Series.sum on each student's
+    # own frame, so means are bit-identical to the per-student path (groupby sums are not)
+    values = np.asarray(values, dtype=np.float64)
+    sums = np.empty(len(starts), dtype=np.float64)
+    for length in np.unique(counts):
+        groups = np.flatnonzero(counts == length)
+        block = values[starts[groups, None] + np.arange(length)]
+        sums[groups] = np.add.reduce(block, axis=1)
+    return sums
+
+def _group_mean(values, starts, counts):
+    return _group_sum(values, starts, counts) / counts
+
+def _group_std(values, starts, counts):
+    # Mirrors Series.std (two-pass, ddof=1): NaN for single-attempt students
+    values = np.asarray(values, dtype=np.float64)
+    means = np.repeat(_group_mean(values, starts, counts), counts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = _group_sum((means - values) ** 2, starts, counts) / np.where(counts > 1, counts - 1, np.nan)
+    return np.sqrt(variance)
+
+def cohort_window_summary(cohort_df, windows=DEFAULT_WINDOWS, student_key='student_id'):
+    # rolling.window_summary for every student at once: {label: frame of accuracy, corrections
+    # and attempts per student}, bit-identical to the per-student means. Rows must be contiguous
+    # per student and in submitted_at order; every student has at least one row in each window.
+    summaries = {}
+    for label, mask in window_masks(cohort_df, windows, student_key).items():
+        window_df = cohort_df[mask]
+        starts, counts = _group_boundaries(window_df[student_key])
+        summaries[label] = pd.DataFrame({
+            'accuracy': _group_mean(window_df['accuracy'], starts, counts),
+            'corrections': _group_mean(window_df['mistakes_corrected'], starts, counts),
+            'attempts': counts
+        }, index=pd.Index(window_df[student_key].to_numpy()[starts], name=student_key))
+    return summaries
+
+def window_dicts(summaries):
+    # One {label: {'accuracy', 'corrections', 'attempts'}} dict per student
+    columns = [zip(frame['accuracy'].tolist(), frame['corrections'].tolist(), frame['attempts'].tolist())
+               for frame in summaries.values()]
+    return [{label: {'accuracy': accuracy, 'corrections': corrections, 'attempts': attempts}
+             for label, (accuracy, corrections, attempts) in zip(summaries, values)}
+            for values in zip(*columns)]
+
+def cohort_summary(cohort_df, windows=DEFAULT_WINDOWS):
+    # summarize_history for every student: the SUMMARY_METRICS per student plus the window frames
+    starts, counts = _group_boundaries(cohort_df['student_id'])
+    students = pd.Index(cohort_df['student_id'].to_numpy()[starts], name='student_id')
+    recent = cohort_window_summary(cohort_df, [RECENT_WINDOW])[window_label(RECENT_WINDOW)]
+
+    summary = pd.DataFrame({
+        'overall_accuracy': _group_mean(cohort_df['accuracy'], starts, counts),
+        'recent_accuracy': recent['accuracy'].to_numpy(),
+        'mistake_correction_rate': _group_mean(cohort_df['mistakes_corrected'], starts, counts),
+        'recent_corrections': recent['corrections'].to_numpy(),
+        'accuracy_std': _group_std(cohort_df['accuracy'], starts, counts)
+    }, index=students)
+    return summary, cohort_window_summary(cohort_df, windows)
+
+def cohort_topic_groups(topic_stats, students, rules):
+    # {group: (topic lists, accuracy of the first topic)} for every student, as student_table expects
+    return {name: _topic_group(topic_stats, mask, students) for name, mask in rules.topic_masks(topic_stats).items()}
+
+def cohort_insights(cohort_df, windows=DEFAULT_WINDOWS, rules=None):
+    # Returns {student_id: (insights, recommendations, persona, performance_labels)}, identical
+    # to calling analyze_and_recommend on each student's frame and topic stats
+    cohort_df = prepare_cohort_frame(cohort_df)
+    return insights_from_topic_stats(cohort_df, cohort_topic_stats(cohort_df), windows, rules)
+
+def insights_from_topic_stats(cohort_df, topic_stats, windows=DEFAULT_WINDOWS, rules=None):
+    # cohort_df must come from prepare_cohort_frame (rows contiguous per student). Every rule in
+    # the rules file is evaluated once over the whole cohort table.
+    rules = rules or load_rules()
+    summary, window_frames = cohort_summary(cohort_df, windows)
+    topic_groups = cohort_topic_groups(topic_stats, summary.index, rules)
+    table = student_table(summary, window_frames, topic_groups)
+    outputs = rules.student_outputs(table, len(summary), window_dicts(window_frames), topic_groups)
+    return dict(zip(summary.index, outputs))
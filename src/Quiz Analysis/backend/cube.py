@@ -0,0 +1,284 @@
+import argparse
+import functools
+import json
+import os
+import time
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+CUBE_VERSION = 2
+DEFAULT_CUBE_PATH = 'output/cube.json'
+# Rollup keys: every cell is also added to its topic's all-weeks and all-cohorts cells, so a
+# percentile over a student's whole history is a single cell lookup
+ALL_WEEKS = '*'
+ALL_COHORTS = '*'
+# Quantile sketch: accuracy histogram with one bin per percentage point. Accuracies come from
+# whole-percent strings, so ranks are exact for them, and cells merge by adding counts.
+BINS = 101
+
+# Cube layout: {'cells': {(topic, week, cohort): cell}, 'student_means': {(topic, cohort): histogram},
+#               'students': {student_id: watermark}}
+#   cell:          {'count', 'sum', 'sum_sq', 'histogram'} over submission accuracies; week is the
+#                  Monday (YYYY-MM-DD) of the submission's week in its own timezone
+#   student_means: histogram of each student's mean accuracy on the topic, over all weeks; a
+#                  student's mean moves between bins as their submissions are folded in
+#   watermark:     {'last_submitted_at', 'last_submission_ids', 'cohort', 'topics': {topic: [count, sum]}},
+#                  so re-folding an export only adds submissions the cube hasn't seen
+
+def new_cube():
+    return {'version': CUBE_VERSION, 'cells': {}, 'student_means': {}, 'students': {}}
+
+def _bin(accuracy):
+    return int(np.clip(np.rint(accuracy * 100), 0, BINS - 1))
+
+def _histogram(sparse):
+    histogram = np.zeros(BINS, dtype=np.int64)
+    for bin_index, count in sparse.items():
+        histogram[int(bin_index)] = count
+    return histogram
+
+def _sparse(histogram):
+    return {str(i): int(histogram[i]) for i in np.flatnonzero(histogram)}
+
+def _new_cell():
+    return {'count': 0, 'sum': 0.0, 'sum_sq': 0.0, 'histogram': np.zeros(BINS, dtype=np.int64)}
+
+def load_cube(path):
+    if not os.path.exists(path):
+        return new_cube()
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('version') != CUBE_VERSION:
+        return new_cube()
+    cube = new_cube()
+    for record in data['cells']:
+        cube['cells'][(record['topic'], record['week'], record['cohort'])] = {
+            'count': record['count'], 'sum': record['sum'], 'sum_sq': record['sum_sq'],
+            'histogram': _histogram(record['histogram'])
+        }
+    for record in data['student_means']:
+        cube['student_means'][(record['topic'], record['cohort'])] = _histogram(record['histogram'])
+    cube['students'] = data['students']
+    return cube
+
+@functools.lru_cache(maxsize=None)
+def cached_cube(path):
+    # Read-only cube for lookups, loaded once per process
+    return load_cube(path)
+
+def save_cube(path, cube):
+    from viz_export import write_json
+    write_json(path, {
+        'version': CUBE_VERSION,
+        'cells': [{
+            'topic': topic, 'week': week, 'cohort': cohort,
+            'count': cell['count'], 'sum': cell['sum'], 'sum_sq': cell['sum_sq'],
+            'histogram': _sparse(cell['histogram'])
+        } for (topic, week, cohort), cell in cube['cells'].items()],
+        'student_means': [{'topic': topic, 'cohort': cohort, 'histogram': _sparse(histogram)}
+                          for (topic, cohort), histogram in cube['student_means'].items()],
+        'students': cube['students']
+    })
+
+def _unseen(cube, history_df, student_key):
+    # Rows after each student's watermark, plus unseen ids sharing its timestamp. Rows before the
+    # watermark can't be told apart from ones already folded, so late or backfilled submissions
+    # are left out too; fold_submissions reports how many rows were skipped.
+    students = history_df[student_key].astype(str)
+    watermarks = {student_id: cube['students'][student_id]
+                  for student_id in students.unique() if student_id in cube['students']}
+    if not watermarks:
+        return history_df
+    last_submitted_at = pd.to_datetime(students.map(
+        {s: pd.Timestamp(w['last_submitted_at']) for s, w in watermarks.items()}), utc=True)
+    seen_keys = {(s, i) for s, w in watermarks.items() for i in w['last_submission_ids']}
+    submitted_at = history_df['submitted_at'].dt.tz_convert('UTC')
+    at_last = (submitted_at == last_submitted_at).to_numpy()
+    seen = (submitted_at < last_submitted_at).to_numpy() | at_last & np.array(
+        [key in seen_keys for key in zip(students, history_df['submission_id'])], dtype=bool)
+    return history_df[~seen]
+
+def week_start(submitted_at):
+    # Monday of each submission's week, in the submission's own timezone
+    days = submitted_at.dt.normalize() - pd.to_timedelta(submitted_at.dt.weekday, unit='D')
+    return days.dt.strftime('%Y-%m-%d')
+
+def _add_cells(cube, frame, bins):
+    # Adds each (topic, week, cohort) group's moments and histogram to its cell
+    groups = frame.groupby(['topic', 'week', 'cohort'], sort=False)
+    totals = groups['accuracy'].agg(['count', 'sum'])
+    totals['sum_sq'] = groups['accuracy_sq'].sum()
+    histograms = np.zeros((len(totals), BINS), dtype=np.int64)
+    np.add.at(histograms, (groups.ngroup().to_numpy(), bins), 1)
+    for key, count, total, total_sq, histogram in zip(totals.index, totals['count'].tolist(), totals['sum'].tolist(),
+                                                      totals['sum_sq'].tolist(), histograms):
+        cell = cube['cells'].setdefault(tuple(key), _new_cell())
+        cell['count'] += count
+        cell['sum'] += total
+        cell['sum_sq'] += total_sq
+        cell['histogram'] += histogram
+
+def _mean_bin(total):
+    # Rounded like calculate_topic_stats, so a student's mean falls in the same bin whatever
+    # order their submissions were summed in, and the bin a student's topic_stats rank in
+    return _bin(round(total[1] / total[0], 3))
+
+def _fold_student_means(cube, frame):
+    # Moves each student's mean on every topic they submitted to into its new bin, in the
+    # all-cohorts histogram and their own cohort's
+    groups = frame.groupby(['student', 'topic'], sort=False)
+    totals = groups['accuracy'].agg(['count', 'sum'])
+    cohorts = groups['cohort'].first()
+    for (student_id, topic), count, total, cohort in zip(totals.index, totals['count'].tolist(),
+                                                         totals['sum'].tolist(), cohorts.tolist()):
+        watermark = cube['students'].setdefault(student_id, {'cohort': cohort, 'topics': {}})
+        previous = watermark['topics'].get(topic)
+        current = [previous[0] + count, previous[1] + total] if previous else [count, total]
+        watermark['topics'][topic] = current
+        for histogram_cohort in dict.fromkeys([ALL_COHORTS, watermark['cohort']]):
+            histogram = cube['student_means'].setdefault((topic, histogram_cohort), np.zeros(BINS, dtype=np.int64))
+            if previous:
+                histogram[_mean_bin(previous)] -= 1
+            histogram[_mean_bin(current)] += 1
+
+def fold_submissions(cube, history_df, student_key='user_id', cohort_key=None):
+    # Adds cleaned submissions the cube hasn't seen to their (topic, week, cohort) cells, the
+    # rollups and the per-student topic means. cohort_key names a column holding each student's
+    # cohort; without it everyone is in ALL_COHORTS. Returns (added, skipped): skipped rows are at
+    # or before their student's watermark, i.e. already folded, or late and left out (see _unseen).
+    total_rows = len(history_df)
+    history_df = _unseen(cube, history_df, student_key)
+    if history_df.empty:
+        return 0, total_rows
+    accuracy = history_df['accuracy'].to_numpy(dtype=float)
+    frame = pd.DataFrame({
+        'student': history_df[student_key].astype(str).to_numpy(),
+        'topic': history_df['quiz_topic'].astype(str).to_numpy(),
+        'week': week_start(history_df['submitted_at']).to_numpy(),
+        'cohort': history_df[cohort_key].astype(str).to_numpy() if cohort_key else ALL_COHORTS,
+        'accuracy': accuracy,
+        'accuracy_sq': accuracy ** 2
+    })
+    bins = np.clip(np.rint(accuracy * 100), 0, BINS - 1).astype(np.int64)
+    # (all weeks, all cohorts) rollups each row is added to besides its own cell
+    rollups = [(False, False), (True, False)]
+    if cohort_key:
+        rollups += [(False, True), (True, True)]
+    for all_weeks, all_cohorts in rollups:
+        rollup = frame.assign(week=ALL_WEEKS) if all_weeks else frame
+        rollup = rollup.assign(cohort=ALL_COHORTS) if all_cohorts else rollup
+        _add_cells(cube, rollup, bins)
+    _fold_student_means(cube, frame)
+
+    # Watermarks move to each student's latest submission
+    latest = history_df.assign(utc=history_df['submitted_at'].dt.tz_convert('UTC'))
+    last_times = latest.groupby(student_key, sort=False)['utc'].transform('max')
+    at_last = latest[latest['utc'] == last_times]
+    for student_id, rows in at_last.groupby(at_last[student_key].astype(str), sort=False):
+        submitted_at = rows['submitted_at'].iloc[0].isoformat()
+        watermark = cube['students'][student_id]
+        ids = [int(i) if isinstance(i, (int, np.integer)) else i for i in rows['submission_id']]
+        if 'last_submitted_at' in watermark and pd.Timestamp(watermark['last_submitted_at']) == rows['utc'].iloc[0]:
+            ids = watermark['last_submission_ids'] + ids
+        cube['students'][student_id].update(last_submitted_at=submitted_at, last_submission_ids=ids)
+    return len(history_df), total_rows - len(history_df)
+
+def cell(cube, topic, week=ALL_WEEKS, cohort=ALL_COHORTS):
+    return cube['cells'].get((str(topic), week, cohort))
+
+def student_mean_cell(cube, topic, cohort=ALL_COHORTS):
+    # The students' topic means as a cell percentile_rank/cell_quantile can read
+    histogram = cube['student_means'].get((str(topic), cohort))
+    return {'count': int(histogram.sum()), 'histogram': histogram} if histogram is not None else None
+
+def cell_stats(cell):
+    mean = cell['sum'] / cell['count']
+    return {
+        'count': cell['count'],
+        'mean': mean,
+        'std': max(cell['sum_sq'] / cell['count'] - mean ** 2, 0.0) ** 0.5,
+        'p50': cell_quantile(cell, 0.5),
+        'p90': cell_quantile(cell, 0.9)
+    }
+
+def cell_quantile(cell, q):
+    # Lowest accuracy bin holding at least q of the cell's submissions
+    cumulative = np.cumsum(cell['histogram'])
+    return int(np.searchsorted(cumulative, q * cumulative[-1])) / 100
+
+def percentile_rank(cell, accuracy):
+    # Share (0-100) of the cell's entries below accuracy, counting ties as half
+    histogram = cell['histogram']
+    bin_index = _bin(accuracy)
+    below = histogram[:bin_index].sum() + histogram[bin_index] / 2
+    return float(100 * below / cell['count'])
+
+def topic_comparison(cube, topic_stats, cohort=ALL_COHORTS):
+    # {topic: {'percentile', 'cohort_accuracy'}} for a student's topic stats against the cohort
+    # over all weeks: the percentile ranks the student's topic mean among the cohort students'
+    # topic means, and cohort_accuracy is the mean over all the cohort's attempts. Topics the
+    # cube hasn't seen are left out.
+    comparison = {}
+    for topic, accuracy in zip(topic_stats.index, topic_stats['avg_accuracy'].tolist()):
+        topic_cell = cell(cube, topic, cohort=cohort)
+        means_cell = student_mean_cell(cube, topic, cohort)
+        if topic_cell and topic_cell['count'] and means_cell and means_cell['count']:
+            comparison[str(topic)] = {
+                'percentile': percentile_rank(means_cell, accuracy),
+                'cohort_accuracy': topic_cell['sum'] / topic_cell['count']
+            }
+    return comparison
+
+def main():
+    from chunked import DEFAULT_MEMORY_MB, chunk_rows_for, iter_submissions
+    from utils import process_historical_quiz_data, clean_historical_quiz_data
+
+    parser = argparse.ArgumentParser(description="Fold submission exports into the (topic, week, cohort) cube")
+    parser.add_argument('inputs', nargs='+', help="NDJSON or JSON-array exports of submissions (.gz accepted)")
+    parser.add_argument('--cube', default=DEFAULT_CUBE_PATH, help="Cube file, updated in place")
+    parser.add_argument('--student-key', default='user_id', help="Submission field identifying the student")
+    parser.add_argument('--cohort-key', help="Submission field holding the student's cohort")
+    parser.add_argument('--memory-mb', type=float, default=DEFAULT_MEMORY_MB, help="Memory for each chunk of submissions")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    cube = load_cube(args.cube)
+    read, added, skipped = 0, 0, 0
+    for path in args.inputs:
+        submissions = iter_submissions(path)
+        while True:
+            chunk = list(islice(submissions, chunk_rows_for(args.memory_mb)))
+            if not chunk:
+                break
+            chunk_df = clean_historical_quiz_data(process_historical_quiz_data(chunk))
+            if args.cohort_key:
+                cohorts = {submission[args.student_key]: submission.get(args.cohort_key) for submission in chunk}
+                chunk_df[args.cohort_key] = chunk_df[args.student_key].map(cohorts)
+            chunk_added, chunk_skipped = fold_submissions(cube, chunk_df, args.student_key, args.cohort_key)
+            added += chunk_added
+            skipped += chunk_skipped
+            read += len(chunk)
+    save_cube(args.cube, cube)
+    elapsed = time.perf_counter() - started
+
+    print("\n" + "="*50)
+    print("            COHORT CUBE            ")
+    print("="*50)
+    print(f"• Submissions read: {read} ({added} new, {skipped} at or before their student's watermark)")
+    if skipped:
+        print(f"  ! {skipped} skipped submissions were either folded before or arrived late; late or backfilled "
+              "submissions only enter a cube rebuilt from scratch")
+    print(f"• Cells: {len(cube['cells'])} | Students: {len(cube['students'])}")
+    for (topic, week, cohort), topic_cell in sorted(cube['cells'].items()):
+        if week == ALL_WEEKS and cohort == ALL_COHORTS:
+            stats = cell_stats(topic_cell)
+            means = student_mean_cell(cube, topic, cohort)
+            print(f"• {topic}: {stats['count']} attempts by {means['count']} students, mean {stats['mean']:.1%}, "
+                  f"median {stats['p50']:.0%}, p90 {stats['p90']:.0%}, median student {cell_quantile(means, 0.5):.0%}")
+    print(f"• Elapsed: {elapsed:.1f}s -> {args.cube}")
+    print("="*50 + "\n")
+
+if __name__ == "__main__":
+    main()
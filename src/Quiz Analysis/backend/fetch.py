@@ -0,0 +1,99 @@
+import json
+import os
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+FetchResponse = namedtuple('FetchResponse', ['status', 'headers', 'body'])
+
+# Status codes worth retrying; anything else is returned or raised straight away
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+class FetchError(Exception):
+    def __init__(self, url, message):
+        super().__init__(f"{url}: {message}")
+        self.url = url
+
+class HttpTransport:
+    # One pooled session shared by every fetch, so connections are reused across students
+    def __init__(self, pool_size=16):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url, headers=None, timeout=10):
+        response = self.session.get(url, headers=headers, timeout=timeout)
+        return FetchResponse(response.status_code, dict(response.headers), response.content)
+
+class FixtureTransport:
+    # Serves URLs from a local directory: https://api.jsonserve.com/XgAgFJ -> <directory>/XgAgFJ.json
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path_for(self, url):
+        segment = urlsplit(url).path.rstrip('/').rsplit('/', 1)[-1] or 'index'
+        return os.path.join(self.directory, f"{segment}.json")
+
+    def get(self, url, headers=None, timeout=10):
+        path = self.path_for(url)
+        if not os.path.exists(path):
+            return FetchResponse(404, {}, b'')
+        with open(path, 'rb') as f:
+            return FetchResponse(200, {'Content-Type': 'application/json'}, f.read())
+
+class Fetcher:
+    def __init__(self, transport=None, max_concurrency=8, timeout=10, retries=3, backoff=0.5):
+        self.transport = transport or HttpTransport(pool_size=max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+    def _sleep_before_retry(self, attempt):
+        # Exponential backoff with jitter so concurrent retries don't line up
+        time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+
+    def fetch(self, url, headers=None):
+        last_error = None
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.transport.get(url, headers=headers, timeout=self.timeout)
+            except (requests.RequestException, OSError) as e:
+                last_error = str(e)
+            else:
+                if response.status not in RETRYABLE_STATUSES:
+                    return response
+                last_error = f"HTTP {response.status}"
+            if attempt < self.retries:
+                self._sleep_before_retry(attempt)
+        raise FetchError(url, f"giving up after {self.retries + 1} attempts ({last_error})")
+
+    def fetch_json(self, url):
+        response = self.fetch(url)
+        if response.status != 200:
+            raise FetchError(url, f"HTTP {response.status}")
+        try:
+            return json.loads(response.body)
+        except ValueError as e:
+            raise FetchError(url, f"invalid JSON ({e})")
+
+    def fetch_many(self, urls):
+        # Returns (payloads, errors), both keyed by URL; duplicate URLs are fetched once
+        unique_urls = list(dict.fromkeys(urls))
+        payloads, errors = {}, {}
+
+        def fetch_one(url):
+            try:
+                payloads[url] = self.fetch_json(url)
+            except FetchError as e:
+                errors[url] = e
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            list(executor.map(fetch_one, unique_urls))
+        return payloads, errors
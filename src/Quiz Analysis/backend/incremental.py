@@ -0,0 +1,358 @@
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from cohort import cohort_window_summary, window_dicts
+from rolling import DEFAULT_WINDOWS, RECENT_WINDOW, retained_mask, rolling_metrics, window_label, window_summary
+from viz_export import temp_file
+
+STATE_VERSION = 3
+# Rows kept in state['recent']: [submitted_at, accuracy, incorrect_answers, mistakes_corrected]
+RECENT_COLUMNS = ['submitted_at', 'accuracy', 'incorrect_answers', 'mistakes_corrected']
+
+# The state file holds only aggregates and the rows the windows still need, so it stays small.
+# The timeline the export draws ([submitted_at, accuracy, mistakes_corrected] per submission) is
+# appended to <state>.timeline.jsonl instead; state['timeline_bytes'] is how much of that file is
+# valid and state['timeline'] holds rows folded since the last save.
+
+def new_state(windows=DEFAULT_WINDOWS):
+    return {
+        'version': STATE_VERSION,
+        'windows': [str(spec) for spec in windows],
+        'last_submitted_at': None,
+        'last_submitted_raw': None,
+        'last_submission_ids': [],
+        'count': 0,
+        'accuracy_sum': 0.0,
+        'accuracy_mean': 0.0,
+        'accuracy_m2': 0.0,
+        'mistakes_sum': 0,
+        'last_accuracy': None,
+        'recent': [],
+        'window_stats': {},
+        'topics': {},
+        'timeline_bytes': 0,
+        'timeline': []
+    }
+
+def timeline_path(state_path):
+    return os.path.splitext(state_path)[0] + '.timeline.jsonl'
+
+def load_state(state_path, windows=DEFAULT_WINDOWS):
+    # States built for other windows don't hold the rows the new ones need, so they start over
+    if not os.path.exists(state_path):
+        return new_state(windows)
+    with open(state_path) as f:
+        state = json.load(f)
+    if state.get('windows') != [str(spec) for spec in windows]:
+        return new_state(windows)
+    if state.get('version') == 2:
+        # Version 2 kept the timeline inline; it is written out to the timeline file on the next save
+        state.update(version=STATE_VERSION, last_submitted_raw=None, timeline_bytes=0)
+    elif state.get('version') != STATE_VERSION:
+        return new_state(windows)
+    else:
+        state['timeline'] = []
+    return state
+
+def save_state(state_path, state):
+    # Appends the new timeline rows first (cutting off rows a crashed run wrote after the last
+    # saved state), then atomically replaces the state that records the timeline's valid length
+    directory = os.path.dirname(state_path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    rows = ''.join(json.dumps(row) + '\n' for row in state['timeline']).encode()
+    fd = os.open(timeline_path(state_path), os.O_WRONLY | os.O_CREAT)
+    try:
+        os.ftruncate(fd, state['timeline_bytes'])
+        os.lseek(fd, 0, os.SEEK_END)
+        os.write(fd, rows)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    state['timeline_bytes'] += len(rows)
+    state['timeline'] = []
+
+    fd, tmp_path = temp_file(directory)
+    with os.fdopen(fd, 'w') as f:
+        json.dump({key: value for key, value in state.items() if key != 'timeline'}, f)
+    os.replace(tmp_path, state_path)
+
+def _same_format(raw, watermark):
+    # Fixed-width ISO strings with the same separator and UTC offset sort like their timestamps
+    return (len(raw) == len(watermark) and raw[10:11] == watermark[10:11]
+            and (raw[-6:] == watermark[-6:] if raw[-6] in '+-' else raw[-1:] == watermark[-1:] == 'Z'))
+
+def select_new_submissions(state, historical_quiz_data):
+    # (new, older): submissions strictly after the last one folded in, plus any unseen ones sharing
+    # its timestamp, and the number of the rest. Given a student's full history, older equals
+    # state['count'] unless submissions arrived late (or were removed), see history_changed.
+    # Submissions in the same string format as the last one folded in are compared as strings;
+    # only the others are parsed, in one vectorized call.
+    if state['last_submitted_at'] is None:
+        return list(historical_quiz_data), 0
+    watermark = state.get('last_submitted_raw')
+    seen_ids = set(state['last_submission_ids'])
+    is_new = [None] * len(historical_quiz_data)
+    for i, submission in enumerate(historical_quiz_data):
+        raw = submission['submitted_at']
+        if watermark and _same_format(raw, watermark):
+            is_new[i] = raw > watermark or (raw == watermark and submission['id'] not in seen_ids)
+    unparsed = [i for i, new in enumerate(is_new) if new is None]
+    if unparsed:
+        last_submitted_at = pd.Timestamp(state['last_submitted_at'])
+        submitted_at = pd.to_datetime([historical_quiz_data[i]['submitted_at'] for i in unparsed], utc=True,
+                                      format='ISO8601')
+        for i, when in zip(unparsed, submitted_at):
+            is_new[i] = when > last_submitted_at or (
+                when == last_submitted_at and historical_quiz_data[i]['id'] not in seen_ids)
+    new_submissions = [submission for submission, new in zip(historical_quiz_data, is_new) if new]
+    return new_submissions, len(historical_quiz_data) - len(new_submissions)
+
+def remember_watermark(state, new_submissions):
+    # Keeps the raw submitted_at of the last submission folded in, for select_new_submissions
+    last_ids = set(state['last_submission_ids'])
+    state['last_submitted_raw'] = next(
+        (submission['submitted_at'] for submission in new_submissions if submission['id'] in last_ids), None)
+
+def history_changed(state, older):
+    # Rolling windows and improvement rates depend on submission order, so a late submission
+    # can't be folded in after newer ones; the state has to be rebuilt from the full history
+    return state['last_submitted_at'] is not None and older != state['count']
+
+def _recent_frame(recent, tz, codes=None):
+    recent_df = pd.DataFrame(recent, columns=RECENT_COLUMNS).astype(
+        {'accuracy': float, 'incorrect_answers': float, 'mistakes_corrected': float})
+    recent_df['submitted_at'] = pd.to_datetime(recent_df['submitted_at'], utc=True).dt.tz_convert(tz)
+    if codes is not None:
+        recent_df['code'] = codes
+    return recent_df
+
+def _recent_records(recent_df):
+    return [[submitted_at.isoformat(), float(accuracy), int(incorrect), int(mistakes)]
+            for submitted_at, accuracy, incorrect, mistakes in recent_df[RECENT_COLUMNS].itertuples(index=False)]
+
+def _rolling_columns(window_df):
+    return [column for column in window_df.columns if column.startswith('rolling_')]
+
+def fold_submissions(state, new_quiz_df):
+    # new_quiz_df holds cleaned submissions newer than everything in state, sorted by submitted_at.
+    # Rolling and diff columns are computed against the stored recent rows so they match a full recompute.
+    if new_quiz_df.empty:
+        return new_quiz_df, state
+
+    windows = state['windows']
+    recent_df = _recent_frame(state['recent'], new_quiz_df['submitted_at'].dt.tz)
+    window_df = pd.concat([recent_df, new_quiz_df[RECENT_COLUMNS].astype(
+        {'accuracy': float, 'incorrect_answers': float, 'mistakes_corrected': float})], ignore_index=True)
+    window_df = rolling_metrics(window_df, windows)
+    new_quiz_df = new_quiz_df.copy()
+    for column in _rolling_columns(window_df):
+        new_quiz_df[column] = window_df[column].iloc[len(recent_df):].to_numpy()
+
+    previous_accuracy = pd.Series([state['last_accuracy']], dtype=float)
+    new_quiz_df['improvement_rate'] = pd.concat(
+        [previous_accuracy, new_quiz_df['accuracy']], ignore_index=True).diff().iloc[1:].to_numpy()
+
+    # Merge overall accuracy moments (Chan et al. parallel variance)
+    batch_count = len(new_quiz_df)
+    batch_mean = new_quiz_df['accuracy'].mean()
+    batch_m2 = ((new_quiz_df['accuracy'] - batch_mean) ** 2).sum()
+    total = state['count'] + batch_count
+    delta = batch_mean - state['accuracy_mean']
+    state['accuracy_m2'] += batch_m2 + delta ** 2 * state['count'] * batch_count / total
+    state['accuracy_mean'] += delta * batch_count / total
+    state['count'] = total
+    state['accuracy_sum'] += float(new_quiz_df['accuracy'].sum())
+    state['mistakes_sum'] += int(new_quiz_df['mistakes_corrected'].sum())
+
+    topic_totals = new_quiz_df.groupby('quiz_topic', observed=True).agg(
+        accuracy_sum=('accuracy', 'sum'),
+        count=('accuracy', 'count'),
+        mistakes_sum=('mistakes_corrected', 'sum'),
+        improvement_sum=('improvement_rate', 'sum'),
+        improvement_count=('improvement_rate', 'count')
+    )
+    for topic, totals in topic_totals.iterrows():
+        topic_state = state['topics'].setdefault(str(topic), {
+            'accuracy_sum': 0.0, 'count': 0, 'mistakes_sum': 0, 'improvement_sum': 0.0, 'improvement_count': 0
+        })
+        topic_state['accuracy_sum'] += float(totals['accuracy_sum'])
+        topic_state['count'] += int(totals['count'])
+        topic_state['mistakes_sum'] += int(totals['mistakes_sum'])
+        topic_state['improvement_sum'] += float(totals['improvement_sum'])
+        topic_state['improvement_count'] += int(totals['improvement_count'])
+
+    # Window summaries are cached here so insights never rescan the history
+    state['window_stats'] = window_summary(window_df, [RECENT_WINDOW] + windows)
+    state['recent'] = _recent_records(window_df[retained_mask(window_df, windows)])
+    state['last_accuracy'] = float(new_quiz_df['accuracy'].iloc[-1])
+
+    last_submitted_at = new_quiz_df['submitted_at'].iloc[-1]
+    state['last_submitted_at'] = last_submitted_at.isoformat()
+    state['last_submission_ids'] = new_quiz_df.loc[
+        new_quiz_df['submitted_at'] == last_submitted_at, 'submission_id'].tolist()
+
+    state['timeline'].extend(
+        [submitted_at.isoformat(), float(accuracy), int(mistakes)]
+        for submitted_at, accuracy, mistakes in zip(
+            new_quiz_df['submitted_at'], new_quiz_df['accuracy'], new_quiz_df['mistakes_corrected'])
+    )
+    return new_quiz_df, state
+
+def fold_cohort_submissions(states, new_quiz_df, student_key='user_id', timeline=True, windows=DEFAULT_WINDOWS):
+    # fold_submissions for many students at once: one grouped pass over new_quiz_df, then cheap
+    # per-student dict updates. Each student's rows must be newer than their state and in
+    # submitted_at order. Returns (new_quiz_df sorted by student with rolling/diff columns, states).
+    if new_quiz_df.empty:
+        return new_quiz_df, states
+    windows = [str(spec) for spec in windows]
+    new_quiz_df = new_quiz_df.sort_values(student_key, kind='stable').reset_index(drop=True)
+    codes, students = pd.factorize(new_quiz_df[student_key], sort=False)
+    previous = [states.get(student_id) or new_state(windows) for student_id in students]
+
+    # Stored recent rows go in front of each student's new rows so the rolling windows continue
+    recent_codes = np.repeat(np.arange(len(previous)), [len(state['recent']) for state in previous])
+    recent_df = _recent_frame([row for state in previous for row in state['recent']],
+                              new_quiz_df['submitted_at'].dt.tz, recent_codes)
+    recent_df.index += len(new_quiz_df)
+    window_df = pd.concat([recent_df, new_quiz_df[RECENT_COLUMNS].astype(
+        {'accuracy': float, 'incorrect_answers': float, 'mistakes_corrected': float}).assign(code=codes)])
+    window_df = rolling_metrics(window_df.sort_values('code', kind='stable'), windows, 'code')
+    for column in _rolling_columns(window_df):
+        new_quiz_df[column] = window_df[column].reindex(new_quiz_df.index).to_numpy()
+
+    # Diff against the previous row, or the stored last accuracy for each student's first new row
+    accuracy = new_quiz_df['accuracy'].to_numpy(dtype=float)
+    first = np.r_[True, codes[1:] != codes[:-1]]
+    last_accuracy = np.array([np.nan if state['last_accuracy'] is None else state['last_accuracy']
+                              for state in previous])
+    previous_accuracy = np.r_[np.nan, accuracy[:-1]]
+    previous_accuracy[first] = last_accuracy[codes[first]]
+    new_quiz_df['improvement_rate'] = accuracy - previous_accuracy
+
+    # Per-student batch moments, merged below (Chan et al. parallel variance)
+    batch_count = np.bincount(codes, minlength=len(students))
+    batch_sum = np.bincount(codes, weights=accuracy, minlength=len(students))
+    batch_mean = batch_sum / batch_count
+    batch_m2 = np.bincount(codes, weights=(accuracy - batch_mean[codes]) ** 2, minlength=len(students))
+    mistakes_sum = np.bincount(codes, weights=new_quiz_df['mistakes_corrected'].to_numpy(),
+                               minlength=len(students))
+    last_rows = np.flatnonzero(np.r_[codes[1:] != codes[:-1], True])
+    submitted_at = new_quiz_df['submitted_at']
+    last_submitted_at = submitted_at.to_numpy()[last_rows]
+    at_last = (submitted_at.to_numpy() == last_submitted_at[codes])
+    last_ids = new_quiz_df.loc[at_last, 'submission_id'].groupby(codes[at_last]).agg(list)
+
+    # Window summaries (cached in state) and the rows later windows still need, per student
+    window_stats = window_dicts(cohort_window_summary(window_df, [RECENT_WINDOW] + windows, 'code'))
+    retained_df = window_df[retained_mask(window_df, windows, 'code')]
+    recent_records = {}
+    for code, record in zip(retained_df['code'].tolist(), _recent_records(retained_df)):
+        recent_records.setdefault(code, []).append(record)
+
+    for code, (student_id, state) in enumerate(zip(students, previous)):
+        total = state['count'] + int(batch_count[code])
+        delta = batch_mean[code] - state['accuracy_mean']
+        state['accuracy_m2'] += float(batch_m2[code] + delta ** 2 * state['count'] * batch_count[code] / total)
+        state['accuracy_mean'] += float(delta * batch_count[code] / total)
+        state['count'] = total
+        state['accuracy_sum'] += float(batch_sum[code])
+        state['mistakes_sum'] += int(mistakes_sum[code])
+        state['window_stats'] = window_stats[code]
+        state['recent'] = recent_records[code]
+        state['last_accuracy'] = float(accuracy[last_rows[code]])
+        state['last_submitted_at'] = submitted_at.iloc[last_rows[code]].isoformat()
+        state['last_submission_ids'] = last_ids[code]
+        states[student_id] = state
+
+    topic_totals = new_quiz_df.assign(code=codes).groupby(['code', 'quiz_topic'], sort=False, observed=True).agg(
+        accuracy_sum=('accuracy', 'sum'),
+        count=('accuracy', 'count'),
+        mistakes_sum=('mistakes_corrected', 'sum'),
+        improvement_sum=('improvement_rate', 'sum'),
+        improvement_count=('improvement_rate', 'count')
+    )
+    for (code, topic), accuracy_sum, count, topic_mistakes, improvement_sum, improvement_count in \
+            topic_totals.itertuples():
+        topic_state = previous[code]['topics'].setdefault(str(topic), {
+            'accuracy_sum': 0.0, 'count': 0, 'mistakes_sum': 0, 'improvement_sum': 0.0, 'improvement_count': 0
+        })
+        topic_state['accuracy_sum'] += float(accuracy_sum)
+        topic_state['count'] += int(count)
+        topic_state['mistakes_sum'] += int(topic_mistakes)
+        topic_state['improvement_sum'] += float(improvement_sum)
+        topic_state['improvement_count'] += int(improvement_count)
+
+    if timeline:
+        for code, when, accuracy_value, mistakes in zip(codes, submitted_at, accuracy,
+                                                        new_quiz_df['mistakes_corrected']):
+            previous[code]['timeline'].append([when.isoformat(), float(accuracy_value), int(mistakes)])
+    return new_quiz_df, states
+
+def topic_stats_from_state(state):
+    # Same columns, rounding and ordering as utils.calculate_topic_stats
+    rows = []
+    for topic in sorted(state['topics']):
+        totals = state['topics'][topic]
+        rows.append({
+            'quiz_topic': topic,
+            'avg_accuracy': totals['accuracy_sum'] / totals['count'],
+            'attempt_count': totals['count'],
+            'total_mistakes_corrected': totals['mistakes_sum'],
+            'avg_mistakes_corrected': totals['mistakes_sum'] / totals['count'],
+            'avg_improvement': (totals['improvement_sum'] / totals['improvement_count']
+                                if totals['improvement_count'] else float('nan'))
+        })
+    topic_stats = pd.DataFrame(rows, columns=['quiz_topic', 'avg_accuracy', 'attempt_count', 'total_mistakes_corrected',
+                                              'avg_mistakes_corrected', 'avg_improvement'])
+    topic_stats = topic_stats.set_index('quiz_topic').round(3)
+    return topic_stats.sort_values('avg_accuracy', ascending=False, kind='stable')
+
+def summary_from_state(state):
+    # Same keys as utils.summarize_history; the window means were cached by the last fold
+    count = state['count']
+    window_stats = state['window_stats']
+    recent = window_stats.get(window_label(RECENT_WINDOW), {'accuracy': float('nan'), 'corrections': float('nan')})
+    return {
+        'overall_accuracy': state['accuracy_sum'] / count if count else float('nan'),
+        'recent_accuracy': recent['accuracy'],
+        'mistake_correction_rate': state['mistakes_sum'] / count if count else float('nan'),
+        'recent_corrections': recent['corrections'],
+        'accuracy_std': math.sqrt(state['accuracy_m2'] / (count - 1)) if count > 1 else float('nan'),
+        'windows': {window_label(spec): window_stats[window_label(spec)] for spec in state['windows']} if count else {}
+    }
+
+def timeline_frame(state, state_path=None):
+    # The saved timeline rows from the timeline file plus those folded since
+    rows = []
+    if state_path and state['timeline_bytes']:
+        with open(timeline_path(state_path), 'rb') as f:
+            rows = [json.loads(line) for line in f.read(state['timeline_bytes']).splitlines()]
+    timeline_df = pd.DataFrame(rows + state['timeline'], columns=['submitted_at', 'accuracy', 'mistakes_corrected'])
+    timeline_df['submitted_at'] = pd.to_datetime(timeline_df['submitted_at'])
+    return timeline_df
+
+def _values_match(incremental_value, full_value):
+    if isinstance(full_value, dict):
+        return all(_values_match(incremental_value.get(key), value) for key, value in full_value.items())
+    if isinstance(full_value, float):
+        if math.isnan(full_value):
+            return incremental_value is not None and math.isnan(incremental_value)
+        return incremental_value is not None and math.isclose(incremental_value, full_value, rel_tol=1e-9, abs_tol=1e-12)
+    return incremental_value == full_value
+
+def verify_state(topic_stats, outputs, full_topic_stats, full_outputs):
+    # Compares incremental results against a full recompute, returning a list of mismatch descriptions
+    mismatches = []
+    try:
+        pd.testing.assert_frame_equal(topic_stats, full_topic_stats, check_dtype=False, check_exact=False,
+                                      check_index_type=False, check_categorical=False)
+    except AssertionError as e:
+        mismatches.append(f"topic_stats: {e}")
+    for name, value in outputs.items():
+        if not _values_match(value, full_outputs[name]):
+            mismatches.append(f"{name}: {value!r} != {full_outputs[name]!r}")
+    return mismatches
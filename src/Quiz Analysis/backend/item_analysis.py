@@ -0,0 +1,238 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Bytes held per buffered response (question id, option id, submission index, and the
+# looked-up option row/question row/correct flag); used to turn a memory budget into a chunk size
+BYTES_PER_RESPONSE = 48
+DEFAULT_MEMORY_MB = 256
+DISTRACTOR_MIN_PICK_RATE = 0.05
+
+def chunk_responses_for(memory_mb):
+    return max(1000, int(memory_mb * 2**20 // BYTES_PER_RESPONSE))
+
+def new_item_state(options):
+    # Every aggregate is a sum, so states from different chunks or processes merge by addition.
+    # options is the option-level table from create_expanded_options or question_bank.build_question_bank
+    # (question_id, option_id, is_correct, topic). Per question and total score s of the submission:
+    #   attempts[q, s] = responses to q from submissions scoring s
+    #   correct[q, s]  = correct responses to q from submissions scoring s
+    questions = options['question_id'].drop_duplicates().to_numpy()
+    return {
+        'questions': questions,
+        'option_keys': pd.MultiIndex.from_arrays([options['question_id'].to_numpy(), options['option_id'].to_numpy()]),
+        'option_question': pd.Index(questions).get_indexer(options['question_id'].to_numpy()),
+        'option_correct': options['is_correct'].to_numpy(dtype=bool),
+        'picks': np.zeros(len(options), dtype=np.int64),
+        'attempts': np.zeros((len(questions), 1), dtype=np.int64),
+        'correct': np.zeros((len(questions), 1), dtype=np.int64),
+        'submissions': 0,
+        'responses': 0,
+        'unmatched': 0
+    }
+
+def responses_from_submissions(historical_quiz_data):
+    # Flattens each submission's response_map {question_id: option_id} into columns
+    counts, question_ids, option_ids = [], [], []
+    for submission in historical_quiz_data:
+        response_map = submission.get('response_map') or {}
+        counts.append(len(response_map))
+        question_ids.extend(response_map.keys())
+        option_ids.extend(response_map.values())
+    return {
+        'submission': np.repeat(np.arange(len(counts)), counts),
+        'question_id': np.array(question_ids, dtype=np.int64),
+        'option_id': np.array(option_ids, dtype=np.int64),
+        'submissions': len(counts)
+    }
+
+def _grow_bins(state, bins):
+    for key in ('attempts', 'correct'):
+        if state[key].shape[1] < bins:
+            grown = np.zeros((state[key].shape[0], bins), dtype=np.int64)
+            grown[:, :state[key].shape[1]] = state[key]
+            state[key] = grown
+
+def fold_responses(state, responses):
+    # Adds one chunk of responses (whole submissions only, since scores are per submission)
+    rows = state['option_keys'].get_indexer(pd.MultiIndex.from_arrays([responses['question_id'],
+                                                                      responses['option_id']]))
+    matched = rows >= 0
+    state['unmatched'] += int((~matched).sum())
+    rows = rows[matched]
+    submission = responses['submission'][matched]
+    is_correct = state['option_correct'][rows]
+    question = state['option_question'][rows]
+
+    # Total score of each submission over the matched responses
+    score = np.bincount(submission, weights=is_correct, minlength=responses['submissions']).astype(np.int64)
+    response_score = score[submission]
+    bins = int(score.max()) + 1 if len(score) else 1
+    _grow_bins(state, bins)
+    cells = question * state['attempts'].shape[1] + response_score
+    size = state['attempts'].size
+    state['attempts'] += np.bincount(cells, minlength=size).reshape(state['attempts'].shape)
+    state['correct'] += np.bincount(cells[is_correct], minlength=size).reshape(state['correct'].shape)
+    state['picks'] += np.bincount(rows, minlength=len(state['picks']))
+    state['submissions'] += responses['submissions']
+    state['responses'] += int(matched.sum())
+    return state
+
+def merge_item_states(left, right):
+    bins = max(left['attempts'].shape[1], right['attempts'].shape[1])
+    _grow_bins(left, bins)
+    _grow_bins(right, bins)
+    for key in ('picks', 'attempts', 'correct'):
+        left[key] = left[key] + right[key]
+    for key in ('submissions', 'responses', 'unmatched'):
+        left[key] += right[key]
+    return left
+
+def _score_cut(attempts_by_score, fraction):
+    # Lowest score s such that at least `fraction` of submissions-responses score <= s
+    cumulative = np.cumsum(attempts_by_score)
+    return int(np.searchsorted(cumulative, fraction * cumulative[-1]))
+
+def item_statistics(state, options, group_fraction=0.27):
+    # Returns (questions, options, topics) frames:
+    #   difficulty      share of responses that were correct (classical p-value)
+    #   discrimination  point-biserial correlation of the item with the rest score
+    #                   (submission score minus this item), from the summed score bins
+    #   upper_lower     p(correct) in the top group minus the bottom group (27% by score)
+    attempts, correct = state['attempts'], state['correct']
+    scores = np.arange(attempts.shape[1])
+    n = attempts.sum(axis=1).astype(float)
+    sum_x = correct.sum(axis=1).astype(float)
+    sum_total = attempts @ scores
+    sum_total_sq = attempts @ (scores ** 2)
+    sum_x_total = correct @ scores
+    sum_rest = sum_total - sum_x
+    sum_rest_sq = sum_total_sq - 2 * sum_x_total + sum_x
+    sum_x_rest = sum_x_total - sum_x
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        difficulty = sum_x / n
+        covariance = n * sum_x_rest - sum_x * sum_rest
+        spread = np.sqrt((n * sum_x - sum_x ** 2) * (n * sum_rest_sq - sum_rest ** 2))
+        discrimination = np.where(spread > 0, covariance / spread, np.nan)
+
+        # Score groups come from the whole cohort's score distribution
+        overall = attempts.sum(axis=0)
+        lower_cut = _score_cut(overall, group_fraction) if overall.sum() else 0
+        upper_cut = _score_cut(overall, 1 - group_fraction) if overall.sum() else 0
+        lower = correct[:, :lower_cut + 1].sum(axis=1) / attempts[:, :lower_cut + 1].sum(axis=1)
+        upper = correct[:, upper_cut:].sum(axis=1) / attempts[:, upper_cut:].sum(axis=1)
+
+    topics = options.drop_duplicates('question_id').set_index('question_id')['topic']
+    question_stats = pd.DataFrame({
+        'question_id': state['questions'],
+        'topic': topics.reindex(state['questions']).to_numpy(),
+        'responses': n.astype(np.int64),
+        'difficulty': difficulty,
+        'discrimination': discrimination,
+        'upper_lower': upper - lower
+    })
+
+    picks = state['picks']
+    question_responses = np.bincount(state['option_question'], weights=picks, minlength=len(state['questions']))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pick_rate = picks / question_responses[state['option_question']]
+    option_stats = options[['question_id', 'option_id', 'is_correct']].reset_index(drop=True).assign(
+        picks=picks, pick_rate=pick_rate)
+    # Distractors almost nobody picks aren't doing any work
+    option_stats['weak_distractor'] = ~option_stats['is_correct'] & (option_stats['pick_rate'] < DISTRACTOR_MIN_PICK_RATE)
+
+    topic_stats = question_stats.groupby('topic', observed=True, sort=True).agg(
+        questions=('question_id', 'size'),
+        responses=('responses', 'sum'),
+        avg_difficulty=('difficulty', 'mean'),
+        avg_discrimination=('discrimination', 'mean'),
+        low_discrimination=('discrimination', lambda d: int((d < 0.2).sum()))
+    ).reset_index()
+    return question_stats, option_stats, topic_stats
+
+def analyze_sources(sources, options, memory_mb=DEFAULT_MEMORY_MB, fetch_options=None):
+    # Folds the submissions of every historical source (URL or path), buffering whole
+    # submissions until the chunk's response budget is reached
+    from cache import cached_fetcher
+    fetcher = cached_fetcher(**(fetch_options or {}))
+    limit = chunk_responses_for(memory_mb)
+    state = new_item_state(options)
+    buffered, buffered_responses = [], 0
+    for source in sources:
+        if source.startswith(('http://', 'https://')):
+            historical_quiz_data = fetcher.fetch_json(source)
+        else:
+            with open(source) as f:
+                historical_quiz_data = json.load(f)
+        for submission in historical_quiz_data:
+            buffered.append(submission)
+            buffered_responses += len(submission.get('response_map') or {})
+            if buffered_responses >= limit:
+                fold_responses(state, responses_from_submissions(buffered))
+                buffered, buffered_responses = [], 0
+    if buffered:
+        fold_responses(state, responses_from_submissions(buffered))
+    return state
+
+def main():
+    from batch import load_manifest
+    from cache import DEFAULT_CACHE_DIR
+    from question_bank import build_question_bank
+
+    parser = argparse.ArgumentParser(description="Item analysis (difficulty, discrimination, distractors) for a cohort")
+    parser.add_argument('manifest', help="JSON or CSV manifest with student_id, quiz_endpoint and historical")
+    parser.add_argument('--output-dir', default='output/item_analysis', help="Where the CSV tables are written")
+    parser.add_argument('--memory-mb', type=float, default=DEFAULT_MEMORY_MB,
+                        help="Approximate memory for buffered responses per worker")
+    parser.add_argument('--workers', type=int, default=1, help="Processes, each folding a slice of the manifest")
+    parser.add_argument('--fixtures', help="Serve manifest URLs from a local directory of <id>.json files")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="Local payload cache directory")
+    args = parser.parse_args()
+
+    manifest = load_manifest(args.manifest)
+    fetch_options = {'fixtures_dir': args.fixtures, 'cache_dir': args.cache_dir or None}
+    started = time.perf_counter()
+
+    # The question bank is every distinct quiz the cohort was given
+    from cache import cached_fetcher
+    fetcher = cached_fetcher(**fetch_options)
+    quiz_payloads = []
+    for source in dict.fromkeys(entry['quiz_endpoint'] for entry in manifest):
+        if source.startswith(('http://', 'https://')):
+            quiz_payloads.append(fetcher.fetch_json(source))
+        else:
+            with open(source) as f:
+                quiz_payloads.append(json.load(f))
+    _, options = build_question_bank(quiz_payloads)
+    options = options.drop_duplicates(['question_id', 'option_id']).reset_index(drop=True)
+
+    sources = [entry['historical'] for entry in manifest]
+    if args.workers > 1:
+        slices = [sources[i::args.workers] for i in range(args.workers)]
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            states = list(executor.map(analyze_sources, slices, [options] * len(slices),
+                                       [args.memory_mb / args.workers] * len(slices), [fetch_options] * len(slices)))
+        state = states[0]
+        for other in states[1:]:
+            state = merge_item_states(state, other)
+    else:
+        state = analyze_sources(sources, options, args.memory_mb, fetch_options)
+
+    question_stats, option_stats, topic_stats = item_statistics(state, options)
+    os.makedirs(args.output_dir, exist_ok=True)
+    question_stats.to_csv(os.path.join(args.output_dir, 'questions.csv'), index=False)
+    option_stats.to_csv(os.path.join(args.output_dir, 'options.csv'), index=False)
+    topic_stats.to_csv(os.path.join(args.output_dir, 'topics.csv'), index=False)
+
+    elapsed = time.perf_counter() - started
+    print(f"Analyzed {state['responses']} responses from {state['submissions']} submissions "
+          f"({state['unmatched']} unmatched) in {elapsed:.1f}s -> {args.output_dir}")
+
+if __name__ == "__main__":
+    main()
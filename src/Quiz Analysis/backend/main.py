@@ -1,58 +1,47 @@
-import json
-import pandas as pd
-import requests
-from utils import (
-    process_current_quiz_data, 
-    process_historical_quiz_data, 
-    create_expanded_options, 
-    analyze_and_recommend, 
-    calculate_topic_stats, 
-    prepare_visualization_data,
-    create_visualizations  # Add this new import
-)
-
-def main():
+import argparse
+import os
+from cube import ALL_COHORTS, load_cube
+from cache import DEFAULT_CACHE_DIR, DEFAULT_TTL, cached_fetcher
+from pipeline import run_pipeline
+from profiling import NULL_PROFILER, Profiler, print_summary
+from rolling import DEFAULT_WINDOWS
+from rules import load_rules
+
+def main(fetcher=None, profiler=None, windows=DEFAULT_WINDOWS, rules=None, cube=None, cohort=ALL_COHORTS):
     # Step 1: Load data from APIs
     current_quiz_submission_url = "https://api.jsonserve.com/rJvd7g"
     current_quiz_endpoint_url = "https://www.jsonkeeper.com/b/LLQT"
     historical_quiz_url = "https://api.jsonserve.com/XgAgFJ"
 
-    try:
-        current_quiz_submission_data = requests.get(current_quiz_submission_url).json()
-        current_quiz_endpoint_data = requests.get(current_quiz_endpoint_url).json()
-        historical_quiz_data = requests.get(historical_quiz_url).json()
-    except requests.RequestException as e:
-        print(f"Error fetching data: {e}")
+    fetcher = fetcher or cached_fetcher()
+    with (profiler or NULL_PROFILER).stage('load'):
+        payloads, errors = fetcher.fetch_many([
+            current_quiz_submission_url,
+            current_quiz_endpoint_url,
+            historical_quiz_url
+        ])
+    if errors:
+        for error in errors.values():
+            print(f"Error fetching data: {error}")
         return
 
-    # Step 2: Process Current Quiz Data
-    current_quiz_df = process_current_quiz_data(current_quiz_endpoint_data)
+    current_quiz_submission_data = payloads[current_quiz_submission_url]
+    current_quiz_endpoint_data = payloads[current_quiz_endpoint_url]
+    historical_quiz_data = payloads[historical_quiz_url]
 
-    # Step 3: Process Historical Quiz Data
-    historical_quiz_df = process_historical_quiz_data(historical_quiz_data)
+    # Steps 2-10: Process, analyze, visualize and export
+    result = run_pipeline(current_quiz_endpoint_data, historical_quiz_data, profiler=profiler, windows=windows,
+                          rules=rules, cube=cube, cohort=cohort)
+    print_report(result, rules)
 
-    # Step 4: Clean accuracy and score data
-    historical_quiz_df['accuracy'] = historical_quiz_df['accuracy'].str.rstrip(' %').astype(float) / 100
-    historical_quiz_df['final_score'] = pd.to_numeric(historical_quiz_df['final_score'])
-
-    # Step 5: Create expanded options
-    current_quiz_expanded_df = create_expanded_options(current_quiz_df)
-
-    # Step 6: Calculate rolling averages
-    historical_quiz_df['rolling_accuracy'] = historical_quiz_df['accuracy'].rolling(window=3, min_periods=1).mean()
-    historical_quiz_df['rolling_mistakes'] = historical_quiz_df['incorrect_answers'].rolling(window=3, min_periods=1).mean()
-    historical_quiz_df['improvement_rate'] = historical_quiz_df['accuracy'].diff()
-
-    # Step 7: Calculate topic statistics
-    topic_stats = calculate_topic_stats(historical_quiz_df)
-
-    # Step 8: Generate insights and recommendations
-    insights, recommendations, persona, performance_labels = analyze_and_recommend(historical_quiz_df, topic_stats)
-
-    # Step 9: Generate visualizations
-    create_visualizations(historical_quiz_df, topic_stats, insights)
+def print_report(result, rules=None):
+    insights = result['insights']
+    recommendations = result['recommendations']
+    persona = result['persona']
+    performance_labels = result['performance_labels']
 
     # Display results
+    rules = rules or load_rules()
     print("\n" + "="*50)
     print("        STUDENT PERFORMANCE ANALYSIS REPORT        ")
     print("="*50)
@@ -62,18 +51,27 @@ def main():
     print(f"• Overall Accuracy: {insights['trending']['overall_accuracy']:.1%}")
     print(f"• Recent Performance: {insights['trending']['recent_accuracy']:.1%}")
     print(f"• Trend: {'Improving' if insights['trending']['improvement'] else 'Needs Attention'}")
+    for label, window in insights['trending'].get('windows', {}).items():
+        print(f"• Window {label}: {window['accuracy']:.1%} over {window['attempts']} attempts")
     print(f"• Average Mistakes Corrected: {insights['learning']['mistake_correction_rate']:.1f}")
 
     print("\n2. TOPIC MASTERY")
     print("-"*30)
-    print("\nStrong Topics (≥70% accuracy):")
+    print(f"\nStrong Topics ({rules.describe_group('strong')}):")
     for topic in insights['topics']['strong']:
         print(f"• {topic}")
     
-    print("\nWeak Topics (<60% accuracy):")
+    print(f"\nWeak Topics ({rules.describe_group('weak')}):")
     for topic in insights['topics']['weak']:
         print(f"• {topic}")
 
+    compared = [t for t in result['viz_data']['topicPerformance'] if 'cohortPercentile' in t]
+    if compared:
+        print("\nCompared with the Cohort:")
+        for topic in compared:
+            print(f"• {topic['name']}: {topic['accuracy']:.1f}% vs cohort {topic['cohortAccuracy']:.1f}% "
+                  f"(percentile {topic['cohortPercentile']:.0f} among students)")
+
     print("\n3. RECOMMENDED ACTIONS")
     print("-"*30)
     print("\nPriority Actions:")
@@ -110,12 +108,34 @@ def main():
     for challenge in performance_labels['challenges']:
         print(f"• {challenge}")
 
-    # Save data for visualization
-    prepare_visualization_data(historical_quiz_df, insights, topic_stats, recommendations, persona, performance_labels)
-    
     print("\n" + "="*50)
     print("Analysis complete. Check 'output/visualizations' for detailed graphs.")
     print("="*50 + "\n")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Analyze a student's quiz performance")
+    parser.add_argument('--fixtures', help="Serve API URLs from a local directory of <id>.json files")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="Local payload cache directory")
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_TTL, help="Seconds before cached payloads are revalidated")
+    network = parser.add_mutually_exclusive_group()
+    network.add_argument('--no-cache', action='store_true', help="Always fetch from the network")
+    network.add_argument('--offline', action='store_true', help="Run purely from the local cache")
+    parser.add_argument('--profile', metavar='DIR',
+                        help="Write per-step time and memory to DIR/profile.json and DIR/metrics.prom")
+    parser.add_argument('--profile-dumps', action='store_true',
+                        help="With --profile, also write cProfile and tracemalloc dumps to DIR")
+    parser.add_argument('--windows', nargs='+', default=list(DEFAULT_WINDOWS),
+                        help="Rolling/trend windows: attempt counts (3) or durations (7D, 30D)")
+    parser.add_argument('--rules', help="Rules file for personas, labels and recommendations (default: rules.json)")
+    parser.add_argument('--cube', help="Cohort cube from cube.py; adds per-topic cohort percentiles")
+    parser.add_argument('--cohort', default=ALL_COHORTS, help="Cohort in the cube to compare with (default: everyone)")
+    args = parser.parse_args()
+    profiler = Profiler(trace_memory=args.profile_dumps, cprofile=args.profile_dumps) if args.profile else None
+    main(cached_fetcher(args.fixtures, cache_dir=None if args.no_cache else args.cache_dir,
+                        ttl=args.cache_ttl, offline=args.offline), profiler=profiler, windows=args.windows,
+         rules=load_rules(args.rules), cube=load_cube(args.cube) if args.cube else None, cohort=args.cohort)
+    if profiler:
+        profiler.write_json(os.path.join(args.profile, 'profile.json'))
+        profiler.write_prometheus(os.path.join(args.profile, 'metrics.prom'))
+        profiler.dump_profiles(os.path.join(args.profile, 'pipeline'))
+        print_summary(profiler.summary())
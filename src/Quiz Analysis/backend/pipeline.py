@@ -0,0 +1,161 @@
+import json
+import os
+import incremental
+import profiling
+import render
+from cube import ALL_COHORTS
+from rolling import DEFAULT_WINDOWS
+from utils import (
+    process_current_quiz_data,
+    process_historical_quiz_data,
+    clean_historical_quiz_data,
+    add_rolling_metrics,
+    create_expanded_options,
+    analyze_and_recommend,
+    recommend_from_summary,
+    calculate_topic_stats,
+    prepare_visualization_data,
+    create_visualizations
+)
+
+def _output_paths(output_dir):
+    # Paths default to the single-student layout used by main.py
+    if output_dir is None:
+        return 'output/visualizations', 'frontend/public/data/viz_data.json'
+    return os.path.join(output_dir, 'visualizations'), os.path.join(output_dir, 'viz_data.json')
+
+def run_pipeline(current_quiz_endpoint_data, historical_quiz_data, output_dir=None, render_charts=True, verbose=True,
+                 historical_quiz_df=None, chart_workers=None, chart_data_only=False, profiler=None,
+                 windows=DEFAULT_WINDOWS, rules=None, cube=None, cohort=ALL_COHORTS):
+    # historical_quiz_df may be passed instead of historical_quiz_data when it was loaded
+    # already cleaned and typed from the columnar store (see storage.py). chart_data_only
+    # writes chart_data.json next to viz_data.json for the dashboard instead of PNGs.
+    # profiler (see profiling.py) records time and memory for each step. windows are the
+    # rolling/trend windows (see rolling.py) and rules the compiled rules file (see rules.py).
+    # cube (see cube.py) adds the student's percentile within cohort to each topic in the export.
+    visualizations_dir, viz_data_path = _output_paths(output_dir)
+    profiler = profiler or profiling.NULL_PROFILER
+
+    # Step 2: Process Current Quiz Data
+    with profiler.stage('process_current'):
+        current_quiz_df = process_current_quiz_data(current_quiz_endpoint_data)
+
+    if historical_quiz_df is None:
+        # Step 3: Process Historical Quiz Data
+        with profiler.stage('process_historical'):
+            historical_quiz_df = process_historical_quiz_data(historical_quiz_data)
+
+        # Step 4: Clean accuracy and score data
+        with profiler.stage('clean_historical'):
+            historical_quiz_df = clean_historical_quiz_data(historical_quiz_df)
+
+    # Step 5: Create expanded options
+    with profiler.stage('expand_options'):
+        current_quiz_expanded_df = create_expanded_options(current_quiz_df)
+
+    # Step 6: Calculate rolling averages
+    with profiler.stage('rolling_metrics'):
+        historical_quiz_df = add_rolling_metrics(historical_quiz_df, windows)
+
+    # Step 7: Calculate topic statistics
+    with profiler.stage('topic_stats'):
+        topic_stats = calculate_topic_stats(historical_quiz_df)
+
+    # Step 8: Generate insights and recommendations
+    with profiler.stage('insights'):
+        insights, recommendations, persona, performance_labels = analyze_and_recommend(historical_quiz_df,
+                                                                                       topic_stats, windows, rules)
+
+    # Step 9: Generate visualizations
+    with profiler.stage('visualizations'):
+        if chart_data_only:
+            render.render_charts(historical_quiz_df, topic_stats, insights,
+                                 output_dir=os.path.dirname(viz_data_path) or '.', data_only=True)
+        elif render_charts:
+            create_visualizations(historical_quiz_df, topic_stats, insights,
+                                  output_dir=visualizations_dir, verbose=verbose, workers=chart_workers)
+
+    # Step 10: Save data for visualization
+    with profiler.stage('export'):
+        viz_data = prepare_visualization_data(historical_quiz_df, insights, topic_stats, recommendations, persona,
+                                              performance_labels, output_path=viz_data_path, cube=cube, cohort=cohort)
+
+    return {
+        'current_quiz_df': current_quiz_df,
+        'current_quiz_expanded_df': current_quiz_expanded_df,
+        'historical_quiz_df': historical_quiz_df,
+        'topic_stats': topic_stats,
+        'insights': insights,
+        'recommendations': recommendations,
+        'persona': persona,
+        'performance_labels': performance_labels,
+        'viz_data': viz_data
+    }
+
+def run_incremental_pipeline(historical_quiz_data, state_path, output_dir=None, check=False, profiler=None,
+                             windows=DEFAULT_WINDOWS, rules=None, cube=None, cohort=ALL_COHORTS, full_history=True):
+    # Folds only submissions newer than the stored state into the per-student aggregates,
+    # then derives topic stats, insights and the viz_data export from those aggregates.
+    # full_history: historical_quiz_data is the student's whole history, so submissions that
+    # arrived late (older than the state) are detected and the state is rebuilt from it. Otherwise
+    # (e.g. watch.py passing only new submissions) older ones are counted as skipped_submissions.
+    _, viz_data_path = _output_paths(output_dir)
+    profiler = profiler or profiling.NULL_PROFILER
+    rebuilt = False
+    with profiler.stage('select_new'):
+        state = incremental.load_state(state_path, windows)
+        new_submissions, older = incremental.select_new_submissions(state, historical_quiz_data)
+        if full_history and incremental.history_changed(state, older):
+            state = incremental.new_state(windows)
+            new_submissions, older = incremental.select_new_submissions(state, historical_quiz_data)
+            rebuilt = True
+    skipped = 0 if full_history else older
+    # Nothing new: the stored viz_data.json is still current and isn't rewritten, but the result
+    # has the same keys, with topic stats and insights re-derived from the (cheap) state
+    unchanged = not new_submissions and not check and os.path.exists(viz_data_path)
+
+    if new_submissions:
+        with profiler.stage('fold'):
+            new_quiz_df = clean_historical_quiz_data(process_historical_quiz_data(new_submissions))
+            _, state = incremental.fold_submissions(state, new_quiz_df)
+            incremental.remember_watermark(state, new_submissions)
+
+    with profiler.stage('insights'):
+        topic_stats = incremental.topic_stats_from_state(state)
+        insights, recommendations, persona, performance_labels = recommend_from_summary(
+            incremental.summary_from_state(state), topic_stats, rules)
+    outputs = {
+        'insights': insights,
+        'recommendations': recommendations,
+        'persona': persona,
+        'performance_labels': performance_labels
+    }
+
+    if check:
+        with profiler.stage('check'):
+            historical_quiz_df = add_rolling_metrics(clean_historical_quiz_data(
+                process_historical_quiz_data(historical_quiz_data)), windows)
+            full_topic_stats = calculate_topic_stats(historical_quiz_df)
+            full_insights, full_recommendations, full_persona, full_labels = analyze_and_recommend(
+                historical_quiz_df, full_topic_stats, windows, rules)
+            mismatches = incremental.verify_state(topic_stats, outputs, full_topic_stats, {
+                'insights': full_insights,
+                'recommendations': full_recommendations,
+                'persona': full_persona,
+                'performance_labels': full_labels
+            })
+        if mismatches:
+            raise ValueError("incremental results differ from full recompute: " + "; ".join(mismatches))
+
+    with profiler.stage('export'):
+        if unchanged:
+            with open(viz_data_path) as f:
+                viz_data = json.load(f)
+            return dict(outputs, topic_stats=topic_stats, viz_data=viz_data, new_submissions=0,
+                        skipped_submissions=skipped, rebuilt=False)
+        viz_data = prepare_visualization_data(incremental.timeline_frame(state, state_path), insights, topic_stats, recommendations,
+                                              persona, performance_labels, output_path=viz_data_path, cube=cube,
+                                              cohort=cohort)
+        incremental.save_state(state_path, state)
+    return dict(outputs, topic_stats=topic_stats, viz_data=viz_data, new_submissions=len(new_submissions),
+                skipped_submissions=skipped, rebuilt=rebuilt)
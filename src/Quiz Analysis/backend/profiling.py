@@ -0,0 +1,192 @@
+import contextlib
+import cProfile
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+# ru_maxrss is reported in KiB on Linux and bytes on macOS
+_RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+def process_peak_rss_bytes():
+    # Peak RSS over the whole process lifetime; only ever grows, so it is not per stage
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_UNIT
+
+def reset_peak_rss():
+    # Linux resets VmHWM (the peak RSS) to the current RSS when 5 is written to clear_refs;
+    # returns False where that isn't available (macOS, restricted /proc)
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def high_water_rss_bytes():
+    # Peak RSS since the last reset_peak_rss
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) * 1024
+
+# Per-record memory figures; summaries keep the largest of each
+MEMORY_KEYS = ['peak_rss_bytes', 'peak_rss_growth_bytes', 'process_peak_rss_bytes', 'peak_traced_bytes']
+
+class Profiler:
+    # Records wall time, CPU time and peak memory for each pipeline stage, labelled with the
+    # student being analyzed. On Linux the peak RSS is reset at stage entry, so peak_rss_bytes is
+    # the stage's own peak and peak_rss_growth_bytes how far it rose above the RSS at entry;
+    # elsewhere only process_peak_rss_bytes (process lifetime) is recorded. Stages must not nest.
+    # trace_memory adds per-stage peaks of Python/numpy allocations via tracemalloc (slower);
+    # cprofile collects a cProfile of everything run inside stages.
+    def __init__(self, trace_memory=False, cprofile=False):
+        self.records = []
+        self.student_id = None
+        self.trace_memory = trace_memory
+        self.cprofile = cProfile.Profile() if cprofile else None
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def student(self, student_id):
+        previous, self.student_id = self.student_id, student_id
+        try:
+            yield self
+        finally:
+            self.student_id = previous
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        entry_rss = high_water_rss_bytes() if reset_peak_rss() else None
+        if self.cprofile:
+            self.cprofile.enable()
+        wall_started = time.perf_counter()
+        cpu_started = time.process_time()
+        try:
+            yield
+        finally:
+            record = {
+                'student_id': self.student_id,
+                'stage': name,
+                'wall_seconds': time.perf_counter() - wall_started,
+                'cpu_seconds': time.process_time() - cpu_started
+            }
+            if self.cprofile:
+                self.cprofile.disable()
+            if entry_rss is not None:
+                record['peak_rss_bytes'] = high_water_rss_bytes()
+                record['peak_rss_growth_bytes'] = record['peak_rss_bytes'] - entry_rss
+            else:
+                record['process_peak_rss_bytes'] = process_peak_rss_bytes()
+            if self.trace_memory:
+                record['peak_traced_bytes'] = tracemalloc.get_traced_memory()[1]
+            self.records.append(record)
+
+    def summary(self):
+        # Per-stage totals in first-seen order
+        stages = {}
+        for record in self.records:
+            stats = stages.setdefault(record['stage'], {
+                'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'max_wall_seconds': 0.0
+            })
+            stats['calls'] += 1
+            stats['wall_seconds'] += record['wall_seconds']
+            stats['cpu_seconds'] += record['cpu_seconds']
+            stats['max_wall_seconds'] = max(stats['max_wall_seconds'], record['wall_seconds'])
+            for key in MEMORY_KEYS:
+                if key in record:
+                    stats[key] = max(stats.get(key, 0), record[key])
+        return stages
+
+    def to_dict(self):
+        return {'stages': self.summary(), 'records': self.records}
+
+    def write_json(self, path):
+        write_metrics_json(path, self.to_dict())
+
+    def write_prometheus(self, path):
+        _write_text(path, prometheus_text(self.summary()))
+
+    def dump_profiles(self, prefix, top=25):
+        # <prefix>.prof for pstats/snakeviz and <prefix>.tracemalloc.txt with the top allocation sites
+        paths = []
+        if os.path.dirname(prefix):
+            os.makedirs(os.path.dirname(prefix), exist_ok=True)
+        if self.cprofile:
+            self.cprofile.dump_stats(prefix + '.prof')
+            paths.append(prefix + '.prof')
+        if self.trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            snapshot.dump(prefix + '.tracemalloc')
+            lines = [str(stat) for stat in snapshot.statistics('lineno')[:top]]
+            _write_text(prefix + '.tracemalloc.txt', '\n'.join(lines) + '\n')
+            paths.extend([prefix + '.tracemalloc', prefix + '.tracemalloc.txt'])
+        return paths
+
+class NullProfiler:
+    # Stands in when profiling is off so the pipeline can always wrap its steps
+    def student(self, student_id):
+        return contextlib.nullcontext(self)
+
+    def stage(self, name):
+        return contextlib.nullcontext()
+
+NULL_PROFILER = NullProfiler()
+
+def merge_records(records):
+    # Aggregates records gathered in other processes (e.g. batch workers) into one Profiler
+    profiler = Profiler()
+    profiler.records = list(records)
+    return profiler
+
+def prometheus_text(stages, prefix='quiz_pipeline'):
+    metrics = [
+        ('stage_calls_total', 'counter', 'Times each pipeline stage ran', 'calls'),
+        ('stage_wall_seconds_total', 'counter', 'Wall-clock seconds spent in each stage', 'wall_seconds'),
+        ('stage_cpu_seconds_total', 'counter', 'CPU seconds spent in each stage', 'cpu_seconds'),
+        ('stage_max_wall_seconds', 'gauge', 'Slowest single run of each stage', 'max_wall_seconds'),
+        ('stage_peak_rss_bytes', 'gauge', 'Peak RSS reached within each stage', 'peak_rss_bytes'),
+        ('stage_peak_rss_growth_bytes', 'gauge', 'Largest rise of RSS above its value at stage entry',
+         'peak_rss_growth_bytes'),
+        ('process_peak_rss_bytes', 'gauge', 'Process-lifetime peak RSS observed at the end of each stage',
+         'process_peak_rss_bytes'),
+        ('stage_peak_traced_bytes', 'gauge', 'Peak traced allocations within each stage', 'peak_traced_bytes')
+    ]
+    lines = []
+    for name, kind, help_text, key in metrics:
+        samples = [(stage, stats[key]) for stage, stats in stages.items() if key in stats]
+        if not samples:
+            continue
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        for stage, value in samples:
+            lines.append(f'{prefix}_{name}{{stage="{stage}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+def write_metrics_json(path, data):
+    _write_text(path, json.dumps(data, indent=2))
+
+def _write_text(path, text):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+
+def print_summary(stages):
+    print("\n" + "="*50)
+    print("              PIPELINE STAGE TIMINGS              ")
+    print("="*50)
+    for stage, stats in stages.items():
+        if 'peak_rss_bytes' in stats:
+            memory = (f"{stats['peak_rss_bytes'] / 2**20:8.1f} MiB peak "
+                      f"(+{stats['peak_rss_growth_bytes'] / 2**20:.1f})")
+        else:
+            memory = f"{stats['process_peak_rss_bytes'] / 2**20:8.1f} MiB process peak"
+        print(f"• {stage:<22} {stats['wall_seconds']:8.3f}s wall {stats['cpu_seconds']:8.3f}s cpu "
+              f"{memory} ({stats['calls']} calls)")
+    print("="*50 + "\n")
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+def _quizzes(quiz_endpoint_data):
+    # Accepts one quiz endpoint payload or a list of them (a whole question bank)
+    payloads = quiz_endpoint_data if isinstance(quiz_endpoint_data, list) else [quiz_endpoint_data]
+    return [payload['quiz'] for payload in payloads]
+
+def _first_correct_rows(option_counts, is_correct):
+    # Row (in the options table) of each question's first correct option, -1 when none is flagged
+    option_question = np.repeat(np.arange(len(option_counts)), option_counts)
+    correct_rows = np.flatnonzero(is_correct)
+    answered, first_correct = np.unique(option_question[correct_rows], return_index=True)
+    rows = np.full(len(option_counts), -1, dtype=np.int64)
+    rows[answered] = correct_rows[first_correct]
+    return option_question, rows
+
+def flatten_quizzes(quiz_endpoint_data):
+    # Single pass over the quiz JSON into plain column arrays, at question and option level.
+    # Correctness comes from each option's is_correct flag, so questions with repeated option
+    # texts are still marked correctly.
+    quiz_ids, question_ids, topics, descriptions, option_counts = [], [], [], [], []
+    option_ids, option_texts, option_flags = [], [], []
+    for quiz in _quizzes(quiz_endpoint_data):
+        for question in quiz['questions']:
+            options = question['options']
+            quiz_ids.append(quiz.get('id', 0))
+            question_ids.append(question['id'])
+            topics.append(question['topic'])
+            descriptions.append(question['description'])
+            option_counts.append(len(options))
+            option_ids.extend([option['id'] for option in options])
+            option_texts.extend([option['description'] for option in options])
+            option_flags.extend([bool(option['is_correct']) for option in options])
+
+    option_counts = np.array(option_counts, dtype=np.int32)
+    option_ids = np.array(option_ids, dtype=np.int64)
+    is_correct = np.array(option_flags, dtype=bool)
+    option_question, correct_rows = _first_correct_rows(option_counts, is_correct)
+    return {
+        'quiz_id': np.array(quiz_ids, dtype=np.int64),
+        'question_id': np.array(question_ids, dtype=np.int64),
+        'topic': topics,
+        'description': descriptions,
+        'option_count': option_counts,
+        'correct_row': correct_rows,
+        'option_question': option_question,
+        'option_id': option_ids,
+        'option_text': option_texts,
+        'is_correct': is_correct
+    }
+
+def correct_option_ids(flat):
+    # Nullable ids: <NA> for questions without a correct option
+    ids = flat['option_id'][np.maximum(flat['correct_row'], 0)] if len(flat['option_id']) else \
+        np.zeros(len(flat['correct_row']), dtype=np.int64)
+    return pd.arrays.IntegerArray(ids, flat['correct_row'] < 0)
+
+def correct_option_texts(flat):
+    # Text of each question's correct option (None when no option is flagged correct)
+    texts = flat['option_text']
+    return [texts[row] if row >= 0 else None for row in flat['correct_row'].tolist()]
+
+def option_dicts(flat):
+    # {option_id: option_text} per question, the cell format process_current_quiz_data has always returned
+    ids = iter(flat['option_id'].tolist())
+    texts = iter(flat['option_text'])
+    return [{next(ids): next(texts) for _ in range(count)} for count in flat['option_count'].tolist()]
+
+def build_question_bank(quiz_endpoint_data):
+    # Typed question and option tables for a quiz or a whole bank of them:
+    #   questions: quiz_id, question_id, topic, description, option_count, correct_option_id
+    #   options:   quiz_id, question_id, topic, option_id, option_text, is_correct
+    # Topics are categorical and ids are integers.
+    flat = flatten_quizzes(quiz_endpoint_data)
+    topics = pd.Categorical(flat['topic'])
+    option_question = flat['option_question']
+    questions = pd.DataFrame({
+        'quiz_id': flat['quiz_id'],
+        'question_id': flat['question_id'],
+        'topic': topics,
+        'description': flat['description'],
+        'option_count': flat['option_count'],
+        'correct_option_id': correct_option_ids(flat)
+    })
+    options = pd.DataFrame({
+        'quiz_id': flat['quiz_id'][option_question],
+        'question_id': flat['question_id'][option_question],
+        'topic': pd.Categorical.from_codes(topics.codes[option_question], topics.categories),
+        'option_id': flat['option_id'],
+        'option_text': flat['option_text'],
+        'is_correct': flat['is_correct']
+    })
+    return questions, options
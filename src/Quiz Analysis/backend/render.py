@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Bump when chart code changes so existing PNGs are re-rendered instead of skipped
+CHART_VERSION = 1
+FINGERPRINTS_FILE = '.fingerprints.json'
+CHART_DATA_FILE = 'chart_data.json'
+CHART_NAMES = ['performance_timeline', 'topic_performance', 'topic_distribution', 'learning_progress']
+
+# Color definitions
+COLORS = {
+    'strong': '#4CAF50',  # Green
+    'weak': '#FF5722',    # Red
+    'neutral': '#FFC107', # Yellow
+    'accent': '#2196F3'   # Blue
+}
+
+def _duration_minutes(historical_quiz_df, row):
+    # duration_seconds from schema.normalize_history, or the raw "M:SS" string of older frames
+    if 'duration_seconds' in historical_quiz_df:
+        return int(historical_quiz_df['duration_seconds'].iloc[row]) // 60
+    return int(str(historical_quiz_df['duration'].iloc[row]).split(':')[0])
+
+def chart_inputs(historical_quiz_df, topic_stats, insights):
+    # Everything each chart draws, as plain JSON-able values: this is what gets fingerprinted,
+    # shipped to render workers and, in data-only mode, handed to the dashboard
+    topic_data = topic_stats.reset_index().groupby('quiz_topic', observed=True).agg({
+        'avg_accuracy': 'mean'
+    }).reset_index().sort_values('avg_accuracy', ascending=True)
+
+    middle = len(historical_quiz_df) // 2
+    progress_rows = [0, middle, -1]
+    return {
+        'performance_timeline': {
+            'dates': [ts.isoformat() for ts in historical_quiz_df['submitted_at']],
+            'accuracy': [float(a) * 100 for a in historical_quiz_df['accuracy']],
+            'mistakes_corrected': [int(m) for m in historical_quiz_df['mistakes_corrected']]
+        },
+        'topic_performance': {
+            'topics': [str(t) for t in topic_data['quiz_topic']],
+            'accuracy': [float(a) for a in topic_data['avg_accuracy']]
+        },
+        'topic_distribution': {
+            'labels': ['Strong Topics', 'Weak Topics', 'Needs Practice'],
+            'sizes': [len(set(insights['topics']['strong'])), len(set(insights['topics']['weak'])),
+                      len(set(insights['topics']['needs_practice']))]
+        },
+        'learning_progress': {
+            'metrics': ['Accuracy (%)', 'Mistakes Corrected', 'Time (minutes)'],
+            'columns': ['Initial', 'Middle', 'Recent'],
+            'values': [
+                [float(historical_quiz_df['accuracy'].iloc[i]) * 100 for i in progress_rows],
+                [float(historical_quiz_df['mistakes_corrected'].iloc[i]) for i in progress_rows],
+                [float(_duration_minutes(historical_quiz_df, i)) for i in progress_rows]
+            ]
+        }
+    }
+
+def fingerprint(name, data):
+    payload = json.dumps({'version': CHART_VERSION, 'chart': name, 'data': data}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _matplotlib():
+    # Imported on first render so fingerprinting and chart-data-only runs never load matplotlib;
+    # the Agg backend is set explicitly since nothing here needs a display
+    import matplotlib
+    matplotlib.use('Agg')
+    return matplotlib
+
+def _theme():
+    # The seaborn whitegrid theme as an rc dict, applied per figure instead of globally
+    import seaborn as sns
+    from cycler import cycler
+    rc = {}
+    rc.update(sns.axes_style('whitegrid'))
+    rc.update(sns.plotting_context('notebook'))
+    rc.update({
+        'axes.prop_cycle': cycler(color=sns.color_palette('viridis')),
+        'figure.figsize': [12, 6],
+        'savefig.dpi': 300,
+        'font.size': 10
+    })
+    return rc
+
+def _new_figure(figsize=(12, 6)):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+def _performance_timeline(data):
+    import pandas as pd
+    dates = pd.to_datetime(data['dates'])
+    fig = _new_figure()
+    ax1 = fig.add_subplot()
+
+    # Plot accuracy
+    ax1.set_xlabel('Date')
+    ax1.set_ylabel('Accuracy (%)', color=COLORS['strong'])
+    line1 = ax1.plot(dates, data['accuracy'], color=COLORS['strong'], marker='o', label='Accuracy')
+    ax1.tick_params(axis='y', labelcolor=COLORS['strong'])
+
+    # Create second axis for mistakes
+    ax2 = ax1.twinx()
+    ax2.set_ylabel('Mistakes Corrected', color=COLORS['accent'])
+    line2 = ax2.plot(dates, data['mistakes_corrected'], color=COLORS['accent'], marker='s',
+                     label='Mistakes Corrected')
+    ax2.tick_params(axis='y', labelcolor=COLORS['accent'])
+
+    # Combine legends
+    lines = line1 + line2
+    ax1.legend(lines, [l.get_label() for l in lines], loc='upper left')
+
+    ax2.set_title('Performance Timeline', pad=20, size=14)
+    ax1.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+    return fig
+
+def _topic_performance(data):
+    fig = _new_figure()
+    ax = fig.add_subplot()
+    colors = [COLORS['strong'] if x >= 0.7 else COLORS['weak'] if x < 0.6 else COLORS['neutral']
+              for x in data['accuracy']]
+    bars = ax.barh(data['topics'], [a * 100 for a in data['accuracy']], color=colors)
+
+    # Add value labels on bars
+    for bar in bars:
+        width = bar.get_width()
+        ax.text(width, bar.get_y() + bar.get_height() / 2, f'{width:.1f}%',
+                va='center', ha='left', fontweight='bold')
+
+    ax.set_title('Topic Performance Analysis', pad=20, size=14)
+    ax.set_xlabel('Accuracy (%)')
+    ax.set_ylabel('Topics')
+    ax.grid(True, alpha=0.3, axis='x')
+    fig.tight_layout()
+    return fig
+
+def _topic_distribution(data):
+    fig = _new_figure()
+    ax = fig.add_subplot()
+    ax.pie(data['sizes'], labels=data['labels'], colors=[COLORS['strong'], COLORS['weak'], COLORS['neutral']],
+           autopct='%1.1f%%', startangle=90, explode=(0.05, 0.05, 0.05))
+    ax.set_title('Topic Distribution', pad=20, size=14)
+    ax.axis('equal')
+    return fig
+
+def _learning_progress(data):
+    import pandas as pd
+    import seaborn as sns
+    fig = _new_figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+    progress_data = pd.DataFrame(data['values'], index=pd.Index(data['metrics'], name='Metric'),
+                                 columns=data['columns'])
+    sns.heatmap(progress_data, annot=True, cmap='RdYlGn', center=None, fmt='.1f',
+                cbar_kws={'label': 'Value'}, ax=ax)
+    ax.set_title('Learning Progress Analysis', pad=20, size=14)
+    fig.tight_layout()
+    return fig
+
+CHARTS = {
+    'performance_timeline': _performance_timeline,
+    'topic_performance': _topic_performance,
+    'topic_distribution': _topic_distribution,
+    'learning_progress': _learning_progress
+}
+
+def render_chart(name, data, path):
+    # Runs in worker processes too, so it only touches its own Figure (no pyplot state)
+    with _matplotlib().rc_context(_theme()):
+        fig = CHARTS[name](data)
+        fig.savefig(path)
+    return name
+
+def _load_fingerprints(output_dir):
+    try:
+        with open(os.path.join(output_dir, FINGERPRINTS_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def render_charts(historical_quiz_df, topic_stats, insights, output_dir='output/visualizations', workers=1,
+                  force=False, data_only=False):
+    # Returns {chart name: 'rendered' | 'skipped' | 'data'}. Charts whose input fingerprint
+    # matches the last render (and whose PNG still exists) are skipped. data_only writes the
+    # chart inputs to chart_data.json for the dashboard instead of rendering any PNGs.
+    # Written like viz_data.json (unique temp file, fsync, rename), so concurrent renders into the
+    # same directory never publish a torn file; imported here to keep numpy out of cold starts
+    from viz_export import write_json
+    os.makedirs(output_dir, exist_ok=True)
+    inputs = chart_inputs(historical_quiz_df, topic_stats, insights)
+
+    if data_only:
+        write_json(os.path.join(output_dir, CHART_DATA_FILE), inputs)
+        return {name: 'data' for name in CHART_NAMES}
+
+    previous = {} if force else _load_fingerprints(output_dir)
+    current = {name: fingerprint(name, inputs[name]) for name in CHART_NAMES}
+    status = {}
+    pending = []
+    for name in CHART_NAMES:
+        path = os.path.join(output_dir, f'{name}.png')
+        if previous.get(name) == current[name] and os.path.exists(path):
+            status[name] = 'skipped'
+        else:
+            pending.append((name, inputs[name], path))
+
+    if workers and workers > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+            for name in executor.map(render_chart, *zip(*pending)):
+                status[name] = 'rendered'
+    else:
+        for name, data, path in pending:
+            status[render_chart(name, data, path)] = 'rendered'
+
+    write_json(os.path.join(output_dir, FINGERPRINTS_FILE), current)
+    return {name: status[name] for name in CHART_NAMES}
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+# Windows are given as strings: a number of attempts ('3') or a pandas offset over
+# submitted_at ('7D', '30D'). Time windows end at each row's own submission and are
+# right-closed, so '7D' covers the 7 days up to and including that attempt.
+DEFAULT_WINDOWS = ('3', '7D', '30D')
+# Window behind the original rolling_accuracy/rolling_mistakes columns and the "recent" summary
+ROLLING_WINDOW = '3'
+RECENT_WINDOW = '3'
+
+def parse_window(spec):
+    # ('count', attempts) or ('time', Timedelta)
+    spec = str(spec).strip()
+    if spec.isdigit():
+        if int(spec) < 1:
+            raise ValueError(f"Window must cover at least one attempt: {spec!r}")
+        return 'count', int(spec)
+    try:
+        size = pd.Timedelta(spec)
+    except ValueError:
+        raise ValueError(f"Window {spec!r} is neither a number of attempts nor a duration like '7D'") from None
+    if size <= pd.Timedelta(0):
+        raise ValueError(f"Window must be a positive duration: {spec!r}")
+    return 'time', size
+
+def window_label(spec):
+    # Column and dict key suffix: '3' -> 'last3', '7D' -> '7d'
+    kind, size = parse_window(spec)
+    return f"last{size}" if kind == 'count' else str(spec).strip().lower()
+
+def _windows(windows, *extra):
+    # Distinct specs in order, keyed by label so '7D' and '7d' count once
+    specs = {}
+    for spec in list(extra) + list(windows):
+        specs.setdefault(window_label(spec), str(spec).strip())
+    return specs
+
+def rolling_metrics(historical_quiz_df, windows=DEFAULT_WINDOWS, student_key=None):
+    # Adds rolling_accuracy_<label> and rolling_mistakes_<label> for every window, plus the
+    # rolling_accuracy/rolling_mistakes columns for ROLLING_WINDOW. Rows must be in submitted_at
+    # order; with student_key, each student's rows must also be contiguous, and every window
+    # is computed over the whole cohort in one grouped pass.
+    columns = ['accuracy', 'incorrect_answers']
+    frame = historical_quiz_df[columns + ['submitted_at']]
+    source = frame.groupby(historical_quiz_df[student_key].to_numpy(), sort=False) if student_key else frame
+    for label, spec in _windows(windows, ROLLING_WINDOW).items():
+        kind, size = parse_window(spec)
+        if kind == 'count':
+            rolled = source[columns].rolling(window=size, min_periods=1).mean()
+        else:
+            rolled = source.rolling(size, on='submitted_at', min_periods=1)[columns].mean()
+        historical_quiz_df[f'rolling_accuracy_{label}'] = rolled['accuracy'].to_numpy()
+        historical_quiz_df[f'rolling_mistakes_{label}'] = rolled['incorrect_answers'].to_numpy()
+    label = window_label(ROLLING_WINDOW)
+    historical_quiz_df['rolling_accuracy'] = historical_quiz_df[f'rolling_accuracy_{label}']
+    historical_quiz_df['rolling_mistakes'] = historical_quiz_df[f'rolling_mistakes_{label}']
+    return historical_quiz_df
+
+def window_masks(historical_quiz_df, windows=DEFAULT_WINDOWS, student_key=None):
+    # {label: rows falling in the window that ends at each student's latest attempt}. Same
+    # row-order requirements as rolling_metrics.
+    submitted_at = historical_quiz_df['submitted_at'].to_numpy(dtype='datetime64[ns]')
+    rows = len(submitted_at)
+    if student_key:
+        student_ids = historical_quiz_df[student_key].to_numpy()
+        ends = np.flatnonzero(np.r_[student_ids[1:] != student_ids[:-1], True]) if rows else np.array([], dtype=int)
+        counts = np.diff(np.r_[-1, ends])
+    else:
+        ends, counts = np.array([rows - 1] if rows else [], dtype=int), np.array([rows] if rows else [], dtype=int)
+    # Attempts from each row to its student's last one (0 for the last), and that last timestamp
+    last_row = np.repeat(ends, counts)
+    masks = {}
+    for label, spec in _windows(windows).items():
+        kind, size = parse_window(spec)
+        if kind == 'count':
+            masks[label] = last_row - np.arange(rows) < size
+        else:
+            masks[label] = submitted_at > submitted_at[last_row] - size.to_timedelta64()
+    return masks
+
+def retained_mask(historical_quiz_df, windows=DEFAULT_WINDOWS, student_key=None):
+    # Rows that can still fall inside a window ending at a later attempt; everything the
+    # incremental state needs to extend the rolling columns and window summaries
+    masks = window_masks(historical_quiz_df, _windows(windows, ROLLING_WINDOW, RECENT_WINDOW).values(), student_key)
+    return np.logical_or.reduce(list(masks.values()))
+
+def window_summary(historical_quiz_df, windows=DEFAULT_WINDOWS):
+    # {label: {'accuracy', 'corrections', 'attempts'}} over each window ending at the latest
+    # attempt, for one student's history
+    summary = {}
+    for label, mask in window_masks(historical_quiz_df, windows).items():
+        window_df = historical_quiz_df[mask]
+        summary[label] = {
+            'accuracy': window_df['accuracy'].mean(),
+            'corrections': window_df['mistakes_corrected'].mean(),
+            'attempts': int(mask.sum())
+        }
+    return summary
@@ -0,0 +1,232 @@
+import functools
+import json
+import os
+import string
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules.json')
+
+# Per-student metrics from utils.summarize_history that rules can refer to directly
+SUMMARY_METRICS = ['overall_accuracy', 'recent_accuracy', 'mistake_correction_rate', 'recent_corrections',
+                   'accuracy_std']
+PERSONA_LABELS = ['learning_type', 'key_traits', 'learning_style']
+RECOMMENDATION_LABELS = ['priority_actions', 'study_strategy', 'next_steps']
+PERFORMANCE_LABELS = ['strengths', 'challenges']
+
+_COMPARISONS = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+    '==': np.equal,
+    '!=': np.not_equal
+}
+_SYMBOLS = {'>': '>', '>=': '≥', '<': '<', '<=': '≤', '==': '=', '!=': '≠'}
+
+# Rules file layout (see rules.json):
+#   topic_groups: [{name, when, insight}] - topics of a student's topic stats matching `when`;
+#                 groups with insight=true are listed in insights['topics']
+#   labels:       {category: {rules: [{text, when, each_topic}], first_match}} - a rule adds its
+#                 text when every condition in `when` holds. first_match keeps only the first
+#                 matching rule; each_topic adds the text once per topic of that group as {topic}.
+# Conditions are [metric, op, value] with op one of > >= < <= == !=, where value is a number,
+# a boolean or another metric's name, or [metric, 'exists'] / [metric, 'missing'].
+#
+# Metrics available to label rules, one row per student (see student_table):
+#   the SUMMARY_METRICS, improvement (recent above overall accuracy), mistake_improvement
+#   (recent over overall corrections), window_<label>_accuracy/_corrections/_attempts for every
+#   rolling window, and per topic group <group>_count, first_<group>_topic, first_<group>_accuracy.
+# Topic group rules see the topic stats columns (avg_accuracy, attempt_count, ...).
+# Label texts can also use {<group>_<column>}, the number a topic group compares that column with
+# (e.g. {weak_avg_accuracy:.0%}), so texts quoting a threshold follow the rules file.
+
+def _metric(table, name):
+    try:
+        return np.asarray(table[name])
+    except KeyError:
+        raise ValueError(f"Rule refers to unknown metric {name!r}") from None
+
+def compile_condition(condition):
+    metric, op, *operand = condition
+    if op in ('exists', 'missing') and not operand:
+        if op == 'exists':
+            return lambda table: pd.notna(_metric(table, metric))
+        return lambda table: pd.isna(_metric(table, metric))
+    if op not in _COMPARISONS or len(operand) != 1:
+        raise ValueError(f"Invalid rule condition {condition!r}")
+    compare, value = _COMPARISONS[op], operand[0]
+    if isinstance(value, str):
+        return lambda table: compare(_metric(table, metric), _metric(table, value))
+    return lambda table: compare(_metric(table, metric), value)
+
+def compile_predicate(conditions):
+    # All conditions must hold; evaluates to one boolean per table row
+    checks = [compile_condition(condition) for condition in conditions]
+
+    def predicate(table, rows):
+        mask = np.ones(rows, dtype=bool)
+        for check in checks:
+            mask &= np.asarray(check(table), dtype=bool)
+        return mask
+    return predicate
+
+def group_thresholds(groups):
+    # {<group>_<column>: value} for topic group conditions comparing a column with a number;
+    # left out when a group compares the same column more than once
+    thresholds, repeated = {}, set()
+    for group in groups:
+        for metric, op, *operand in group['when']:
+            name = f"{group['name']}_{metric}"
+            if op in _COMPARISONS and operand and isinstance(operand[0], (int, float)):
+                if name in thresholds:
+                    repeated.add(name)
+                thresholds[name] = operand[0]
+    return {name: value for name, value in thresholds.items() if name not in repeated}
+
+def _compile_rule(rule, constants):
+    fields = [field for _, field, _, _ in string.Formatter().parse(rule['text']) if field]
+    return {
+        'text': rule['text'],
+        'constants': {field: constants[field] for field in fields if field in constants},
+        'fields': [field for field in fields if field != 'topic' and field not in constants],
+        'each_topic': rule.get('each_topic'),
+        'predicate': compile_predicate(rule.get('when', []))
+    }
+
+class RuleSet:
+    # Rules compiled once into vectorized predicates; evaluate() runs every rule over a whole
+    # table of students at a time
+    def __init__(self, config):
+        self.topic_groups = [{
+            'name': group['name'],
+            'insight': group.get('insight', False),
+            'when': group['when'],
+            'predicate': compile_predicate(group['when'])
+        } for group in config['topic_groups']]
+        group_names = {group['name'] for group in self.topic_groups}
+        self.thresholds = group_thresholds(config['topic_groups'])
+        self.categories = {}
+        for category, spec in config['labels'].items():
+            rules = [_compile_rule(rule, self.thresholds) for rule in spec['rules']]
+            for rule in rules:
+                if rule['each_topic'] and rule['each_topic'] not in group_names:
+                    raise ValueError(f"Rule in {category!r} refers to unknown topic group {rule['each_topic']!r}")
+            self.categories[category] = {'first_match': spec.get('first_match', False), 'rules': rules}
+        missing = set(PERSONA_LABELS + RECOMMENDATION_LABELS + PERFORMANCE_LABELS) - set(self.categories)
+        if missing:
+            raise ValueError(f"Rules file has no rules for {sorted(missing)}")
+
+    def describe_group(self, name):
+        # The group's conditions for reports, e.g. "≥70% accuracy"
+        group = next(group for group in self.topic_groups if group['name'] == name)
+        parts = []
+        for metric, op, *operand in group['when']:
+            if metric == 'avg_accuracy' and operand and isinstance(operand[0], (int, float)):
+                parts.append(f"{_SYMBOLS[op]}{operand[0]:.0%} accuracy")
+            else:
+                parts.append(' '.join(str(part) for part in [metric, op] + operand))
+        return ', '.join(parts)
+
+    def topic_masks(self, topic_stats):
+        return {group['name']: group['predicate'](topic_stats, len(topic_stats)) for group in self.topic_groups}
+
+    def student_topic_groups(self, topic_stats):
+        # {group: ([topics], [accuracy of the first topic])} for one student's topic stats
+        groups = {}
+        for name, mask in self.topic_masks(topic_stats).items():
+            selected = topic_stats[mask]
+            groups[name] = ([selected.index.tolist()],
+                            [selected['avg_accuracy'].iloc[0] if len(selected) else np.nan])
+        return groups
+
+    def evaluate(self, table, rows, topic_lists):
+        # {category: [labels for each student row]}
+        labels = {}
+        for category, spec in self.categories.items():
+            category_labels = [[] for _ in range(rows)]
+            unmatched = np.ones(rows, dtype=bool)
+            for rule in spec['rules']:
+                mask = rule['predicate'](table, rows)
+                if spec['first_match']:
+                    mask &= unmatched
+                    unmatched &= ~mask
+                _render(rule, table, np.flatnonzero(mask).tolist(), topic_lists, category_labels)
+            labels[category] = category_labels
+        return labels
+
+    def student_outputs(self, table, rows, trend_windows, topic_groups):
+        # (insights, recommendations, persona, performance_labels) for every student row
+        topic_lists = {name: lists for name, (lists, _) in topic_groups.items()}
+        labels = self.evaluate(table, rows, topic_lists)
+        insight_groups = [group['name'] for group in self.topic_groups if group['insight']]
+        columns = zip(table['recent_accuracy'].tolist(), table['overall_accuracy'].tolist(),
+                      table['improvement'].tolist(), table['mistake_correction_rate'].tolist(),
+                      table['recent_corrections'].tolist(), trend_windows,
+                      zip(*[topic_lists[name] for name in insight_groups]) if insight_groups else [()] * rows,
+                      zip(*[labels[name] for name in RECOMMENDATION_LABELS]),
+                      zip(*[labels[name] for name in PERSONA_LABELS]),
+                      zip(*[labels[name] for name in PERFORMANCE_LABELS]))
+        for (recent_accuracy, overall_accuracy, improvement, mistake_correction_rate, recent_corrections,
+             windows, topics, recommendations, persona, performance_labels) in columns:
+            insights = {
+                'trending': {
+                    'recent_accuracy': recent_accuracy,
+                    'overall_accuracy': overall_accuracy,
+                    'improvement': improvement,
+                    'windows': windows
+                },
+                'topics': dict(zip(insight_groups, topics)),
+                'learning': {
+                    'mistake_correction_rate': mistake_correction_rate,
+                    'recent_corrections': recent_corrections
+                }
+            }
+            persona = dict(zip(PERSONA_LABELS, persona))
+            persona['learning_type'] = persona['learning_type'][0] if persona['learning_type'] else ''
+            yield (insights, dict(zip(RECOMMENDATION_LABELS, recommendations)), persona,
+                   dict(zip(PERFORMANCE_LABELS, performance_labels)))
+
+def _render(rule, table, rows, topic_lists, labels):
+    # Appends the rule's text to labels[row] for each matching row; its constants (topic group
+    # thresholds) are the same for every row
+    text, fields, constants = rule['text'], rule['fields'], rule['constants']
+    if rule['each_topic']:
+        groups = topic_lists[rule['each_topic']]
+        columns = [_metric(table, field)[rows] for field in fields]
+        for row, *values in zip(rows, *columns):
+            context = dict(zip(fields, values), **constants)
+            labels[row].extend([text.format(topic=topic, **context) for topic in groups[row]])
+    elif fields:
+        columns = [_metric(table, field)[rows] for field in fields]
+        for row, *values in zip(rows, *columns):
+            labels[row].append(text.format(**dict(zip(fields, values)), **constants))
+    else:
+        text = text.format(**constants) if constants else text
+        for row in rows:
+            labels[row].append(text)
+
+def student_table(summary, windows, topic_groups):
+    # Metrics table with one row per student. summary maps SUMMARY_METRICS to arrays, windows maps
+    # each window label to arrays of accuracy/corrections/attempts, topic_groups maps each group to
+    # (topic lists, accuracy of each student's first topic in the group).
+    table = {name: np.asarray(summary[name], dtype=float) for name in SUMMARY_METRICS}
+    table['improvement'] = table['recent_accuracy'] > table['overall_accuracy']
+    rate = table['mistake_correction_rate']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table['mistake_improvement'] = np.where(rate > 0, table['recent_corrections'] / rate, 0.0)
+    for label, metrics in windows.items():
+        for metric, values in metrics.items():
+            table[f'window_{label}_{metric}'] = np.asarray(values)
+    for name, (lists, first_accuracy) in topic_groups.items():
+        table[f'{name}_count'] = np.array([len(topics) for topics in lists], dtype=np.int64)
+        table[f'first_{name}_topic'] = np.array([topics[0] if len(topics) else None for topics in lists], dtype=object)
+        table[f'first_{name}_accuracy'] = np.asarray(first_accuracy, dtype=float)
+    return table
+
+@functools.lru_cache(maxsize=None)
+def load_rules(path=None):
+    # Compiled once per process and rules file
+    with open(path or DEFAULT_RULES_PATH) as f:
+        return RuleSet(json.load(f))
@@ -0,0 +1,170 @@
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+# Compact dtypes for cleaned historical frames, applied once at ingest (clean_historical_quiz_data)
+# so every later step works on them: topics as categoricals, "M:SS" durations as integer seconds,
+# answer counts as small ints and submitted_at as datetime64. accuracy stays float64 while a
+# frame is analyzed, because the thresholds and rounding downstream are exact on it; compact_history
+# additionally stores it as float32 for frames at rest and restore_history brings it back bit-exact.
+COUNT_COLUMNS = ['score', 'correct_answers', 'incorrect_answers', 'mistakes_corrected']
+COUNT_DTYPE = np.int16
+DURATION_DTYPE = np.int32
+
+def duration_seconds(durations):
+    # "M:SS" or "H:MM:SS" strings as integer seconds; each distinct string is parsed once
+    codes, uniques = pd.factorize(durations.astype(str))
+    seconds = np.array([_parse_duration(value) for value in uniques], dtype=DURATION_DTYPE)
+    return pd.Series(seconds[codes] if len(codes) else np.array([], dtype=DURATION_DTYPE),
+                     index=durations.index, name='duration_seconds')
+
+def _parse_duration(value):
+    seconds = 0
+    for part in value.strip().split(':'):
+        if not part.strip().isdigit():
+            raise ValueError(f"Invalid duration {value!r}; expected M:SS")
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+def _small_ints(values):
+    # int16 when every value fits, otherwise int32; pandas/numpy sums and means still accumulate
+    # in int64/float64, so only the stored width changes
+    for dtype in (COUNT_DTYPE, np.int32):
+        limits = np.iinfo(dtype)
+        if not len(values) or (values.min() >= limits.min and values.max() <= limits.max):
+            return values.astype(dtype)
+    return values
+
+def normalize_history(historical_quiz_df):
+    # Idempotent, so frames loaded back from the store (or concatenated) can be re-normalized.
+    # Topic categories are kept in sorted order: groupby sorts categoricals by category code,
+    # which then matches the order the string column sorted in.
+    topics = historical_quiz_df['quiz_topic']
+    if not isinstance(topics.dtype, pd.CategoricalDtype) or list(topics.cat.categories) != sorted(topics.cat.categories):
+        historical_quiz_df['quiz_topic'] = pd.Categorical(topics.astype(object))
+    if 'duration' in historical_quiz_df:
+        historical_quiz_df['duration_seconds'] = duration_seconds(historical_quiz_df.pop('duration'))
+    for column in COUNT_COLUMNS:
+        if column in historical_quiz_df and historical_quiz_df[column].dtype.kind in 'iu':
+            historical_quiz_df[column] = _small_ints(historical_quiz_df[column])
+    if not pd.api.types.is_datetime64_any_dtype(historical_quiz_df['submitted_at']):
+        historical_quiz_df['submitted_at'] = pd.to_datetime(historical_quiz_df['submitted_at'])
+    return historical_quiz_df
+
+def _restore_accuracy(accuracy):
+    # Accuracies come from "NN %" / "NN.NN %" strings; float(pct) / 100 is recovered exactly from
+    # the float32 value through the integer number of basis points
+    return np.rint(accuracy.astype(np.float64) * 10000) / 100 / 100
+
+def compact_history(historical_quiz_df):
+    # Copy with accuracy as float32 when restore_history recovers every value bit for bit
+    compact_df = normalize_history(historical_quiz_df.copy())
+    if compact_df['accuracy'].dtype == np.float64:
+        compact = compact_df['accuracy'].astype(np.float32)
+        if np.array_equal(_restore_accuracy(compact), compact_df['accuracy'], equal_nan=True):
+            compact_df['accuracy'] = compact
+    return compact_df
+
+def restore_history(historical_quiz_df):
+    if 'accuracy' in historical_quiz_df and historical_quiz_df['accuracy'].dtype == np.float32:
+        historical_quiz_df['accuracy'] = _restore_accuracy(historical_quiz_df['accuracy'])
+    return historical_quiz_df
+
+def memory_report(frames):
+    # {column: {frame name: bytes}} plus a 'total' row, counting object/string payloads
+    usage = {name: frame.memory_usage(deep=True, index=False) for name, frame in frames.items()}
+    columns = list(dict.fromkeys(column for frame_usage in usage.values() for column in frame_usage.index))
+    report = {column: {name: int(frame_usage.get(column, 0)) for name, frame_usage in usage.items()}
+              for column in columns}
+    report['total'] = {name: int(frame_usage.sum()) for name, frame_usage in usage.items()}
+    return report
+
+def downstream_outputs(historical_quiz_df):
+    # Everything the per-student pipeline derives from a cleaned history, as plain values
+    from render import chart_inputs
+    from utils import add_rolling_metrics, analyze_and_recommend, calculate_topic_stats
+    from viz_export import build_viz_data, timeline_records, topic_records
+
+    historical_quiz_df = add_rolling_metrics(historical_quiz_df.reset_index(drop=True))
+    topic_stats = calculate_topic_stats(historical_quiz_df)
+    insights, recommendations, persona, performance_labels = analyze_and_recommend(historical_quiz_df, topic_stats)
+    rolling = historical_quiz_df.filter(regex='^(rolling_|improvement_rate)')
+    return {
+        'rolling': {column: values.tolist() for column, values in rolling.items()},
+        'topic_stats': topic_stats.reset_index().astype({'quiz_topic': str}).to_dict('records'),
+        'viz_data': build_viz_data(timeline_records(historical_quiz_df), topic_records(topic_stats),
+                                   insights, recommendations, persona, performance_labels),
+        'charts': chart_inputs(historical_quiz_df, topic_stats, insights)
+    }
+
+def _same(left, right):
+    # JSON text equality, with NaN == NaN
+    return json.dumps(left, sort_keys=True, default=str) == json.dumps(right, sort_keys=True, default=str)
+
+def compare_downstream(history_df, student_key='user_id'):
+    # Students whose rolling metrics, topic stats, insights, viz data or chart inputs differ
+    # between the legacy dtypes and the normalized (and compacted, then restored) frame
+    mismatches = []
+    normalized_df = normalize_history(history_df.copy())
+    restored_df = restore_history(compact_history(normalized_df))
+    for (student_id, legacy), (_, normalized), (_, restored) in zip(
+            history_df.groupby(student_key, sort=False), normalized_df.groupby(student_key, sort=False),
+            restored_df.groupby(student_key, sort=False)):
+        expected = downstream_outputs(legacy)
+        for name, frame in (('normalized', normalized), ('restored', restored)):
+            actual = downstream_outputs(frame)
+            differing = [key for key in expected if not _same(expected[key], actual[key])]
+            if differing:
+                mismatches.append(f"{student_id} ({name}): {', '.join(differing)}")
+    return mismatches
+
+def main():
+    from chunked import iter_submissions
+    from synthetic import generate_student_payloads
+    from utils import process_historical_quiz_data, clean_historical_quiz_data
+
+    parser = argparse.ArgumentParser(description="Report the memory saved by the compact history schema "
+                                                 "and check that analysis results are unchanged")
+    parser.add_argument('input', nargs='?', help="NDJSON or JSON-array export of submissions (.gz accepted)")
+    parser.add_argument('--students', type=int, default=500, help="Synthetic students when no input is given")
+    parser.add_argument('--attempts', type=int, default=12, help="Mean attempts per synthetic student")
+    parser.add_argument('--student-key', default='user_id', help="Submission field identifying the student")
+    parser.add_argument('--check', type=int, default=200, help="Students compared downstream (0 skips the check)")
+    args = parser.parse_args()
+
+    if args.input:
+        submissions = list(iter_submissions(args.input))
+    else:
+        submissions = [submission for _, payload in generate_student_payloads(args.students, args.attempts)
+                       for submission in payload]
+    started = time.perf_counter()
+    legacy_df = clean_historical_quiz_data(process_historical_quiz_data(submissions), normalize=False)
+    normalized_df = normalize_history(legacy_df.copy())
+    compact_df = compact_history(normalized_df)
+    elapsed = time.perf_counter() - started
+
+    report = memory_report({'legacy': legacy_df, 'normalized': normalized_df, 'compact': compact_df})
+    print("\n" + "="*50)
+    print(f"HISTORY MEMORY ({len(legacy_df)} submissions)")
+    print("="*50)
+    for column, sizes in report.items():
+        print(f"• {column:<20} {sizes['legacy']:>12,} -> {sizes['normalized']:>12,} -> {sizes['compact']:>12,} bytes")
+    total = report['total']
+    print(f"\nNormalized frame uses {total['normalized'] / total['legacy']:.1%} of the legacy frame "
+          f"({total['compact'] / total['legacy']:.1%} compacted for storage); normalizing took {elapsed:.2f}s")
+
+    if args.check:
+        student_ids = legacy_df[args.student_key].drop_duplicates().iloc[:args.check]
+        sample_df = legacy_df[legacy_df[args.student_key].isin(student_ids)]
+        mismatches = compare_downstream(sample_df, args.student_key)
+        for mismatch in mismatches[:10]:
+            print(f"  - {mismatch}")
+        if mismatches:
+            raise SystemExit(f"{len(mismatches)} students differ between the legacy and compact schema")
+        print(f"Downstream results match the legacy dtypes for {len(student_ids)} students")
+
+if __name__ == "__main__":
+    main()
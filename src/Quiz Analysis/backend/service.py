@@ -0,0 +1,242 @@
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+import batch
+from cache import DEFAULT_CACHE_DIR, DEFAULT_TTL, PayloadCache
+
+# Defaults resolve against this file rather than the working directory the service is started from
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT_DIR = os.path.join(BACKEND_DIR, 'output', 'service')
+DEFAULT_SERVICE_CACHE_DIR = os.path.join(BACKEND_DIR, DEFAULT_CACHE_DIR)
+
+STUDENT_ROUTE = re.compile(r'^/students/([^/]+)/(viz_data|submissions)$')
+
+def _analyze(entry, output_root, options):
+    # Runs in a warm worker (see batch._init_worker); only the viz_data dict and the ids of
+    # pending submissions the upstream history now has travel back
+    outputs = batch.run_student(entry, os.path.join(output_root, str(entry['student_id'])), options)
+    return outputs['viz_data'], outputs['upstream_submission_ids']
+
+class ResultCache:
+    # LRU of computed viz_data keyed by student. Each student has a generation that new
+    # submissions bump, so a result computed before the bump is never stored afterwards.
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.generations = {}
+        self.lock = threading.Lock()
+
+    def get(self, student_id):
+        with self.lock:
+            if student_id not in self.entries:
+                return None
+            self.entries.move_to_end(student_id)
+            return self.entries[student_id]
+
+    def generation(self, student_id):
+        with self.lock:
+            return self.generations.get(student_id, 0)
+
+    def put(self, student_id, generation, value):
+        with self.lock:
+            if self.generations.get(student_id, 0) != generation:
+                return
+            self.entries[student_id] = value
+            self.entries.move_to_end(student_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, student_id):
+        with self.lock:
+            self.generations[student_id] = self.generations.get(student_id, 0) + 1
+            self.entries.pop(student_id, None)
+
+    def __len__(self):
+        return len(self.entries)
+
+class AnalysisService:
+    def __init__(self, roster, output_root=DEFAULT_OUTPUT_DIR, workers=None, cache_size=1024, fetch_options=None,
+                 analysis_options=None):
+        self.roster = roster
+        self.output_root = output_root
+        self.fetch_options = fetch_options or {}
+        self.analysis_options = dict(analysis_options or {}, render_charts=False)
+        self.results = ResultCache(cache_size)
+        self.pending = {}
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=batch._init_worker,
+                                            initargs=(self.fetch_options,))
+        # Start every worker now so the first requests don't pay the pandas/matplotlib import
+        for future in [self.executor.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+
+    def viz_data(self, student_id):
+        # Returns (viz_data, 'hit' | 'miss'); concurrent misses for a student share one analysis
+        cached = self.results.get(student_id)
+        if cached is not None:
+            return cached, 'hit'
+        with self.lock:
+            generation = self.results.generation(student_id)
+            flight = self.in_flight.get(student_id)
+            if flight is None or flight[0] != generation:
+                entry = dict(self.roster[student_id], submissions=list(self.pending.get(student_id, [])))
+                flight = (generation, self.executor.submit(_analyze, entry, self.output_root, self.analysis_options))
+                self.in_flight[student_id] = flight
+        try:
+            value, upstream_ids = flight[1].result()
+        finally:
+            with self.lock:
+                if self.in_flight.get(student_id) is flight:
+                    del self.in_flight[student_id]
+        self._drop_pending(student_id, upstream_ids)
+        self.results.put(student_id, generation, value)
+        return value, 'miss'
+
+    def _drop_pending(self, student_id, upstream_ids):
+        # Posted submissions are only kept until the upstream history has them
+        if not upstream_ids:
+            return
+        upstream_ids = set(upstream_ids)
+        with self.lock:
+            remaining = [s for s in self.pending.get(student_id, []) if s['id'] not in upstream_ids]
+            if remaining:
+                self.pending[student_id] = remaining
+            else:
+                self.pending.pop(student_id, None)
+
+    def add_submissions(self, student_id, submissions):
+        with self.lock:
+            self.pending.setdefault(student_id, []).extend(submissions)
+            self.results.invalidate(student_id)
+            pending = len(self.pending[student_id])
+        # The upstream history changed too, so make the next fetch revalidate it
+        source = self.roster[student_id]['historical']
+        if self.fetch_options.get('cache_dir') and batch.is_url(source):
+            PayloadCache(self.fetch_options['cache_dir']).expire(source)
+        return pending
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'workers': self.workers,
+            'students': len(self.roster),
+            'cached_results': len(self.results),
+            'pending_submissions': sum(len(submissions) for submissions in self.pending.values()),
+            'uptime_seconds': round(time.time() - self.started_at, 3)
+        }
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    server_version = 'QuizAnalysis/1.0'
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self, method):
+        service = self.server.service
+        path = self.path.split('?', 1)[0]
+        if method == 'GET' and path == '/health':
+            return self._send_json(200, service.health())
+
+        match = STUDENT_ROUTE.match(path)
+        if not match or (method, match.group(2)) not in (('GET', 'viz_data'), ('POST', 'submissions')):
+            return self._send_json(404, {'error': f"No route for {method} {path}"})
+        # The dashboard sends encodeURIComponent(studentId)
+        student_id = unquote(match.group(1))
+        if student_id not in service.roster:
+            return self._send_json(404, {'error': f"Unknown student {student_id}"})
+
+        if method == 'GET':
+            try:
+                viz_data, status = service.viz_data(student_id)
+            except Exception as e:
+                return self._send_json(502, {'error': f"{type(e).__name__}: {e}"})
+            return self._send_json(200, viz_data, {'X-Cache': status.upper()})
+
+        # POST: a submission object or a list of them, shaped like the historical payload
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            submissions = json.loads(self.rfile.read(length) or b'[]')
+        except ValueError as e:
+            return self._send_json(400, {'error': f"Invalid JSON body: {e}"})
+        if isinstance(submissions, dict):
+            submissions = [submissions]
+        if not all(isinstance(s, dict) and 'id' in s for s in submissions):
+            return self._send_json(400, {'error': "Expected a submission or a list of submissions with ids"})
+        pending = service.add_submissions(student_id, submissions)
+        return self._send_json(202, {'student_id': student_id, 'pending_submissions': pending})
+
+    def do_GET(self):
+        self._route('GET')
+
+    def do_POST(self):
+        self._route('POST')
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+def serve(service, host='127.0.0.1', port=8000, verbose=True):
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve quiz analysis results over HTTP from warm worker processes")
+    parser.add_argument('manifest', help="JSON or CSV manifest with student_id, quiz_endpoint and historical")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--cache-size', type=int, default=1024, help="Students whose results are kept in memory")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help="Root directory for per-student outputs")
+    parser.add_argument('--store', help="Read histories from this Parquet store (see storage.py) instead of JSON")
+    parser.add_argument('--fixtures', help="Serve manifest URLs from a local directory of <id>.json files")
+    parser.add_argument('--cache-dir', default=DEFAULT_SERVICE_CACHE_DIR, help="Local payload cache directory")
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_TTL, help="Seconds before cached payloads are revalidated")
+    parser.add_argument('--no-cache', action='store_true', help="Always fetch from the network")
+    parser.add_argument('--quiet', action='store_true', help="Don't log requests")
+    args = parser.parse_args()
+
+    roster = {str(entry['student_id']): entry for entry in batch.load_manifest(args.manifest)}
+    service = AnalysisService(roster, output_root=args.output_dir, workers=args.workers, cache_size=args.cache_size,
+                              fetch_options={
+                                  'fixtures_dir': args.fixtures,
+                                  'cache_dir': None if args.no_cache else args.cache_dir,
+                                  'ttl': args.cache_ttl
+                              },
+                              analysis_options={'store_dir': args.store})
+    server = serve(service, args.host, args.port, verbose=not args.quiet)
+    print(f"Serving {len(roster)} students on http://{args.host}:{args.port} with {service.workers} warm workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+
+from batch import add_run_arguments, load_manifest, run_batch, run_options
+
+DEFAULT_OUTPUT_DIR = 'output/shards'
+CHECKPOINT_FILE = 'checkpoint.jsonl'
+# Result fields kept in the checkpoint; per-stage profiles stay in the shard's batch_profile.json
+CHECKPOINT_FIELDS = ['student_id', 'ok', 'seconds', 'error']
+
+# Layout under the output directory, shared by every machine running a shard (or copied
+# together before merging):
+#   shard-002-of-008/<student_id>/     per-student outputs, as batch.py writes them, plus topic_stats.json
+#   shard-002-of-008/checkpoint.jsonl  one result per line, appended as each student finishes; a
+#                                      resumed run skips students whose latest result is ok
+#   cohort_viz_data.ndjson.gz, cohort_topic_stats.json, merge_report.json   written by --merge
+
+def shard_of(student_id, shards):
+    # Stable across processes, machines and Python versions, unlike hash()
+    digest = hashlib.sha1(str(student_id).encode()).hexdigest()
+    return int(digest[:8], 16) % shards
+
+def shard_dir(output_root, shard, shards):
+    return os.path.join(output_root, f"shard-{shard:03d}-of-{shards:03d}")
+
+def shard_entries(manifest, shard, shards):
+    return [entry for entry in manifest if shard_of(entry['student_id'], shards) == shard]
+
+def load_checkpoint(directory):
+    # {student_id: latest result}; a last line cut short by a crash is ignored
+    results = {}
+    path = os.path.join(directory, CHECKPOINT_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                results[result['student_id']] = result
+    return results
+
+def _open_checkpoint(directory):
+    # Drops a partial last line before appending, so the next result starts on a line of its own
+    path = os.path.join(directory, CHECKPOINT_FILE)
+    f = open(path, 'a+b')
+    f.seek(0)
+    data = f.read()
+    if data and not data.endswith(b'\n'):
+        f.truncate(data.rfind(b'\n') + 1)
+    return f
+
+def run_shard(manifest, output_root, shard, shards, workers=None, chunksize=8, fetch_options=None,
+              analysis_options=None):
+    # Analyzes the shard's students that have no ok result in its checkpoint yet (failed students
+    # are retried) and appends each result to the checkpoint as it comes back
+    directory = shard_dir(output_root, shard, shards)
+    os.makedirs(directory, exist_ok=True)
+    entries = shard_entries(manifest, shard, shards)
+    done = {student_id for student_id, result in load_checkpoint(directory).items() if result['ok']}
+    pending = [entry for entry in entries if str(entry['student_id']) not in done]
+
+    summary = {'shard': shard, 'shards': shards, 'students': len(entries), 'resumed': len(entries) - len(pending)}
+    if not pending:
+        return dict(summary, report=None)
+    with _open_checkpoint(directory) as checkpoint:
+        def on_result(result):
+            record = {field: result[field] for field in CHECKPOINT_FIELDS if field in result}
+            checkpoint.write((json.dumps(record) + '\n').encode())
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+
+        report = run_batch(pending, directory, workers=workers, chunksize=chunksize, fetch_options=fetch_options,
+                           analysis_options=dict(analysis_options or {}, topic_stats=True), on_result=on_result)
+    return dict(summary, report=report)
+
+def shard_progress(manifest, output_root, shards):
+    # Per shard: students assigned, completed and failed, from the checkpoints on disk
+    progress = []
+    for shard in range(shards):
+        checkpoint = load_checkpoint(shard_dir(output_root, shard, shards))
+        results = [checkpoint.get(str(entry['student_id'])) for entry in shard_entries(manifest, shard, shards)]
+        progress.append({
+            'shard': shard,
+            'students': len(results),
+            'completed': sum(1 for result in results if result and result['ok']),
+            'failed': sum(1 for result in results if result and not result['ok'])
+        })
+    return progress
+
+def completed_students(manifest, output_root, shards):
+    # (student_id, student directory) for every student with an ok result, in manifest order
+    checkpoints = [load_checkpoint(shard_dir(output_root, shard, shards)) for shard in range(shards)]
+    for entry in manifest:
+        student_id = str(entry['student_id'])
+        shard = shard_of(student_id, shards)
+        result = checkpoints[shard].get(student_id)
+        if result and result['ok']:
+            yield student_id, os.path.join(shard_dir(output_root, shard, shards), student_id)
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+def merge_topic_stats(topic_totals, student_topic_stats):
+    # Adds one student's topic_stats.json records to the running per-topic totals
+    for record in student_topic_stats:
+        totals = topic_totals.setdefault(record['quiz_topic'], {
+            'students': 0, 'attempts': 0, 'accuracy_sum': 0.0, 'student_accuracy_sum': 0.0, 'mistakes_corrected': 0
+        })
+        totals['students'] += 1
+        totals['attempts'] += record['attempt_count']
+        totals['accuracy_sum'] += record['avg_accuracy'] * record['attempt_count']
+        totals['student_accuracy_sum'] += record['avg_accuracy']
+        totals['mistakes_corrected'] += record['total_mistakes_corrected']
+
+def cohort_topic_records(topic_totals):
+    # Per topic: students, attempts, attempt-weighted and per-student mean accuracy, and mistakes
+    # corrected, sorted like calculate_topic_stats. Accuracies are built from each student's
+    # rounded topic means, so they can differ from a recompute over raw submissions in the
+    # third decimal.
+    records = [{
+        'quiz_topic': topic,
+        'students': totals['students'],
+        'attempts': totals['attempts'],
+        'avg_accuracy': round(totals['accuracy_sum'] / totals['attempts'], 3),
+        'avg_student_accuracy': round(totals['student_accuracy_sum'] / totals['students'], 3),
+        'total_mistakes_corrected': totals['mistakes_corrected']
+    } for topic, totals in topic_totals.items()]
+    return sorted(records, key=lambda record: record['avg_accuracy'], reverse=True)
+
+def merge_shards(manifest, output_root, shards, output=None):
+    # Streams every completed student's viz_data into one cohort file and folds their topic stats
+    # into cohort_topic_stats.json; students are read one at a time, so memory stays flat
+    from viz_export import write_json, write_json_array, write_ndjson
+    started = time.perf_counter()
+    output = output or os.path.join(output_root, 'cohort_viz_data.ndjson.gz')
+    topic_totals = {}
+    missing = []
+
+    def records():
+        for student_id, student_dir in completed_students(manifest, output_root, shards):
+            viz_data_path = os.path.join(student_dir, 'viz_data.json')
+            topic_stats_path = os.path.join(student_dir, 'topic_stats.json')
+            if not (os.path.exists(viz_data_path) and os.path.exists(topic_stats_path)):
+                missing.append(student_id)
+                continue
+            merge_topic_stats(topic_totals, _read_json(topic_stats_path))
+            yield dict({'student_id': student_id}, **_read_json(viz_data_path))
+
+    writer = write_json_array if output.endswith(('.json', '.json.gz')) else write_ndjson
+    merged = writer(output, records())
+    topics = cohort_topic_records(topic_totals)
+    write_json(os.path.join(output_root, 'cohort_topic_stats.json'), topics)
+
+    elapsed = time.perf_counter() - started
+    report = {
+        'shards': shards,
+        'students': len(manifest),
+        'merged': merged,
+        'missing_outputs': missing,
+        'topics': len(topics),
+        'viz_data_path': output,
+        'elapsed_seconds': round(elapsed, 3),
+        'per_shard': shard_progress(manifest, output_root, shards)
+    }
+    with open(os.path.join(output_root, 'merge_report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    return report, topics
+
+def main():
+    parser = argparse.ArgumentParser(description="Run one hash-partitioned shard of a cohort batch, resumable from "
+                                                 "its checkpoint, or merge finished shards into cohort artifacts")
+    parser.add_argument('manifest', help="JSON or CSV manifest with student_id, quiz_endpoint and historical")
+    parser.add_argument('--shards', type=int, required=True, help="Total number of shards the cohort is split into")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--shard', type=int, help="Shard to run, 0 to SHARDS-1; rerun it to resume after a crash")
+    mode.add_argument('--merge', action='store_true', help="Merge the shards' outputs into cohort-level artifacts")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help="Root directory shared by all shards")
+    parser.add_argument('--output', help="Merged viz_data path (default: OUTPUT_DIR/cohort_viz_data.ndjson.gz; "
+                                         ".json for an array)")
+    parser.add_argument('--allow-partial', action='store_true',
+                        help="With --merge, merge completed students even if some shards are unfinished")
+    add_run_arguments(parser)
+    args = parser.parse_args()
+
+    if args.shards < 1 or (args.shard is not None and not 0 <= args.shard < args.shards):
+        parser.error("--shard must be between 0 and SHARDS-1")
+    manifest = load_manifest(args.manifest)
+
+    if args.merge:
+        progress = shard_progress(manifest, args.output_dir, args.shards)
+        unfinished = [p for p in progress if p['completed'] < p['students']]
+        if unfinished and not args.allow_partial:
+            raise SystemExit("Unfinished shards (use --allow-partial to merge anyway): " + ", ".join(
+                f"{p['shard']} ({p['completed']}/{p['students']})" for p in unfinished))
+        report, topics = merge_shards(manifest, args.output_dir, args.shards, args.output)
+
+        print("\n" + "="*50)
+        print("            SHARD MERGE SUMMARY            ")
+        print("="*50)
+        print(f"• Shards: {report['shards']} ({len(unfinished)} unfinished)")
+        print(f"• Students merged: {report['merged']} of {report['students']}")
+        for student_id in report['missing_outputs'][:10]:
+            print(f"  - {student_id}: completed but outputs are missing")
+        for topic in topics:
+            print(f"• {topic['quiz_topic']}: {topic['students']} students, {topic['attempts']} attempts, "
+                  f"accuracy {topic['avg_accuracy']:.1%}")
+        print(f"• Elapsed: {report['elapsed_seconds']:.1f}s -> {report['viz_data_path']}")
+        print("="*50 + "\n")
+        return
+
+    fetch_options, analysis_options = run_options(args)
+    summary = run_shard(manifest, args.output_dir, args.shard, args.shards, workers=args.workers,
+                        chunksize=args.chunksize, fetch_options=fetch_options, analysis_options=analysis_options)
+    report = summary['report']
+
+    print("\n" + "="*50)
+    print(f"            SHARD {summary['shard']} OF {summary['shards']}            ")
+    print("="*50)
+    print(f"• Students in shard: {summary['students']}")
+    print(f"• Already completed: {summary['resumed']}")
+    if report:
+        print(f"• Succeeded: {report['succeeded']}")
+        print(f"• Failed: {report['failed']}")
+        print(f"• Elapsed: {report['elapsed_seconds']:.1f}s ({report['students_per_second']:.2f} students/sec)")
+        for failure in report['failures'][:10]:
+            print(f"  - {failure['student_id']}: {failure['error']}")
+    print(f"• Output: {shard_dir(args.output_dir, summary['shard'], summary['shards'])}")
+    print("="*50 + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from schema import compact_history, normalize_history, restore_history
+from utils import process_historical_quiz_data, clean_historical_quiz_data
+from viz_export import DIR_MODE
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+DEFAULT_STORE_DIR = 'output/store'
+
+# Columns calculate_topic_stats, add_rolling_metrics and create_visualizations read (plus the
+# submission id for de-duplication); loads project to these unless asked otherwise
+ANALYSIS_COLUMNS = ['submission_id', 'submitted_at', 'quiz_topic', 'accuracy', 'incorrect_answers', 'mistakes_corrected', 'duration_seconds']
+
+def _require_pyarrow():
+    if pq is None:
+        raise ImportError("The columnar store needs pyarrow: pip install pyarrow")
+
+def student_dir(store_dir, student_id):
+    return os.path.join(store_dir, f"student_id={student_id}")
+
+def write_student_history(store_dir, student_id, historical_quiz_df):
+    # Replaces the student's partitions with one Parquet file per submission month:
+    # <store>/student_id=<id>/month=<YYYY-MM>/part-0.parquet
+    _require_pyarrow()
+    os.makedirs(store_dir, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(dir=store_dir, prefix='.ingest-')
+    os.chmod(staging_dir, DIR_MODE)
+    # Stored compacted (float32 accuracy when lossless, see schema.py); loads restore it
+    historical_quiz_df = compact_history(historical_quiz_df)
+    try:
+        months = historical_quiz_df['submitted_at'].dt.strftime('%Y-%m')
+        for month, month_df in historical_quiz_df.groupby(months, sort=True):
+            partition_dir = os.path.join(staging_dir, f"month={month}")
+            os.makedirs(partition_dir)
+            table = pa.Table.from_pandas(month_df.reset_index(drop=True), preserve_index=False)
+            pq.write_table(table, os.path.join(partition_dir, 'part-0.parquet'))
+
+        # Swap the whole student directory in so readers never see a half-written history
+        target_dir = student_dir(store_dir, student_id)
+        if os.path.exists(target_dir):
+            retired_dir = tempfile.mkdtemp(dir=store_dir, prefix='.retired-')
+            os.replace(target_dir, os.path.join(retired_dir, 'data'))
+            os.replace(staging_dir, target_dir)
+            shutil.rmtree(retired_dir)
+        else:
+            os.replace(staging_dir, target_dir)
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+def ingest_student(store_dir, student_id, historical_quiz_data):
+    # Normalize and type-cast once; later runs read typed columns instead of re-parsing JSON
+    historical_quiz_df = clean_historical_quiz_data(process_historical_quiz_data(historical_quiz_data))
+    write_student_history(store_dir, student_id, historical_quiz_df)
+    return len(historical_quiz_df)
+
+def load_student_history(store_dir, student_id, columns=ANALYSIS_COLUMNS):
+    # Memory-maps the student's Parquet files and reads only the projected columns.
+    # Pass columns=None to load every stored column.
+    _require_pyarrow()
+    root = student_dir(store_dir, student_id)
+    if not os.path.isdir(root):
+        raise FileNotFoundError(f"No stored history for student {student_id} in {store_dir}")
+    tables = []
+    for month in sorted(os.listdir(root)):
+        path = os.path.join(root, month, 'part-0.parquet')
+        if os.path.exists(path):
+            tables.append(pq.read_table(path, columns=_stored_columns(path, columns), memory_map=True))
+    historical_quiz_df = restore_history(normalize_history(pa.concat_tables(tables).to_pandas()))
+    return historical_quiz_df.sort_values('submitted_at', kind='stable').reset_index(drop=True)
+
+def _stored_columns(path, columns):
+    # Stores written before schema.py hold the raw "M:SS" duration, normalized after loading
+    if columns is None or 'duration_seconds' not in columns:
+        return columns
+    names = pq.read_schema(path).names
+    if 'duration_seconds' in names or 'duration' not in names:
+        return columns
+    return [column if column != 'duration_seconds' else 'duration' for column in columns]
+
+def append_submissions(historical_quiz_df, historical_quiz_data):
+    # Adds raw submissions that are not in the stored history yet, keeping the stored columns
+    new_quiz_df = clean_historical_quiz_data(process_historical_quiz_data(historical_quiz_data))
+    # Parquet round-trips the offset as a different tz object; align it or concat falls back to object
+    new_quiz_df['submitted_at'] = new_quiz_df['submitted_at'].dt.tz_convert(historical_quiz_df['submitted_at'].dt.tz)
+    new_quiz_df = new_quiz_df[~new_quiz_df['submission_id'].isin(historical_quiz_df['submission_id'])]
+    combined = pd.concat([historical_quiz_df, new_quiz_df[historical_quiz_df.columns]], ignore_index=True)
+    # Topics with different categories concatenate as strings; re-normalize them
+    combined = normalize_history(combined)
+    return combined.sort_values('submitted_at', kind='stable').reset_index(drop=True)
+
+def main():
+    # Shares the manifest format and fetch options of batch.py
+    from batch import load_manifest
+    from cache import DEFAULT_CACHE_DIR, cached_fetcher
+
+    parser = argparse.ArgumentParser(description="Ingest historical quiz submissions into the Parquet store")
+    parser.add_argument('manifest', help="JSON or CSV manifest with student_id and historical")
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR, help="Root directory of the Parquet store")
+    parser.add_argument('--fixtures', help="Serve manifest URLs from a local directory of <id>.json files")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="Local payload cache directory")
+    parser.add_argument('--batch-size', type=int, default=64, help="Students fetched concurrently per batch")
+    args = parser.parse_args()
+
+    manifest = load_manifest(args.manifest)
+    fetcher = cached_fetcher(args.fixtures, cache_dir=args.cache_dir)
+    started = time.perf_counter()
+    students, submissions, failures = 0, 0, 0
+
+    for offset in range(0, len(manifest), args.batch_size):
+        entries = manifest[offset:offset + args.batch_size]
+        urls = [e['historical'] for e in entries if e['historical'].startswith(('http://', 'https://'))]
+        payloads, errors = fetcher.fetch_many(urls)
+        for entry in entries:
+            source = entry['historical']
+            try:
+                if source in errors:
+                    raise errors[source]
+                if source in payloads:
+                    historical_quiz_data = payloads[source]
+                else:
+                    with open(source) as f:
+                        historical_quiz_data = json.load(f)
+                submissions += ingest_student(args.store, str(entry['student_id']), historical_quiz_data)
+                students += 1
+            except Exception as e:
+                failures += 1
+                print(f"Error ingesting {entry['student_id']}: {e}")
+
+    elapsed = time.perf_counter() - started
+    print(f"Ingested {submissions} submissions for {students} students into {args.store} "
+          f"in {elapsed:.1f}s ({failures} failed)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+from schema import normalize_history
+
+TOPICS = [
+    'Body Fluids and Circulation', 'Respiration', 'Human Health and Disease', 'Reproductive Health',
+    'Principles of Inheritance', 'Molecular Basis of Inheritance', 'Evolution', 'Cell Structure',
+    'Plant Physiology', 'Biotechnology', 'Ecosystem', 'Human Reproduction'
+]
+
+def topic_names(topics):
+    return [TOPICS[i] if i < len(TOPICS) else f"Topic {i + 1}" for i in range(topics)]
+
+def generate_cohort_frame(students, attempts_per_student=10, topics=8, questions_per_quiz=10, seed=42):
+    # Cleaned historical submissions for a whole cohort, shaped like the output of
+    # process_historical_quiz_data + clean_historical_quiz_data plus a student_id column
+    rng = np.random.default_rng(seed)
+    attempts = rng.poisson(attempts_per_student - 1, size=students) + 1
+    rows = int(attempts.sum())
+    student_index = np.repeat(np.arange(students), attempts)
+
+    # Per-student start date, then increasing gaps between attempts (in UTC, localized at the end)
+    gaps = rng.integers(1, 72 * 3600, size=rows).astype('timedelta64[s]')
+    start = np.datetime64('2024-11-30T18:30:00') + rng.integers(0, 30 * 86400, size=students).astype('timedelta64[s]')
+    first_row = np.concatenate([[0], np.cumsum(attempts)[:-1]])
+    elapsed = np.cumsum(gaps)
+    offsets = elapsed - np.repeat(elapsed[first_row], attempts)
+    submitted_at = np.repeat(start, attempts) + offsets
+
+    # Each student has a latent skill so topic/persona buckets are spread out
+    skill = np.repeat(rng.beta(4, 3, size=students), attempts)
+    correct = rng.binomial(questions_per_quiz, skill)
+    names = np.array(topic_names(topics), dtype=object)
+
+    return normalize_history(pd.DataFrame({
+        'student_id': np.char.add('s', np.char.zfill(student_index.astype(str), 6)),
+        'submission_id': np.arange(rows),
+        'quiz_topic': names[rng.integers(0, topics, size=rows)],
+        'submitted_at': pd.DatetimeIndex(submitted_at).tz_localize('UTC').tz_convert('Asia/Kolkata'),
+        'accuracy': np.round(correct / questions_per_quiz, 2),
+        'final_score': correct * 4.0,
+        'correct_answers': correct,
+        'incorrect_answers': questions_per_quiz - correct,
+        'mistakes_corrected': rng.integers(0, 10, size=rows),
+        'duration': [f"{m}:{s:02d}" for m, s in zip(rng.integers(1, 16, size=rows), rng.integers(0, 60, size=rows))]
+    }))
+
+def generate_quiz_payload(questions=10, topics=8, options_per_question=4, seed=42):
+    # Shaped like the quiz endpoint response: one correct option per question
+    rng = np.random.default_rng(seed)
+    names = topic_names(topics)
+    correct = rng.integers(0, options_per_question, size=questions)
+    question_topics = rng.integers(0, topics, size=questions)
+    return {'quiz': {
+        'id': 1,
+        'topic': names[0],
+        'questions': [{
+            'id': q + 1,
+            'topic': names[question_topics[q]],
+            'description': f"Question {q + 1}",
+            'options': [{
+                'id': (q + 1) * options_per_question + o,
+                'description': f"Option {o + 1} for question {q + 1}",
+                'is_correct': bool(o == correct[q])
+            } for o in range(options_per_question)]
+        } for q in range(questions)]
+    }}
+
+def generate_historical_payload(student_id, attempts=10, topics=8, questions_per_quiz=10, options_per_question=4,
+                                seed=42):
+    # Shaped like the historical submissions response, including its string formats
+    # (" 90 %" accuracy, "36.0" final_score, "M:SS" duration, ISO timestamps with offset)
+    rng = np.random.default_rng(seed)
+    names = topic_names(topics)
+    skill = rng.beta(4, 3)
+    correct = rng.binomial(questions_per_quiz, skill, size=attempts)
+    start = np.datetime64('2024-12-01T00:00:00') + rng.integers(0, 30 * 86400).astype('timedelta64[s]')
+    submitted_at = start + np.cumsum(rng.integers(1, 72 * 3600, size=attempts)).astype('timedelta64[s]')
+    topic_index = rng.integers(0, topics, size=attempts)
+    mistakes = rng.integers(0, 10, size=attempts)
+    minutes, seconds = rng.integers(1, 16, size=attempts), rng.integers(0, 60, size=attempts)
+    picks = rng.integers(0, options_per_question, size=(attempts, questions_per_quiz))
+    return [{
+        'id': int(seed) * 100_000 + a,
+        'user_id': str(student_id),
+        'quiz_id': int(topic_index[a]) + 1,
+        'quiz': {'id': int(topic_index[a]) + 1, 'topic': names[topic_index[a]]},
+        'submitted_at': f"{np.datetime_as_string(submitted_at[a], unit='ms')}+05:30",
+        'score': int(correct[a]) * 4,
+        'accuracy': f" {int(correct[a]) * 100 // questions_per_quiz} %",
+        'final_score': f"{int(correct[a]) * 4}.0",
+        'correct_answers': int(correct[a]),
+        'incorrect_answers': questions_per_quiz - int(correct[a]),
+        'mistakes_corrected': int(mistakes[a]),
+        'duration': f"{minutes[a]}:{seconds[a]:02d}",
+        'response_map': {str(q + 1): (q + 1) * options_per_question + int(picks[a, q])
+                         for q in range(questions_per_quiz)}
+    } for a in range(attempts)]
+
+def generate_student_payloads(students, attempts_per_student=10, topics=8, questions_per_quiz=10,
+                              options_per_question=4, seed=42):
+    # (student_id, historical payload) pairs with Poisson-distributed attempt counts
+    rng = np.random.default_rng(seed)
+    attempts = rng.poisson(attempts_per_student - 1, size=students) + 1
+    return [(f"s{s:06d}", generate_historical_payload(f"s{s:06d}", attempts=int(attempts[s]), topics=topics,
+                                                      questions_per_quiz=questions_per_quiz,
+                                                      options_per_question=options_per_question, seed=seed + s + 1))
+            for s in range(students)]
@@ -0,0 +1,37 @@
+import json
+import os
+import sys
+
+import pytest
+
+# The backend modules import each other as top-level modules (python backend/<tool>.py)
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from synthetic import generate_quiz_payload, generate_student_payloads
+
+@pytest.fixture
+def payloads():
+    # (student_id, historical payload) pairs, small enough for every check to run in seconds
+    return generate_student_payloads(12, attempts_per_student=8, topics=5)
+
+@pytest.fixture
+def manifest(tmp_path, payloads):
+    # batch.py manifest pointing at local files, as the fixture-driven runs use
+    quiz_path = tmp_path / 'quiz.json'
+    quiz_path.write_text(json.dumps(generate_quiz_payload(topics=5)))
+    entries = []
+    for student_id, payload in payloads:
+        history_path = tmp_path / f"{student_id}.json"
+        history_path.write_text(json.dumps(payload))
+        entries.append({'student_id': student_id, 'quiz_endpoint': str(quiz_path), 'historical': str(history_path)})
+    return entries
+
+@pytest.fixture
+def export_path(tmp_path, payloads):
+    # Every student's submissions as one NDJSON export in submitted_at order
+    submissions = sorted((submission for _, payload in payloads for submission in payload),
+                         key=lambda submission: submission['submitted_at'])
+    path = tmp_path / 'export.ndjson'
+    path.write_text(''.join(json.dumps(submission) + '\n' for submission in submissions))
+    return str(path)
@@ -0,0 +1,87 @@
+import os
+
+import pytest
+import requests
+
+import cache
+from cache import CachingTransport, PayloadCache, cached_fetcher
+from fetch import FetchResponse
+
+URL = 'https://api.jsonserve.com/XgAgFJ'
+
+class ScriptedTransport:
+    # Replays queued responses (or raises queued exceptions) and records each request's headers
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=10):
+        self.requests.append(dict(headers or {}))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+def _ok(body=b'[1]', etag='"v1"'):
+    return FetchResponse(200, {'ETag': etag, 'Last-Modified': 'Tue, 01 Oct 2024 00:00:00 GMT'}, body)
+
+def test_fresh_entries_skip_the_network(tmp_path):
+    transport = ScriptedTransport(_ok())
+    caching = CachingTransport(transport, PayloadCache(str(tmp_path)))
+    assert caching.get(URL).headers == {'ETag': '"v1"', 'Last-Modified': 'Tue, 01 Oct 2024 00:00:00 GMT'}
+    hit = caching.get(URL)
+    assert (hit.status, hit.headers['X-Cache'], hit.body) == (200, 'HIT', b'[1]')
+    assert len(transport.requests) == 1
+
+def test_expired_entries_revalidate_with_etag(tmp_path):
+    payload_cache = PayloadCache(str(tmp_path), ttl=0)
+    transport = ScriptedTransport(_ok(), FetchResponse(304, {}, b''), _ok(b'[2]', etag='"v2"'))
+    caching = CachingTransport(transport, payload_cache)
+    caching.get(URL)
+
+    revalidated = caching.get(URL)
+    assert (revalidated.headers['X-Cache'], revalidated.body) == ('REVALIDATED', b'[1]')
+    assert transport.requests[1] == {'If-None-Match': '"v1"',
+                                     'If-Modified-Since': 'Tue, 01 Oct 2024 00:00:00 GMT'}
+
+    assert caching.get(URL).body == b'[2]'
+    entry, body = payload_cache.lookup(URL)
+    assert (entry['etag'], body) == ('"v2"', b'[2]')
+
+def test_stale_copy_served_when_upstream_fails(tmp_path):
+    transport = ScriptedTransport(_ok(), FetchResponse(503, {}, b''), requests.ConnectionError('down'),
+                                  requests.ConnectionError('down'))
+    caching = CachingTransport(transport, PayloadCache(str(tmp_path), ttl=0))
+    caching.get(URL)
+    assert caching.get(URL).headers['X-Cache'] == 'STALE'
+    assert caching.get(URL).headers['X-Cache'] == 'STALE'
+    with pytest.raises(requests.ConnectionError):
+        caching.get(URL + '/other')
+
+def test_offline_serves_only_from_the_cache(tmp_path):
+    CachingTransport(ScriptedTransport(_ok()), PayloadCache(str(tmp_path), ttl=0)).get(URL)
+    offline = CachingTransport(ScriptedTransport(), PayloadCache(str(tmp_path), ttl=0), offline=True)
+    assert offline.get(URL).body == b'[1]'
+    assert offline.get(URL + '/other').status == 404
+    with pytest.raises(ValueError):
+        cached_fetcher(cache_dir=None, offline=True)
+
+def test_store_keeps_the_cache_within_max_bytes(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, 'ORPHAN_GRACE', 0)
+    payload_cache = PayloadCache(str(tmp_path), max_bytes=1000)
+    for i in range(10):
+        payload_cache.store(f"{URL}/{i}", bytes([i]) * 300, {})
+        blobs = os.listdir(payload_cache.blobs_dir)
+        assert sum(os.path.getsize(os.path.join(payload_cache.blobs_dir, name)) for name in blobs) <= 1000
+
+    # Least recently used entries go first; the newest ones stay cached
+    assert payload_cache.lookup(f"{URL}/9") is not None
+    assert payload_cache.lookup(f"{URL}/8") is not None
+    assert payload_cache.lookup(f"{URL}/0") is None
+
+def test_identical_bodies_share_one_blob(tmp_path):
+    payload_cache = PayloadCache(str(tmp_path))
+    first = payload_cache.store(f"{URL}/a", b'[1]', {})
+    second = payload_cache.store(f"{URL}/b", b'[1]', {})
+    assert first['digest'] == second['digest']
+    assert os.listdir(payload_cache.blobs_dir) == [first['digest'] + '.json']
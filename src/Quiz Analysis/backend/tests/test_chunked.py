@@ -0,0 +1,30 @@
+import gzip
+import json
+
+import pytest
+
+from chunked import check_against_memory, run_chunked
+
+def test_chunked_run_matches_in_memory(export_path):
+    states, progress = run_chunked(export_path, chunk_rows=7)
+    assert progress['chunks'] > 1
+    assert check_against_memory(export_path, states) == []
+
+def test_gzipped_json_array_export(tmp_path, export_path):
+    with open(export_path) as f:
+        submissions = [json.loads(line) for line in f]
+    array_path = str(tmp_path / 'export.json.gz')
+    with gzip.open(array_path, 'wt') as f:
+        json.dump(submissions, f)
+    states, progress = run_chunked(array_path, chunk_rows=5)
+    assert progress['submissions'] == len(submissions)
+    assert check_against_memory(array_path, states) == []
+
+def test_out_of_order_submissions_across_chunks_are_refused(tmp_path, export_path):
+    with open(export_path) as f:
+        lines = f.readlines()
+    # The first submission moved to the end arrives after newer ones for the same student
+    reordered = tmp_path / 'reordered.ndjson'
+    reordered.write_text(''.join(lines[1:] + lines[:1]))
+    with pytest.raises(ValueError, match='out of order'):
+        run_chunked(str(reordered), chunk_rows=7)
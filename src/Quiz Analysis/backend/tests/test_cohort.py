@@ -0,0 +1,21 @@
+from bench_cohort import per_student_insights, same_output
+from cohort import cohort_insights, cohort_topic_stats, prepare_cohort_frame
+from synthetic import generate_cohort_frame
+from utils import calculate_topic_stats
+
+# The vectorized cohort engine has to give every student what the per-student functions give them
+
+def test_cohort_engine_matches_per_student_analysis():
+    cohort_df = generate_cohort_frame(40, attempts_per_student=8, topics=5)
+    cohort_results = cohort_insights(cohort_df)
+    scalar_results = per_student_insights(cohort_df)
+    assert [s for s in scalar_results if not same_output(scalar_results[s], cohort_results[s])] == []
+
+def test_cohort_topic_stats_match_per_student():
+    cohort_df = prepare_cohort_frame(generate_cohort_frame(15, attempts_per_student=6, topics=4, seed=7))
+    topic_stats = cohort_topic_stats(cohort_df)
+    for student_id, student_df in cohort_df.groupby('student_id'):
+        expected = calculate_topic_stats(student_df.reset_index(drop=True))
+        actual = topic_stats.loc[student_id]
+        assert actual.index.astype(str).tolist() == expected.index.astype(str).tolist()
+        assert actual.reset_index(drop=True).equals(expected.reset_index(drop=True)[actual.columns])
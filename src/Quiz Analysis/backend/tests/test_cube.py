@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import cube
+from utils import add_rolling_metrics, calculate_topic_stats, clean_historical_quiz_data, process_historical_quiz_data
+
+@pytest.fixture
+def history(payloads):
+    # Every student's cleaned submissions in submitted_at order, in cohort A or B
+    submissions = [submission for _, payload in payloads for submission in payload]
+    history_df = clean_historical_quiz_data(process_historical_quiz_data(submissions))
+    history_df['cohort'] = np.where(history_df['user_id'].str[-1].astype(int) % 2, 'A', 'B')
+    return history_df
+
+def _folded(*frames):
+    folded = cube.new_cube()
+    for frame in frames:
+        cube.fold_submissions(folded, frame, cohort_key='cohort')
+    return folded
+
+def _same_cube(left, right):
+    assert left['cells'].keys() == right['cells'].keys()
+    for key, cell in left['cells'].items():
+        assert cell['count'] == right['cells'][key]['count']
+        assert cell['sum'] == pytest.approx(right['cells'][key]['sum'])
+        assert np.array_equal(cell['histogram'], right['cells'][key]['histogram'])
+    assert left['student_means'].keys() == right['student_means'].keys()
+    for key, histogram in left['student_means'].items():
+        assert np.array_equal(histogram, right['student_means'][key])
+
+def test_folding_in_parts_matches_one_fold(history):
+    half = len(history) // 2
+    _same_cube(_folded(history.iloc[:half], history.iloc[half:]), _folded(history))
+
+    # Re-folding the same export adds nothing
+    folded = _folded(history)
+    assert cube.fold_submissions(folded, history, cohort_key='cohort') == (0, len(history))
+
+def test_rollups_and_cell_stats(history):
+    folded = _folded(history)
+    for topic, rows in history.groupby('quiz_topic', observed=True):
+        everyone = cube.cell(folded, topic)
+        assert everyone['count'] == len(rows)
+        assert cube.cell_stats(everyone)['mean'] == pytest.approx(rows['accuracy'].mean())
+        assert sum(cube.cell(folded, topic, cohort=c)['count'] for c in ('A', 'B')) == len(rows)
+        weeks = [cell['count'] for (t, week, cohort), cell in folded['cells'].items()
+                 if t == str(topic) and week != cube.ALL_WEEKS and cohort == cube.ALL_COHORTS]
+        assert sum(weeks) == len(rows)
+
+def test_percentiles_rank_students_among_student_means(history):
+    folded = _folded(history)
+    means = {student_id: calculate_topic_stats(add_rolling_metrics(rows.reset_index(drop=True)))['avg_accuracy']
+             for student_id, rows in history.groupby('user_id')}
+    cohort_of = history.groupby('user_id')['cohort'].first()
+    for student_id, topic_means in means.items():
+        for cohort in (cube.ALL_COHORTS, cohort_of[student_id]):
+            comparison = cube.topic_comparison(folded, topic_means.to_frame(), cohort)
+            for topic, accuracy in topic_means.items():
+                # Brute force over the same one-percent bins, ties counted as half
+                others = [np.rint(m[topic] * 100) for s, m in means.items() if topic in m.index and (
+                    cohort == cube.ALL_COHORTS or cohort_of[s] == cohort)]
+                own = np.rint(accuracy * 100)
+                expected = 100 * (sum(o < own for o in others) + sum(o == own for o in others) / 2) / len(others)
+                assert comparison[str(topic)]['percentile'] == pytest.approx(expected)
+
+def test_cube_round_trips_through_its_file(tmp_path, history):
+    folded = _folded(history)
+    path = str(tmp_path / 'cube.json')
+    cube.save_cube(path, folded)
+    loaded = cube.load_cube(path)
+    _same_cube(loaded, folded)
+    assert loaded['students'] == folded['students']
+    assert cube.fold_submissions(loaded, history, cohort_key='cohort') == (0, len(history))
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+import requests
+
+import fetch
+from fetch import Fetcher, FetchError, FetchResponse, FixtureTransport
+
+class FlakyTransport:
+    # Fails the first `failures` requests per URL (with a status or an exception), then serves JSON
+    def __init__(self, failures, error=503):
+        self.failures = failures
+        self.error = error
+        self.calls = {}
+
+    def get(self, url, headers=None, timeout=10):
+        self.calls[url] = self.calls.get(url, 0) + 1
+        if self.calls[url] <= self.failures:
+            if isinstance(self.error, Exception):
+                raise self.error
+            return FetchResponse(self.error, {}, b'')
+        return FetchResponse(200, {}, json.dumps({'url': url}).encode())
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(fetch.time, 'sleep', delays.append)
+    return delays
+
+def test_retries_with_exponential_backoff(sleeps):
+    fetcher = Fetcher(FlakyTransport(failures=3), retries=3, backoff=0.5)
+    assert fetcher.fetch_json('https://x/a') == {'url': 'https://x/a'}
+    assert len(sleeps) == 3
+    # 0.5 * 2**attempt, jittered by 0.5-1.5x
+    for attempt, delay in enumerate(sleeps):
+        assert 0.25 * 2 ** attempt <= delay <= 0.75 * 2 ** attempt
+
+def test_gives_up_after_the_last_retry(sleeps):
+    transport = FlakyTransport(failures=10, error=requests.ConnectionError('refused'))
+    with pytest.raises(FetchError, match='giving up after 3 attempts'):
+        Fetcher(transport, retries=2).fetch('https://x/a')
+    assert transport.calls['https://x/a'] == 3
+
+def test_client_errors_are_not_retried(sleeps):
+    transport = FlakyTransport(failures=10, error=404)
+    with pytest.raises(FetchError, match='HTTP 404'):
+        Fetcher(transport, retries=3).fetch_json('https://x/a')
+    assert transport.calls['https://x/a'] == 1 and sleeps == []
+
+def test_fetch_many_collects_payloads_and_errors(tmp_path, sleeps):
+    (tmp_path / 'a.json').write_text('{"ok": 1}')
+    (tmp_path / 'bad.json').write_text('not json')
+    payloads, errors = Fetcher(FixtureTransport(str(tmp_path)), retries=0).fetch_many(
+        ['https://x/a', 'https://x/a', 'https://x/bad', 'https://x/missing'])
+    assert payloads == {'https://x/a': {'ok': 1}}
+    assert sorted(errors) == ['https://x/bad', 'https://x/missing']
+    assert 'invalid JSON' in str(errors['https://x/bad'])
@@ -0,0 +1,100 @@
+import json
+import os
+
+import pandas as pd
+
+import incremental
+import pipeline
+
+def _run(history, state_path, output_dir, check=True):
+    return pipeline.run_incremental_pipeline(history, state_path, output_dir=output_dir, check=check)
+
+def _timeline_rows(state_path):
+    with open(incremental.timeline_path(state_path)) as f:
+        return [json.loads(line) for line in f]
+
+def test_incremental_folds_match_full_recompute(tmp_path, payloads):
+    _, history = payloads[0]
+    state_path = str(tmp_path / 'state.json')
+    output_dir = str(tmp_path / 'student')
+    # check=True recomputes from the full history and raises on any difference
+    for end in (3, 6, len(history)):
+        result = _run(history[:end], state_path, output_dir)
+        assert not result['rebuilt']
+    assert incremental.load_state(state_path)['count'] == len(history)
+
+    unchanged = _run(history, state_path, output_dir, check=False)
+    assert unchanged['new_submissions'] == 0
+    assert unchanged['topic_stats'].equals(result['topic_stats'])
+
+    # A submission older than the state rebuilds the student from the full history
+    late = dict(history[0], id=history[0]['id'] + 99_999)
+    result = _run(history + [late], state_path, output_dir)
+    assert result['rebuilt']
+    assert incremental.load_state(state_path)['count'] == len(history) + 1
+    assert len(_timeline_rows(state_path)) == len(history) + 1
+
+def test_state_file_keeps_the_timeline_out(tmp_path, payloads):
+    _, history = payloads[0]
+    state_path = str(tmp_path / 'state.json')
+    _run(history[:4], state_path, str(tmp_path / 'student'))
+    result = _run(history, state_path, str(tmp_path / 'student'))
+
+    with open(state_path) as f:
+        saved = json.load(f)
+    assert 'timeline' not in saved
+    assert saved['last_submitted_raw'] == history[-1]['submitted_at']
+    assert saved['timeline_bytes'] == os.path.getsize(incremental.timeline_path(state_path))
+    assert [row[0][:10] for row in _timeline_rows(state_path)] == [
+        point['date'] for point in result['viz_data']['timelineData']]
+
+def test_rows_from_a_crashed_save_are_cut_off(tmp_path, payloads):
+    _, history = payloads[0]
+    state_path = str(tmp_path / 'state.json')
+    _run(history[:5], state_path, str(tmp_path / 'student'))
+    # The timeline append landed but the state that records it was never replaced
+    with open(incremental.timeline_path(state_path), 'a') as f:
+        f.write(json.dumps(['2025-06-01T10:00:00+05:30', 0.5, 1]) + '\n["2025-06-02')
+
+    result = _run(history, state_path, str(tmp_path / 'student'))
+    assert len(result['viz_data']['timelineData']) == len(history)
+    assert len(_timeline_rows(state_path)) == len(history)
+
+def test_version_2_states_move_their_timeline_out(tmp_path, payloads):
+    _, history = payloads[0]
+    state_path = str(tmp_path / 'state.json')
+    _run(history[:5], state_path, str(tmp_path / 'student'))
+    state = incremental.load_state(state_path)
+    state['timeline'] = _timeline_rows(state_path)
+    for key in ('timeline_bytes', 'last_submitted_raw'):
+        del state[key]
+    with open(state_path, 'w') as f:
+        json.dump(dict(state, version=2), f)
+    os.unlink(incremental.timeline_path(state_path))
+
+    result = _run(history, state_path, str(tmp_path / 'student'))
+    assert not result['rebuilt']
+    assert len(result['viz_data']['timelineData']) == len(_timeline_rows(state_path)) == len(history)
+    assert incremental.load_state(state_path)['version'] == incremental.STATE_VERSION
+
+def test_selection_parses_only_other_formats(tmp_path, payloads, monkeypatch):
+    _, history = payloads[0]
+    state_path = str(tmp_path / 'state.json')
+    _run(history[:5], state_path, str(tmp_path / 'student'))
+    state = incremental.load_state(state_path)
+
+    def no_parsing(*args, **kwargs):
+        raise AssertionError("timestamps in the watermark's format should not be parsed")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(incremental.pd, 'to_datetime', no_parsing)
+        new, older = incremental.select_new_submissions(state, history)
+    assert ([s['id'] for s in new], older) == ([s['id'] for s in history[5:]], 5)
+
+    # The same instants written in UTC go through the parser and select the same submissions
+    def in_utc(submission):
+        when = pd.Timestamp(submission['submitted_at']).tz_convert('UTC')
+        return dict(submission, submitted_at=when.strftime('%Y-%m-%dT%H:%M:%SZ'))
+
+    new, older = incremental.select_new_submissions(state, [in_utc(s) for s in history])
+    assert ([s['id'] for s in new], older) == ([s['id'] for s in history[5:]], 5)
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from item_analysis import fold_responses, item_statistics, merge_item_states, new_item_state, responses_from_submissions
+from question_bank import build_question_bank
+from synthetic import generate_quiz_payload, generate_student_payloads
+
+def _cohort():
+    _, options = build_question_bank(generate_quiz_payload(questions=10, topics=3))
+    submissions = [submission for _, payload in generate_student_payloads(30, attempts_per_student=4, topics=3)
+                   for submission in payload]
+    return options, submissions
+
+def _fold(options, submissions, chunk):
+    state = new_item_state(options)
+    for start in range(0, len(submissions), chunk):
+        fold_responses(state, responses_from_submissions(submissions[start:start + chunk]))
+    return state
+
+def _brute_force(options, submissions):
+    # One row per matched response with its correctness and the submission's rest score
+    correct = dict(zip(zip(options['question_id'], options['option_id']), options['is_correct']))
+    rows = []
+    for submission in submissions:
+        responses = [(int(q), int(o)) for q, o in submission['response_map'].items() if (int(q), int(o)) in correct]
+        score = sum(correct[response] for response in responses)
+        rows.extend({'question_id': q, 'option_id': o, 'x': float(correct[(q, o)]),
+                     'rest': float(score - correct[(q, o)])} for q, o in responses)
+    return pd.DataFrame(rows)
+
+def test_statistics_match_a_per_response_computation():
+    options, submissions = _cohort()
+    questions, option_stats, topics = item_statistics(_fold(options, submissions, chunk=len(submissions)), options)
+    responses = _brute_force(options, submissions)
+    expected = responses.groupby('question_id').agg(responses=('x', 'size'), difficulty=('x', 'mean'))
+    expected['discrimination'] = responses.groupby('question_id').apply(lambda g: g['x'].corr(g['rest']))
+    actual = questions.set_index('question_id')
+    assert actual['responses'].tolist() == expected['responses'].tolist()
+    np.testing.assert_allclose(actual['difficulty'], expected['difficulty'])
+    np.testing.assert_allclose(actual['discrimination'], expected['discrimination'])
+
+    picks = responses.groupby(['question_id', 'option_id']).size()
+    actual_picks = option_stats.set_index(['question_id', 'option_id'])['picks']
+    assert actual_picks[actual_picks > 0].to_dict() == picks.to_dict()
+    assert topics['questions'].sum() == len(questions)
+
+def test_chunks_and_worker_states_merge_to_the_same_result():
+    options, submissions = _cohort()
+    whole = _fold(options, submissions, chunk=len(submissions))
+    chunked = _fold(options, submissions, chunk=7)
+    half = len(submissions) // 2
+    merged = merge_item_states(_fold(options, submissions[:half], chunk=9), _fold(options, submissions[half:], chunk=9))
+    for state in (chunked, merged):
+        for key in ('picks', 'attempts', 'correct'):
+            assert np.array_equal(state[key], whole[key])
+        assert (state['submissions'], state['responses']) == (whole['submissions'], whole['responses'])
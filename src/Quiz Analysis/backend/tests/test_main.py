@@ -0,0 +1,41 @@
+import json
+
+import main
+from fetch import Fetcher, FixtureTransport
+from rules import DEFAULT_RULES_PATH, RuleSet, load_rules
+from synthetic import generate_historical_payload, generate_quiz_payload
+
+def _fixtures(directory):
+    # main.py's three API URLs served from <id>.json files, as --fixtures does
+    (directory / 'rJvd7g.json').write_text(json.dumps({}))
+    (directory / 'LLQT.json').write_text(json.dumps(generate_quiz_payload(topics=5)))
+    (directory / 'XgAgFJ.json').write_text(json.dumps(generate_historical_payload('u1', attempts=12, topics=5)))
+    return Fetcher(FixtureTransport(str(directory)), retries=0)
+
+def test_main_runs_end_to_end(tmp_path, monkeypatch, capsys):
+    fixtures = tmp_path / 'fixtures'
+    fixtures.mkdir()
+    monkeypatch.chdir(tmp_path)
+    main.main(_fixtures(fixtures))
+
+    report = capsys.readouterr().out
+    assert "STUDENT PERFORMANCE ANALYSIS REPORT" in report
+    assert "Strong Topics (≥70% accuracy)" in report
+    assert "Weak Topics (<60% accuracy)" in report
+    with open(tmp_path / 'frontend' / 'public' / 'data' / 'viz_data.json') as f:
+        assert json.load(f)['topicPerformance']
+    assert (tmp_path / 'output' / 'visualizations' / 'topic_performance.png').exists()
+
+def test_report_headings_follow_custom_rules(tmp_path, monkeypatch, capsys):
+    with open(DEFAULT_RULES_PATH) as f:
+        config = json.load(f)
+    config['topic_groups'][0]['when'] = [['avg_accuracy', '>=', 0.85]]
+    fixtures = tmp_path / 'fixtures'
+    fixtures.mkdir()
+    monkeypatch.chdir(tmp_path)
+    main.main(_fixtures(fixtures), rules=RuleSet(config))
+
+    report = capsys.readouterr().out
+    assert "Strong Topics (≥85% accuracy)" in report
+    assert "Strong Topics (≥70% accuracy)" not in report
+    assert load_rules().describe_group('strong') == "≥70% accuracy"
@@ -0,0 +1,32 @@
+import pandas as pd
+
+from question_bank import build_question_bank
+from synthetic import generate_quiz_payload
+from utils import create_expanded_options, process_current_quiz_data
+
+def _duplicate_texts_quiz():
+    # Both options of question 1 read "None of these"; only the second is correct.
+    # Question 2 has no option flagged correct.
+    quiz = generate_quiz_payload(questions=2, topics=2, options_per_question=2)
+    first, second = quiz['quiz']['questions']
+    for option, correct in zip(first['options'], [False, True]):
+        option.update(description='None of these', is_correct=correct)
+    for option in second['options']:
+        option['is_correct'] = False
+    return quiz
+
+def test_repeated_option_texts_are_marked_by_id():
+    expanded = create_expanded_options(process_current_quiz_data(_duplicate_texts_quiz()))
+    first = expanded[expanded['question_id'] == 1]
+    assert first['option_text'].tolist() == ['None of these', 'None of these']
+    assert first['is_correct'].tolist() == [False, True]
+    assert not expanded.loc[expanded['question_id'] == 2, 'is_correct'].any()
+
+def test_question_bank_tables():
+    questions, options = build_question_bank([_duplicate_texts_quiz(), generate_quiz_payload(questions=3, topics=2)])
+    assert len(questions) == 5 and len(options) == 2 * 2 + 3 * 4
+    assert questions['correct_option_id'].isna().tolist() == [False, True, False, False, False]
+    assert questions.loc[0, 'correct_option_id'] == options.loc[options['is_correct'], 'option_id'].iloc[0]
+    assert isinstance(questions['topic'].dtype, pd.CategoricalDtype)
+    assert options['topic'].astype(str).tolist() == [
+        topic for topic, count in zip(questions['topic'].astype(str), questions['option_count']) for _ in range(count)]
@@ -0,0 +1,51 @@
+import json
+import os
+
+import pytest
+
+import render
+from synthetic import generate_historical_payload
+from utils import (add_rolling_metrics, analyze_and_recommend, calculate_topic_stats, clean_historical_quiz_data,
+                   process_historical_quiz_data)
+from viz_export import FILE_MODE
+
+@pytest.fixture
+def analysis():
+    historical_quiz_df = add_rolling_metrics(clean_historical_quiz_data(process_historical_quiz_data(
+        generate_historical_payload('u1', attempts=10, topics=5))))
+    topic_stats = calculate_topic_stats(historical_quiz_df)
+    insights = analyze_and_recommend(historical_quiz_df, topic_stats)[0]
+    return historical_quiz_df, topic_stats, insights
+
+def test_unchanged_charts_are_skipped(tmp_path, analysis):
+    historical_quiz_df, topic_stats, insights = analysis
+    output_dir = str(tmp_path)
+    assert set(render.render_charts(*analysis, output_dir=output_dir).values()) == {'rendered'}
+    assert set(render.render_charts(*analysis, output_dir=output_dir).values()) == {'skipped'}
+
+    # Only the charts whose inputs changed are redrawn, plus any whose PNG went missing
+    os.unlink(tmp_path / 'topic_distribution.png')
+    changed = historical_quiz_df.copy()
+    changed.loc[changed.index[0], 'mistakes_corrected'] += 1
+    status = render.render_charts(changed, topic_stats, insights, output_dir=output_dir)
+    assert status == {
+        'performance_timeline': 'rendered',
+        'topic_performance': 'skipped',
+        'topic_distribution': 'rendered',
+        'learning_progress': 'rendered'
+    }
+    assert set(render.render_charts(changed, topic_stats, insights, output_dir=output_dir, force=True).values()) == {
+        'rendered'}
+
+def test_fingerprints_and_chart_data_are_written_atomically(tmp_path, analysis):
+    render.render_charts(*analysis, output_dir=str(tmp_path / 'charts'))
+    render.render_charts(*analysis, output_dir=str(tmp_path / 'data'), data_only=True)
+
+    with open(tmp_path / 'charts' / render.FINGERPRINTS_FILE) as f:
+        assert sorted(json.load(f)) == sorted(render.CHART_NAMES)
+    with open(tmp_path / 'data' / render.CHART_DATA_FILE) as f:
+        assert json.load(f) == render.chart_inputs(*analysis)
+    for path in (tmp_path / 'charts' / render.FINGERPRINTS_FILE, tmp_path / 'data' / render.CHART_DATA_FILE):
+        assert os.stat(path).st_mode & 0o777 == FILE_MODE
+    assert not [name for name in os.listdir(tmp_path / 'charts') + os.listdir(tmp_path / 'data')
+                if name.endswith('.tmp')]
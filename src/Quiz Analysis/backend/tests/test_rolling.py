@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rolling import parse_window, retained_mask, rolling_metrics, window_label, window_summary
+
+def _history(days, student_ids=None):
+    # Attempts on the given day offsets, with accuracy 0.1, 0.2, ... in attempt order
+    frame = pd.DataFrame({
+        'submitted_at': pd.Timestamp('2025-01-01T10:00:00+05:30') + pd.to_timedelta(days, unit='D'),
+        'accuracy': np.arange(1, len(days) + 1) / 10,
+        'incorrect_answers': np.arange(len(days)),
+        'mistakes_corrected': np.ones(len(days), dtype=int)
+    })
+    if student_ids is not None:
+        frame['student_id'] = student_ids
+    return frame
+
+def test_window_specs():
+    assert parse_window('5') == ('count', 5)
+    assert parse_window(' 14D') == ('time', pd.Timedelta(days=14))
+    assert [window_label(spec) for spec in ('3', '7D', '30d')] == ['last3', '7d', '30d']
+    for spec in ('0', '-1D', 'weekly'):
+        with pytest.raises(ValueError):
+            parse_window(spec)
+
+def test_count_and_time_windows():
+    history = rolling_metrics(_history([0, 1, 2, 10, 11, 40]), ['2', '7D'])
+    assert history['rolling_accuracy_last2'].round(3).tolist() == [0.1, 0.15, 0.25, 0.35, 0.45, 0.55]
+    # 7D ends at each attempt and is right-closed: day 10 only sees itself, day 11 sees days 10-11
+    assert history['rolling_accuracy_7d'].round(3).tolist() == [0.1, 0.15, 0.2, 0.4, 0.45, 0.6]
+    # The original 3-attempt columns are always there
+    assert history['rolling_accuracy'].equals(history['rolling_accuracy_last3'])
+
+def test_windows_do_not_cross_students():
+    cohort = _history([0, 1, 2, 0, 1], student_ids=['a', 'a', 'a', 'b', 'b'])
+    grouped = rolling_metrics(cohort.copy(), ['3', '7D'], student_key='student_id')
+    for student_id, rows in cohort.groupby('student_id'):
+        alone = rolling_metrics(rows.reset_index(drop=True), ['3', '7D'])
+        for column in ('rolling_accuracy_last3', 'rolling_accuracy_7d'):
+            assert grouped.loc[rows.index, column].tolist() == alone[column].tolist()
+
+def test_window_summary_and_retained_rows():
+    history = _history([0, 1, 2, 10, 11, 40])
+    summary = window_summary(history, ['2', '30D'])
+    assert summary['last2']['attempts'] == 2
+    assert summary['last2']['accuracy'] == pytest.approx(0.55)
+    # 30 days back from day 40 reaches day 11 (right-closed, left-open)
+    assert summary['30d']['attempts'] == 2
+    # Rows kept for the next fold: the last 3 attempts (ROLLING_WINDOW) and anything inside 30D
+    assert retained_mask(history, ['30D']).tolist() == [False, False, False, True, True, True]
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rules import (PERFORMANCE_LABELS, PERSONA_LABELS, RECOMMENDATION_LABELS, RuleSet, compile_predicate,
+                   group_thresholds, load_rules)
+
+def _config(**labels):
+    # Every category is required; the ones a test doesn't set get no rules
+    categories = {name: {'rules': []} for name in PERSONA_LABELS + RECOMMENDATION_LABELS + PERFORMANCE_LABELS}
+    categories.update(labels)
+    return {
+        'topic_groups': [
+            {'name': 'strong', 'insight': True, 'when': [['avg_accuracy', '>=', 0.8]]},
+            {'name': 'weak', 'insight': True, 'when': [['avg_accuracy', '<', 0.5], ['attempt_count', '>', 1]]}
+        ],
+        'labels': categories
+    }
+
+TABLE = {
+    'overall_accuracy': np.array([0.9, 0.4, 0.6]),
+    'recent_accuracy': np.array([0.95, 0.3, np.nan]),
+    'first_weak_topic': np.array([None, 'Genetics', None], dtype=object)
+}
+
+def test_conditions_compare_numbers_metrics_and_missing_values():
+    assert compile_predicate([['overall_accuracy', '>=', 0.6]])(TABLE, 3).tolist() == [True, False, True]
+    assert compile_predicate([['recent_accuracy', '>', 'overall_accuracy']])(TABLE, 3).tolist() == [
+        True, False, False]
+    assert compile_predicate([['recent_accuracy', 'missing']])(TABLE, 3).tolist() == [False, False, True]
+    assert compile_predicate([['first_weak_topic', 'exists'], ['overall_accuracy', '<', 0.5]])(TABLE, 3).tolist() == [
+        False, True, False]
+    assert compile_predicate([])(TABLE, 3).tolist() == [True, True, True]
+    with pytest.raises(ValueError, match='Invalid rule condition'):
+        compile_predicate([['overall_accuracy', '=>', 0.6]])
+    with pytest.raises(ValueError, match='unknown metric'):
+        compile_predicate([['accuracy', '>', 0.6]])(TABLE, 3)
+
+def test_rules_files_are_validated_when_compiled():
+    with pytest.raises(ValueError, match='no rules for'):
+        RuleSet({'topic_groups': [], 'labels': {}})
+    with pytest.raises(ValueError, match='unknown topic group'):
+        RuleSet(_config(priority_actions={'rules': [{'text': '{topic}', 'each_topic': 'medium'}]}))
+
+def test_rules_render_texts_per_student():
+    rules = RuleSet(_config(
+        learning_type={'first_match': True, 'rules': [
+            {'text': 'Steady', 'when': [['overall_accuracy', '>=', 0.8]]},
+            {'text': 'Developing', 'when': [['overall_accuracy', '>=', 0.5]]},
+            {'text': 'Struggling', 'when': []}
+        ]},
+        priority_actions={'rules': [
+            {'text': 'Revise {topic} (below {weak_avg_accuracy:.0%})', 'each_topic': 'weak'},
+            {'text': 'Overall {overall_accuracy:.0%}', 'when': [['recent_accuracy', 'exists']]}
+        ]}
+    ))
+    topic_lists = {'weak': [[], ['Genetics', 'Ecology'], []], 'strong': [['Cells'], [], []]}
+    labels = rules.evaluate(TABLE, 3, topic_lists)
+    assert labels['learning_type'] == [['Steady'], ['Struggling'], ['Developing']]
+    assert labels['priority_actions'] == [
+        ['Overall 90%'],
+        ['Revise Genetics (below 50%)', 'Revise Ecology (below 50%)', 'Overall 40%'],
+        []
+    ]
+
+def test_topic_groups_and_thresholds():
+    rules = RuleSet(_config())
+    topic_stats = pd.DataFrame({'avg_accuracy': [0.9, 0.45, 0.3], 'attempt_count': [3, 2, 1]},
+                               index=pd.Index(['Cells', 'Genetics', 'Ecology'], name='quiz_topic'))
+    masks = rules.topic_masks(topic_stats)
+    assert masks['strong'].tolist() == [True, False, False]
+    assert masks['weak'].tolist() == [False, True, False]
+    assert rules.thresholds == {'strong_avg_accuracy': 0.8, 'weak_avg_accuracy': 0.5, 'weak_attempt_count': 1}
+    assert rules.describe_group('weak') == '<50% accuracy, attempt_count > 1'
+    # A column compared twice in one group has no single threshold to quote
+    assert group_thresholds([{'name': 'mid', 'when': [['avg_accuracy', '>', 0.5], ['avg_accuracy', '<', 0.7]]}]) == {}
+
+def test_default_rules_file_compiles():
+    rules = load_rules()
+    assert rules is load_rules()
+    assert rules.describe_group('strong') == '≥70% accuracy'
+    assert set(rules.categories) >= set(PERSONA_LABELS + RECOMMENDATION_LABELS + PERFORMANCE_LABELS)
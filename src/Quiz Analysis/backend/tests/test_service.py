@@ -0,0 +1,62 @@
+import json
+import threading
+import urllib.request
+from urllib.parse import quote
+
+import pytest
+
+from service import AnalysisService, serve
+
+STUDENT_ID = '7A/Zoë Roy'
+
+@pytest.fixture
+def service(tmp_path, manifest):
+    roster = {STUDENT_ID: dict(manifest[0], student_id=STUDENT_ID)}
+    service = AnalysisService(roster, output_root=str(tmp_path / 'service'), workers=1)
+    server = serve(service, port=0, verbose=False)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    service.url = f"http://127.0.0.1:{server.server_address[1]}/students/{quote(STUDENT_ID, safe='')}"
+    yield service
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+def _request(url, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    with urllib.request.urlopen(urllib.request.Request(url, data=data)) as response:
+        return response.status, response.headers.get('X-Cache'), json.loads(response.read())
+
+def _next_submission(history_path):
+    with open(history_path) as f:
+        history = json.load(f)
+    latest = max(history, key=lambda submission: submission['submitted_at'])
+    return history, dict(latest, id=latest['id'] + 1, submitted_at='2030-01-01T10:00:00.000+05:30')
+
+def test_results_are_cached_until_submissions_arrive(service):
+    status, cache, viz_data = _request(service.url + '/viz_data')
+    assert (status, cache) == (200, 'MISS')
+    assert _request(service.url + '/viz_data')[1] == 'HIT'
+
+    _, submission = _next_submission(service.roster[STUDENT_ID]['historical'])
+    status, _, body = _request(service.url + '/submissions', submission)
+    assert (status, body) == (202, {'student_id': STUDENT_ID, 'pending_submissions': 1})
+
+    status, cache, updated = _request(service.url + '/viz_data')
+    assert cache == 'MISS'
+    assert len(updated['timelineData']) == len(viz_data['timelineData']) + 1
+    assert updated['timelineData'][-1]['date'] == '2030-01-01'
+
+def test_pending_submissions_dropped_once_upstream_has_them(service):
+    history_path = service.roster[STUDENT_ID]['historical']
+    history, submission = _next_submission(history_path)
+    service.add_submissions(STUDENT_ID, [submission])
+    service.viz_data(STUDENT_ID)
+    assert service.health()['pending_submissions'] == 1
+
+    with open(history_path, 'w') as f:
+        json.dump(history + [submission], f)
+    service.results.invalidate(STUDENT_ID)
+    viz_data, _ = service.viz_data(STUDENT_ID)
+    assert service.pending == {}
+    assert viz_data['timelineData'][-1]['date'] == '2030-01-01'
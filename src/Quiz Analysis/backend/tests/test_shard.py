@@ -0,0 +1,54 @@
+import gzip
+import json
+import os
+
+import pandas as pd
+
+import batch
+import shard
+
+def _viz_data(root, student_id):
+    with open(os.path.join(root, student_id, 'viz_data.json')) as f:
+        return json.load(f)
+
+def test_shard_merge_matches_single_run(tmp_path, manifest):
+    options = {'render_charts': False, 'topic_stats': True}
+    single_root = str(tmp_path / 'single')
+    assert batch.run_batch(manifest, single_root, workers=1, analysis_options=options)['failed'] == 0
+
+    shard_root = str(tmp_path / 'shards')
+    for index in range(3):
+        shard.run_shard(manifest, shard_root, index, 3, workers=1, analysis_options=options)
+
+    # An interrupted shard (checkpoint cut mid-line) resumes with only the missing students
+    checkpoint = os.path.join(shard.shard_dir(shard_root, 0, 3), shard.CHECKPOINT_FILE)
+    with open(checkpoint) as f:
+        lines = f.readlines()
+    with open(checkpoint, 'w') as f:
+        f.writelines(lines[:1] + [lines[1][:10]])
+    summary = shard.run_shard(manifest, shard_root, 0, 3, workers=1, analysis_options=options)
+    assert summary['resumed'] == 1
+    assert summary['report']['students'] == summary['students'] - 1
+    assert all(p['completed'] == p['students'] for p in shard.shard_progress(manifest, shard_root, 3))
+
+    report, topics = shard.merge_shards(manifest, shard_root, 3)
+    assert report['merged'] == len(manifest)
+    with gzip.open(report['viz_data_path'], 'rt') as f:
+        merged = [json.loads(line) for line in f]
+    for record in merged:
+        student_id = record.pop('student_id')
+        assert record == _viz_data(single_root, student_id)
+
+    topic_stats = pd.concat(pd.read_json(os.path.join(single_root, entry['student_id'], 'topic_stats.json'))
+                            for entry in manifest)
+    expected = topic_stats.groupby('quiz_topic').agg(students=('attempt_count', 'size'),
+                                                      attempts=('attempt_count', 'sum'),
+                                                      total_mistakes_corrected=('total_mistakes_corrected', 'sum'))
+    actual = pd.DataFrame(topics).set_index('quiz_topic')[expected.columns].sort_index()
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_names=False)
+
+def test_every_student_lands_in_exactly_one_shard(manifest):
+    assigned = [entry['student_id'] for index in range(4) for entry in shard.shard_entries(manifest, index, 4)]
+    assert sorted(assigned) == sorted(entry['student_id'] for entry in manifest)
+    # Independent of manifest order, so every machine computes the same partition
+    assert shard.shard_entries(manifest[::-1], 2, 4) == shard.shard_entries(manifest, 2, 4)[::-1]
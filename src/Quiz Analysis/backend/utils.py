@@ -1,229 +1,132 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import json
+import numpy as np
 import os
+from question_bank import flatten_quizzes, correct_option_ids, correct_option_texts, option_dicts
+from cube import ALL_COHORTS, topic_comparison
+from render import render_charts
+from schema import normalize_history
+from rules import SUMMARY_METRICS, load_rules, student_table
+from rolling import DEFAULT_WINDOWS, RECENT_WINDOW, rolling_metrics, window_label, window_summary
+from viz_export import build_viz_data, timeline_records, topic_records, write_json
 
 def process_current_quiz_data(current_quiz_endpoint_data):
-    current_quiz_questions = []
-    for question in current_quiz_endpoint_data["quiz"]["questions"]:
-        current_quiz_questions.append({
-            "question_id": question["id"],
-            "topic": question["topic"],
-            "description": question["description"],
-            "options": {option["id"]: option["description"] for option in question["options"]},
-            "correct_option": next(option["description"] for option in question["options"] if option["is_correct"])
+    flat = flatten_quizzes(current_quiz_endpoint_data)
+    return pd.DataFrame({
+        "question_id": flat["question_id"],
+        "topic": pd.Categorical(flat["topic"]),
+        "description": flat["description"],
+        "options": option_dicts(flat),
+        "correct_option": correct_option_texts(flat),
+        "correct_option_id": correct_option_ids(flat)
+    })
+
+def process_historical_quiz_data(historical_quiz_data):
+    historical_quiz_rows = []
+    for submission in historical_quiz_data:
+        historical_quiz_rows.append({
+            "submission_id": submission["id"],
+            "user_id": submission["user_id"],
+            "quiz_id": submission["quiz_id"],
+            "quiz_topic": submission["quiz"]["topic"],
+            "submitted_at": submission["submitted_at"],
+            "score": submission["score"],
+            "accuracy": submission["accuracy"],
+            "final_score": submission["final_score"],
+            "correct_answers": submission["correct_answers"],
+            "incorrect_answers": submission["incorrect_answers"],
+            "mistakes_corrected": submission["mistakes_corrected"],
+            "duration": submission["duration"]
         })
-    return pd.DataFrame(current_quiz_questions)
+    historical_quiz_df = pd.DataFrame(historical_quiz_rows)
+    historical_quiz_df['submitted_at'] = pd.to_datetime(historical_quiz_df['submitted_at'])
+    return historical_quiz_df.sort_values('submitted_at').reset_index(drop=True)
+
+def clean_historical_quiz_data(historical_quiz_df, normalize=True):
+    historical_quiz_df['accuracy'] = historical_quiz_df['accuracy'].str.rstrip(' %').astype(float) / 100
+    historical_quiz_df['final_score'] = pd.to_numeric(historical_quiz_df['final_score'])
+    # Compact dtypes (categorical topics, duration in seconds, small-int counts; see schema.py)
+    return normalize_history(historical_quiz_df) if normalize else historical_quiz_df
+
+def add_rolling_metrics(historical_quiz_df, windows=DEFAULT_WINDOWS):
+    # rolling_accuracy/rolling_mistakes (last 3 attempts) plus one pair of columns per window (see rolling.py)
+    historical_quiz_df = rolling_metrics(historical_quiz_df, windows)
+    historical_quiz_df['improvement_rate'] = historical_quiz_df['accuracy'].diff()
+    return historical_quiz_df
 
-def prepare_visualization_data(historical_quiz_df, insights, topic_stats, recommendations, persona, performance_labels):
-    viz_data = {
-        'timelineData': [
-            {
-                'date': row['submitted_at'].strftime('%Y-%m-%d'),
-                'accuracy': float(round(row['accuracy'] * 100, 2)),
-                'mistakesCorrected': int(row['mistakes_corrected'])
-            } for _, row in historical_quiz_df.iterrows()
-        ],
-        'topicPerformance': [
-            {
-                'name': str(topic),
-                'accuracy': float(round(stats['avg_accuracy'] * 100, 2))
-            } for topic, stats in topic_stats.iterrows()
-        ],
-        'insights': {
-            'trending': {
-                'recent_accuracy': float(insights['trending']['recent_accuracy']),
-                'overall_accuracy': float(insights['trending']['overall_accuracy']),
-                'improvement': bool(insights['trending']['improvement'])
-            },
-            'topics': {
-                'strong': list(insights['topics']['strong']),
-                'weak': list(insights['topics']['weak']),
-                'needs_practice': list(insights['topics']['needs_practice'])
-            },
-            'learning': {
-                'mistake_correction_rate': float(insights['learning']['mistake_correction_rate']),
-                'recent_corrections': float(insights['learning']['recent_corrections'])
-            }
-        },
-        'recommendations': {
-            'priority_actions': list(recommendations['priority_actions']),
-            'study_strategy': list(recommendations['study_strategy']),
-            'next_steps': list(recommendations['next_steps'])
-        },
-        'persona': {
-            'learning_type': str(persona['learning_type']),
-            'key_traits': list(persona['key_traits']),
-            'learning_style': list(persona['learning_style'])
-        },
-        'performance_labels': {
-            'strengths': list(performance_labels['strengths']),
-            'challenges': list(performance_labels['challenges'])
-        }
-    }
-    
-    os.makedirs('frontend/public/data', exist_ok=True)
-    with open('frontend/public/data/viz_data.json', 'w') as f:
-        json.dump(viz_data, f, default=str)
-        
 def create_expanded_options(current_quiz_df):
-    option_rows = []
-    for _, row in current_quiz_df.iterrows():
-        question_id = row['question_id']
-        topic = row['topic']
-        options_dict = row['options']
-        correct_answer = row['correct_option']
-        
-        for option_id, option_text in options_dict.items():
-            option_rows.append({
-                'question_id': question_id,
-                'topic': topic,
-                'option_id': option_id,
-                'option_text': option_text,
-                'is_correct': option_text == correct_answer
-            })
-    
-    return pd.DataFrame(option_rows)
-
-def generate_strength_labels(insights, topic_stats):
-    strengths = []
-    
-    # Check topic mastery
-    strong_topics = topic_stats[topic_stats['avg_accuracy'] >= 0.7]
-    if not strong_topics.empty:
-        top_topic = strong_topics.index[0]
-        strengths.append(f"Master of {top_topic} ({strong_topics['avg_accuracy'].iloc[0]*100:.1f}% accuracy)")
-    
-    # Check improvement trend
-    if insights['trending']['improvement']:
-        strengths.append("Consistent Improver")
-    
-    # Check mistake correction pattern
-    if insights['learning']['recent_corrections'] > insights['learning']['mistake_correction_rate']:
-        strengths.append("Effective at Learning from Mistakes")
-    
-    # Check attempt consistency
-    high_attempt_topics = topic_stats[topic_stats['attempt_count'] > 2].index.tolist()
-    if high_attempt_topics:
-        strengths.append(f"Dedicated Practice in {high_attempt_topics[0]}")
-    
-    return strengths
-
-def generate_challenge_labels(insights, topic_stats):
-    challenges = []
-    
-    # Check weak topics
-    weak_topics = topic_stats[topic_stats['avg_accuracy'] < 0.6]
-    if not weak_topics.empty:
-        weakest_topic = weak_topics.index[0]
-        challenges.append(f"Needs Focus on {weakest_topic} ({weak_topics['avg_accuracy'].iloc[0]*100:.1f}% accuracy)")
-    
-    # Check practice needs
-    low_attempt_topics = topic_stats[topic_stats['attempt_count'] == 1].index.tolist()
-    if low_attempt_topics:
-        challenges.append(f"More Practice Needed in {low_attempt_topics[0]}")
-    
-    # Check mistake patterns
-    if insights['learning']['recent_corrections'] < insights['learning']['mistake_correction_rate']:
-        challenges.append("Room for Improvement in Mistake Correction")
-    
-    return challenges
+    # One row per option; correctness compares option ids, so repeated option texts can't be marked correct
+    counts = current_quiz_df['options'].map(len).to_numpy()
+    option_ids = np.array([option_id for options in current_quiz_df['options'] for option_id in options])
+    correct_option_ids = np.repeat(current_quiz_df['correct_option_id'].fillna(-1).to_numpy(np.int64), counts)
+    return pd.DataFrame({
+        'question_id': np.repeat(current_quiz_df['question_id'].to_numpy(), counts),
+        'topic': current_quiz_df['topic'].repeat(counts).reset_index(drop=True),
+        'option_id': option_ids,
+        'option_text': [option_text for options in current_quiz_df['options'] for option_text in options.values()],
+        'is_correct': option_ids == correct_option_ids
+    })
 
-def define_student_persona(insights, historical_quiz_df):
-    # Calculate key metrics for persona definition
-    performance_stability = historical_quiz_df['accuracy'].std()
-    mistake_improvement = (insights['learning']['recent_corrections'] / 
-                         insights['learning']['mistake_correction_rate'] 
-                         if insights['learning']['mistake_correction_rate'] > 0 else 0)
-    
-    # Define persona characteristics
-    persona = {
-        'learning_type': '',
-        'key_traits': [],
-        'learning_style': []
+def _insight_labels(insights, rules, topic_stats=None, accuracy_std=np.nan):
+    # Evaluates the label rules for one student from an insights dict; without topic_stats the
+    # topic groups are taken from insights['topics']
+    summary = {
+        'overall_accuracy': [insights['trending']['overall_accuracy']],
+        'recent_accuracy': [insights['trending']['recent_accuracy']],
+        'mistake_correction_rate': [insights['learning']['mistake_correction_rate']],
+        'recent_corrections': [insights['learning']['recent_corrections']],
+        'accuracy_std': [accuracy_std]
     }
-    
-    # Determine Learning Type
-    if insights['trending']['improvement'] and mistake_improvement > 1:
-        persona['learning_type'] = "Active Improver"
-    elif insights['trending']['improvement'] and mistake_improvement <= 1:
-        persona['learning_type'] = "Steady Performer"
-    elif not insights['trending']['improvement'] and mistake_improvement > 1:
-        persona['learning_type'] = "Recovery Learner"
+    if topic_stats is not None:
+        topic_groups = rules.student_topic_groups(topic_stats)
     else:
-        persona['learning_type'] = "Needs Support"
-        
-    # Identify Key Traits
-    if len(insights['topics']['strong']) >= 2:
-        persona['key_traits'].append("Topic Master")
-    if performance_stability < 0.15:  # Low variation in performance
-        persona['key_traits'].append("Consistent Performer")
-    if mistake_improvement > 1.2:
-        persona['key_traits'].append("Quick Learner from Mistakes")
-        
-    # Define Learning Style
-    if historical_quiz_df['mistakes_corrected'].mean() > 5:
-        persona['learning_style'].append("Reflective Learner")
-    if insights['trending']['recent_accuracy'] > 0.8:
-        persona['learning_style'].append("High Achiever")
-    if performance_stability > 0.25:  # High variation
-        persona['learning_style'].append("Experimental Learner")
-        
-    return persona
-
-def analyze_and_recommend(historical_quiz_df, topic_stats):
-    # Generate Core Insights
-    insights = {
-        'trending': {
-            'recent_accuracy': historical_quiz_df.tail(3)['accuracy'].mean(),
-            'overall_accuracy': historical_quiz_df['accuracy'].mean(),
-            'improvement': historical_quiz_df.tail(3)['accuracy'].mean() > historical_quiz_df['accuracy'].mean()
-        },
-        'topics': {
-            'strong': topic_stats[topic_stats['avg_accuracy'] >= 0.7].index.tolist(),
-            'weak': topic_stats[topic_stats['avg_accuracy'] < 0.6].index.tolist(),
-            'needs_practice': topic_stats[topic_stats['attempt_count'] == 1].index.tolist()
-        },
-        'learning': {
-            'mistake_correction_rate': historical_quiz_df['mistakes_corrected'].mean(),
-            'recent_corrections': historical_quiz_df.tail(3)['mistakes_corrected'].mean()
-        }
+        topic_groups = {group['name']: ([list(insights['topics'].get(group['name'], []))], [np.nan])
+                        for group in rules.topic_groups}
+    return rules.evaluate(student_table(summary, {}, topic_groups), 1,
+                          {name: lists for name, (lists, _) in topic_groups.items()})
+
+def generate_strength_labels(insights, topic_stats, rules=None):
+    return _insight_labels(insights, rules or load_rules(), topic_stats)['strengths'][0]
+
+def generate_challenge_labels(insights, topic_stats, rules=None):
+    return _insight_labels(insights, rules or load_rules(), topic_stats)['challenges'][0]
+
+def define_student_persona(insights, historical_quiz_df, rules=None):
+    return persona_from_insights(insights, historical_quiz_df['accuracy'].std(), rules)
+
+def persona_from_insights(insights, performance_stability, rules=None):
+    labels = _insight_labels(insights, rules or load_rules(), accuracy_std=performance_stability)
+    return {
+        'learning_type': labels['learning_type'][0][0] if labels['learning_type'][0] else '',
+        'key_traits': labels['key_traits'][0],
+        'learning_style': labels['learning_style'][0]
     }
 
-    # Generate Recommendations
-    recommendations = {
-        'priority_actions': [],
-        'study_strategy': [],
-        'next_steps': []
+def summarize_history(historical_quiz_df, windows=DEFAULT_WINDOWS):
+    recent = window_summary(historical_quiz_df, [RECENT_WINDOW])[window_label(RECENT_WINDOW)]
+    return {
+        'overall_accuracy': historical_quiz_df['accuracy'].mean(),
+        'recent_accuracy': recent['accuracy'],
+        'mistake_correction_rate': historical_quiz_df['mistakes_corrected'].mean(),
+        'recent_corrections': recent['corrections'],
+        'accuracy_std': historical_quiz_df['accuracy'].std(),
+        'windows': window_summary(historical_quiz_df, windows)
     }
 
-    for topic in insights['topics']['weak']:
-        recommendations['priority_actions'].append(f"Prioritize {topic} - Performance below 60%")
-
-    if insights['trending']['improvement']:
-        recommendations['study_strategy'].append(
-            f"Maintain current approach - Accuracy improved from {insights['trending']['overall_accuracy']:.1%} to {insights['trending']['recent_accuracy']:.1%}")
-    else:
-        recommendations['study_strategy'].append(
-            f"Revise study approach - Recent accuracy ({insights['trending']['recent_accuracy']:.1%}) below overall ({insights['trending']['overall_accuracy']:.1%})")
-
-    for topic in insights['topics']['needs_practice']:
-        recommendations['next_steps'].append(f"Take more quizzes in {topic} to build mastery")
+def analyze_and_recommend(historical_quiz_df, topic_stats, windows=DEFAULT_WINDOWS, rules=None):
+    return recommend_from_summary(summarize_history(historical_quiz_df, windows), topic_stats, rules)
 
-    # Add persona analysis
-    persona = define_student_persona(insights, historical_quiz_df)
-    
-    # Add creative labels for strengths and weaknesses
-    performance_labels = {
-        'strengths': generate_strength_labels(insights, topic_stats),
-        'challenges': generate_challenge_labels(insights, topic_stats)
-    }
-    
-    return insights, recommendations, persona, performance_labels
+def recommend_from_summary(summary, topic_stats, rules=None):
+    # Insights, recommendations, persona and labels come from the rules file (see rules.py),
+    # evaluated on a one-student table exactly as the cohort engine evaluates whole cohorts
+    rules = rules or load_rules()
+    topic_groups = rules.student_topic_groups(topic_stats)
+    windows = {label: {metric: [value] for metric, value in metrics.items()}
+               for label, metrics in summary['windows'].items()}
+    table = student_table({name: [summary[name]] for name in SUMMARY_METRICS}, windows, topic_groups)
+    return next(rules.student_outputs(table, 1, [summary['windows']], topic_groups))
 
 def calculate_topic_stats(historical_quiz_df):
-    topic_stats = historical_quiz_df.groupby('quiz_topic').agg({
+    topic_stats = historical_quiz_df.groupby('quiz_topic', observed=True).agg({
         'accuracy': ['mean', 'count'],
         'mistakes_corrected': ['sum', 'mean'],
         'improvement_rate': 'mean'
@@ -232,191 +135,33 @@ def calculate_topic_stats(historical_quiz_df):
     topic_stats.columns = ['avg_accuracy', 'attempt_count', 'total_mistakes_corrected', 
                           'avg_mistakes_corrected', 'avg_improvement']
     
-    return topic_stats.sort_values('avg_accuracy', ascending=False)
-
-def prepare_visualization_data(historical_quiz_df, insights, topic_stats, recommendations, persona, performance_labels):
-    viz_data = {
-        'timelineData': [
-            {
-                'date': row['submitted_at'].strftime('%Y-%m-%d'),
-                'accuracy': float(round(row['accuracy'] * 100, 2)),
-                'mistakesCorrected': int(row['mistakes_corrected'])
-            } for _, row in historical_quiz_df.iterrows()
-        ],
-        'topicPerformance': [
-            {
-                'name': str(topic),
-                'accuracy': float(round(stats['avg_accuracy'] * 100, 2))
-            } for topic, stats in topic_stats.iterrows()
-        ],
-        'insights': {
-            'trending': {
-                'recent_accuracy': float(insights['trending']['recent_accuracy']),
-                'overall_accuracy': float(insights['trending']['overall_accuracy']),
-                'improvement': bool(insights['trending']['improvement'])
-            },
-            'topics': {
-                'strong': list(insights['topics']['strong']),
-                'weak': list(insights['topics']['weak']),
-                'needs_practice': list(insights['topics']['needs_practice'])
-            },
-            'learning': {
-                'mistake_correction_rate': float(insights['learning']['mistake_correction_rate']),
-                'recent_corrections': float(insights['learning']['recent_corrections'])
-            }
-        },
-        'recommendations': {
-            'priority_actions': list(recommendations['priority_actions']),
-            'study_strategy': list(recommendations['study_strategy']),
-            'next_steps': list(recommendations['next_steps'])
-        },
-        'persona': {
-            'learning_type': str(persona['learning_type']),
-            'key_traits': list(persona['key_traits']),
-            'learning_style': list(persona['learning_style'])
-        },
-        'performance_labels': {
-            'strengths': list(performance_labels['strengths']),
-            'challenges': list(performance_labels['challenges'])
-        }
-    }
-    
-    os.makedirs('frontend/public/data', exist_ok=True)
-    with open('frontend/public/data/viz_data.json', 'w') as f:
-        json.dump(viz_data, f, default=str)
-
-def create_visualizations(historical_quiz_df, topic_stats, insights):
-    os.makedirs('output/visualizations', exist_ok=True)
-    
-    # Set consistent theme and color palette
-    sns.set_theme(style="whitegrid", palette="viridis")
-    plt.rcParams['figure.figsize'] = [12, 6]
-    plt.rcParams['savefig.dpi'] = 300
-    plt.rcParams['font.size'] = 10
-    
-    # Color definitions
-    COLORS = {
-        'strong': '#4CAF50',  # Green
-        'weak': '#FF5722',    # Red
-        'neutral': '#FFC107', # Yellow
-        'accent': '#2196F3'   # Blue
-    }
-    
-    # 1. Performance Timeline
-    plt.figure()
-    # Convert accuracy to percentage
-    accuracy_data = historical_quiz_df['accuracy'] * 100
-    
-    # Create dual axis plot
-    fig, ax1 = plt.subplots(figsize=(12, 6))
-    
-    # Plot accuracy
-    ax1.set_xlabel('Date')
-    ax1.set_ylabel('Accuracy (%)', color=COLORS['strong'])
-    line1 = ax1.plot(historical_quiz_df['submitted_at'], accuracy_data, 
-                     color=COLORS['strong'], marker='o', label='Accuracy')
-    ax1.tick_params(axis='y', labelcolor=COLORS['strong'])
-    
-    # Create second axis for mistakes
-    ax2 = ax1.twinx()
-    ax2.set_ylabel('Mistakes Corrected', color=COLORS['accent'])
-    line2 = ax2.plot(historical_quiz_df['submitted_at'], 
-                     historical_quiz_df['mistakes_corrected'],
-                     color=COLORS['accent'], marker='s', label='Mistakes Corrected')
-    ax2.tick_params(axis='y', labelcolor=COLORS['accent'])
-    
-    # Combine legends
-    lines = line1 + line2
-    labels = [l.get_label() for l in lines]
-    ax1.legend(lines, labels, loc='upper left')
-    
-    plt.title('Performance Timeline', pad=20, size=14)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig('output/visualizations/performance_timeline.png')
-    plt.close()
-
-    # 2. Topic Performance
-    plt.figure()
-    topic_data = topic_stats.reset_index()
-    # Remove duplicates by averaging
-    topic_data = topic_data.groupby('quiz_topic').agg({
-        'avg_accuracy': 'mean'
-    }).reset_index()
-    
-    # Sort by accuracy
-    topic_data = topic_data.sort_values('avg_accuracy', ascending=True)
-    
-    colors = [COLORS['strong'] if x >= 0.7 else COLORS['weak'] if x < 0.6 
-              else COLORS['neutral'] for x in topic_data['avg_accuracy']]
-    
-    bars = plt.barh(topic_data['quiz_topic'], topic_data['avg_accuracy'] * 100, 
-                    color=colors)
-    
-    # Add value labels on bars
-    for bar in bars:
-        width = bar.get_width()
-        plt.text(width, bar.get_y() + bar.get_height()/2, 
-                f'{width:.1f}%', 
-                va='center', ha='left', fontweight='bold')
-    
-    plt.title('Topic Performance Analysis', pad=20, size=14)
-    plt.xlabel('Accuracy (%)')
-    plt.ylabel('Topics')
-    plt.grid(True, alpha=0.3, axis='x')
-    plt.tight_layout()
-    plt.savefig('output/visualizations/topic_performance.png')
-    plt.close()
+    return topic_stats.sort_values('avg_accuracy', ascending=False, kind='stable')
 
-    # 3. Topic Distribution
-    plt.figure()
-    # Remove duplicates from counts
-    strong_topics = len(set(insights['topics']['strong']))
-    weak_topics = len(set(insights['topics']['weak']))
-    needs_practice = len(set(insights['topics']['needs_practice']))
-    
-    labels = ['Strong Topics', 'Weak Topics', 'Needs Practice']
-    sizes = [strong_topics, weak_topics, needs_practice]
-    colors = [COLORS['strong'], COLORS['weak'], COLORS['neutral']]
-    
-    plt.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%', 
-            startangle=90, explode=(0.05, 0.05, 0.05))
-    plt.title('Topic Distribution', pad=20, size=14)
-    plt.axis('equal')
-    plt.savefig('output/visualizations/topic_distribution.png')
-    plt.close()
+def prepare_visualization_data(historical_quiz_df, insights, topic_stats, recommendations, persona, performance_labels,
+                               output_path='frontend/public/data/viz_data.json', cube=None, cohort=ALL_COHORTS):
+    # With a cohort cube (see cube.py), topicPerformance also gets each topic's cohort percentile
+    comparison = topic_comparison(cube, topic_stats, cohort) if cube else None
+    viz_data = build_viz_data(timeline_records(historical_quiz_df), topic_records(topic_stats, comparison),
+                              insights, recommendations, persona, performance_labels)
+    write_json(output_path, viz_data)
+    return viz_data
 
-    # 4. Learning Progress Heatmap
-    plt.figure(figsize=(10, 6))
-    progress_data = pd.DataFrame({
-        'Metric': ['Accuracy (%)', 'Mistakes Corrected', 'Time (minutes)'],
-        'Initial': [
-            historical_quiz_df['accuracy'].iloc[0] * 100,
-            historical_quiz_df['mistakes_corrected'].iloc[0],
-            pd.to_numeric(historical_quiz_df['duration'].iloc[0].split(':')[0])
-        ],
-        'Middle': [
-            historical_quiz_df['accuracy'].iloc[len(historical_quiz_df)//2] * 100,
-            historical_quiz_df['mistakes_corrected'].iloc[len(historical_quiz_df)//2],
-            pd.to_numeric(historical_quiz_df['duration'].iloc[len(historical_quiz_df)//2].split(':')[0])
-        ],
-        'Recent': [
-            historical_quiz_df['accuracy'].iloc[-1] * 100,
-            historical_quiz_df['mistakes_corrected'].iloc[-1],
-            pd.to_numeric(historical_quiz_df['duration'].iloc[-1].split(':')[0])
-        ]
-    })
-    progress_data = progress_data.set_index('Metric')
+def create_visualizations(historical_quiz_df, topic_stats, insights, output_dir='output/visualizations', verbose=True,
+                          workers=None):
+    # Charts are drawn by render.py with the object-oriented Agg API, in parallel worker
+    # processes, skipping any chart whose input data is unchanged since the last render
+    status = render_charts(historical_quiz_df, topic_stats, insights, output_dir=output_dir,
+                           workers=workers or min(4, os.cpu_count() or 1))
 
-    sns.heatmap(progress_data, annot=True, cmap='RdYlGn', center=None,
-                fmt='.1f', cbar_kws={'label': 'Value'})
-    plt.title('Learning Progress Analysis', pad=20, size=14)
-    plt.tight_layout()
-    plt.savefig('output/visualizations/learning_progress.png')
-    plt.close()
+    if not verbose:
+        return status
 
-    print("\nEnhanced visualizations have been saved to 'output/visualizations/' directory:")
+    print(f"\nEnhanced visualizations have been saved to '{output_dir}/' directory:")
     print("1. performance_timeline.png - Interactive timeline with dual axis")
     print("2. topic_performance.png - Horizontal bar chart with value labels")
     print("3. topic_distribution.png - Exploded pie chart with percentages")
-    print("4. learning_progress.png - Enhanced heatmap with better color scaling")
\ No newline at end of file
+    print("4. learning_progress.png - Enhanced heatmap with better color scaling")
+    skipped = [name for name, state in status.items() if state == 'skipped']
+    if skipped:
+        print(f"(unchanged since the last run, not re-rendered: {', '.join(skipped)})")
+    return status
\ No newline at end of file
@@ -0,0 +1,202 @@
+import argparse
+import gzip
+import io
+import json
+import os
+import tempfile
+
+import numpy as np
+
+def timeline_records(historical_quiz_df):
+    # Column-wise equivalent of iterating rows: format, scale and round whole columns, then zip
+    dates = historical_quiz_df['submitted_at'].dt.strftime('%Y-%m-%d').tolist()
+    accuracy = (historical_quiz_df['accuracy'] * 100).round(2).astype(float).tolist()
+    mistakes = historical_quiz_df['mistakes_corrected'].astype(int).tolist()
+    return [
+        {'date': date, 'accuracy': acc, 'mistakesCorrected': mistake}
+        for date, acc, mistake in zip(dates, accuracy, mistakes)
+    ]
+
+def topic_records(topic_stats, comparison=None):
+    # comparison ({topic: {'percentile', 'cohort_accuracy'}}, see cube.topic_comparison) adds the
+    # student's percentile within the cohort and the cohort's accuracy to each topic it covers
+    names = [str(topic) for topic in topic_stats.index]
+    accuracy = (topic_stats['avg_accuracy'] * 100).round(2).astype(float).tolist()
+    records = [{'name': name, 'accuracy': acc} for name, acc in zip(names, accuracy)]
+    for record in records if comparison else []:
+        if record['name'] in comparison:
+            record['cohortPercentile'] = round(comparison[record['name']]['percentile'], 1)
+            record['cohortAccuracy'] = round(comparison[record['name']]['cohort_accuracy'] * 100, 2)
+    return records
+
+def build_viz_data(timeline, topic_performance, insights, recommendations, persona, performance_labels):
+    return {
+        'timelineData': timeline,
+        'topicPerformance': topic_performance,
+        'insights': {
+            'trending': {
+                'recent_accuracy': float(insights['trending']['recent_accuracy']),
+                'overall_accuracy': float(insights['trending']['overall_accuracy']),
+                'improvement': bool(insights['trending']['improvement'])
+            },
+            'topics': {
+                'strong': list(insights['topics']['strong']),
+                'weak': list(insights['topics']['weak']),
+                'needs_practice': list(insights['topics']['needs_practice'])
+            },
+            'learning': {
+                'mistake_correction_rate': float(insights['learning']['mistake_correction_rate']),
+                'recent_corrections': float(insights['learning']['recent_corrections'])
+            }
+        },
+        'recommendations': {
+            'priority_actions': list(recommendations['priority_actions']),
+            'study_strategy': list(recommendations['study_strategy']),
+            'next_steps': list(recommendations['next_steps'])
+        },
+        'persona': {
+            'learning_type': str(persona['learning_type']),
+            'key_traits': list(persona['key_traits']),
+            'learning_style': list(persona['learning_style'])
+        },
+        'performance_labels': {
+            'strengths': list(performance_labels['strengths']),
+            'challenges': list(performance_labels['challenges'])
+        }
+    }
+
+def _umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+# Modes plain open()/makedirs would give; mkstemp's 0600 (and mkdtemp's 0700) would make files
+# renamed into place unreadable to e.g. a web server serving viz_data.json as another user
+UMASK = _umask()
+FILE_MODE = 0o666 & ~UMASK
+DIR_MODE = 0o777 & ~UMASK
+
+def temp_file(directory, prefix=''):
+    # mkstemp in the target directory (so os.replace stays atomic) with FILE_MODE permissions
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=prefix, suffix='.tmp')
+    os.fchmod(fd, FILE_MODE)
+    return fd, tmp_path
+
+class AtomicWriter:
+    # Writes to a temp file in the target directory and renames it into place on success,
+    # so readers (e.g. the dashboard polling viz_data.json) only ever see complete files.
+    # Paths ending in .gz are gzip-compressed.
+    def __init__(self, path):
+        self.path = path
+        self.compress = path.endswith('.gz')
+
+    def __enter__(self):
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, self.tmp_path = temp_file(directory, prefix='.' + os.path.basename(self.path))
+        self.raw = os.fdopen(fd, 'wb')
+        self.file = gzip.open(self.raw, 'wt', encoding='utf-8') if self.compress else io.TextIOWrapper(self.raw, encoding='utf-8')
+        return self.file
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self.compress:
+                self.file.close()  # writes the gzip trailer but leaves self.raw open
+            else:
+                self.file.flush()
+            if exc_type is None:
+                self.raw.flush()
+                os.fsync(self.raw.fileno())
+        finally:
+            self.file.close()
+            self.raw.close()
+        if exc_type is None:
+            os.replace(self.tmp_path, self.path)
+        else:
+            os.unlink(self.tmp_path)
+        return False
+
+def write_json(path, data):
+    # json.dump encodes incrementally into the file rather than building one big string
+    with AtomicWriter(path) as f:
+        json.dump(data, f, default=str)
+
+def write_ndjson(path, records):
+    # One JSON document per line from any iterable, so a whole cohort never sits in memory
+    count = 0
+    with AtomicWriter(path) as f:
+        for record in records:
+            json.dump(record, f, default=str)
+            f.write('\n')
+            count += 1
+    return count
+
+def write_json_array(path, records):
+    count = 0
+    with AtomicWriter(path) as f:
+        f.write('[')
+        for record in records:
+            if count:
+                f.write(', ')
+            json.dump(record, f, default=str)
+            count += 1
+        f.write(']')
+    return count
+
+def cohort_viz_records(cohort_df, rules=None):
+    # Yields {'student_id': ..., **viz_data} per student using the vectorized cohort engine
+    from cohort import prepare_cohort_frame, cohort_topic_stats, insights_from_topic_stats
+    cohort_df = prepare_cohort_frame(cohort_df)
+    topic_stats = cohort_topic_stats(cohort_df)
+    results = insights_from_topic_stats(cohort_df, topic_stats, rules=rules)
+
+    timeline = timeline_records(cohort_df)
+    student_ids = cohort_df['student_id'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, student_ids[1:] != student_ids[:-1]])
+    ends = np.r_[starts[1:], len(student_ids)]
+
+    topics = topic_records(topic_stats.droplevel('student_id'))
+    topic_students = topic_stats.index.get_level_values('student_id').to_numpy()
+    topic_starts = np.flatnonzero(np.r_[True, topic_students[1:] != topic_students[:-1]])
+    topic_bounds = dict(zip(topic_students[topic_starts], zip(topic_starts, np.r_[topic_starts[1:], len(topics)])))
+
+    for start, end in zip(starts, ends):
+        student_id = student_ids[start]
+        topic_start, topic_end = topic_bounds[student_id]
+        viz_data = build_viz_data(timeline[start:end], topics[topic_start:topic_end], *results[student_id])
+        yield dict({'student_id': str(student_id)}, **viz_data)
+
+def main():
+    # Cohort export from the Parquet store, a bounded group of students at a time
+    import pandas as pd
+    from batch import load_manifest
+    from rules import load_rules
+    from storage import DEFAULT_STORE_DIR, load_student_history
+
+    parser = argparse.ArgumentParser(description="Export viz_data for a whole cohort as one streamed file")
+    parser.add_argument('manifest', help="JSON or CSV manifest with student_id")
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR, help="Parquet store written by storage.py")
+    parser.add_argument('--output', default='output/cohort_viz_data.ndjson.gz',
+                        help="Output path: .ndjson for one student per line, .json for an array, add .gz to compress")
+    parser.add_argument('--group-size', type=int, default=5000, help="Students analyzed together per group")
+    parser.add_argument('--rules', help="Rules file for personas, labels and recommendations (default: rules.json)")
+    args = parser.parse_args()
+
+    rules = load_rules(args.rules)
+    student_ids = [str(entry['student_id']) for entry in load_manifest(args.manifest)]
+
+    def records():
+        for offset in range(0, len(student_ids), args.group_size):
+            frames = []
+            for student_id in student_ids[offset:offset + args.group_size]:
+                frame = load_student_history(args.store, student_id)
+                frame['student_id'] = student_id
+                frames.append(frame)
+            yield from cohort_viz_records(pd.concat(frames, ignore_index=True), rules)
+
+    writer = write_json_array if args.output.endswith(('.json', '.json.gz')) else write_ndjson
+    count = writer(args.output, records())
+    print(f"Wrote viz_data for {count} students to {args.output}")
+
+if __name__ == "__main__":
+    main()
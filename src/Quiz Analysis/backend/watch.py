@@ -0,0 +1,327 @@
+import argparse
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import batch
+from viz_export import AtomicWriter
+
+DEFAULT_OUTPUT_DIR = 'output/watch'
+# Same state directory as batch.py --incremental, so the watcher continues from a batch run's states
+DEFAULT_STATE_DIR = 'output/state'
+PROCESSED_DIR = '.processed'
+METRICS_FILE = 'watch_metrics.json'
+PROMETHEUS_FILE = 'watch_metrics.prom'
+# Freshness quantiles exported as metrics, over the most recent MAX_LATENCIES submissions
+QUANTILES = [0.5, 0.95, 0.99]
+MAX_LATENCIES = 10_000
+
+def _refresh(student_id, submissions, output_root, options):
+    # Runs in a warm worker (see batch._init_worker): folds the new submissions into the student's
+    # incremental state, then re-derives topic stats, insights and viz_data from the aggregates.
+    # Without a state the aggregates would hold only the new submissions, so an existing
+    # viz_data.json (e.g. from a full batch run) is never replaced from them.
+    from rolling import DEFAULT_WINDOWS
+    from rules import load_rules
+    pipeline = batch._pipeline
+    state_path = os.path.join(options['state_dir'], f"{student_id}.json")
+    student_dir = os.path.join(output_root, student_id)
+    if not os.path.exists(state_path) and os.path.exists(os.path.join(student_dir, 'viz_data.json')):
+        raise ValueError(f"no incremental state at {state_path} for the existing viz_data.json; run "
+                         f"batch.py --incremental with --state-dir {options['state_dir']} first")
+    result = pipeline.run_incremental_pipeline(
+        submissions, state_path, output_dir=student_dir,
+        windows=options.get('windows') or DEFAULT_WINDOWS, rules=load_rules(options.get('rules_path')),
+        full_history=False)
+    return result['new_submissions'], result['skipped_submissions']
+
+def _submissions(data):
+    # A drop file or log line holds one submission or a list of them
+    return data if isinstance(data, list) else [data]
+
+# Sources are checkpointed whenever the watcher is idle and no student has given up retrying, i.e.
+# everything read so far has been folded; after a restart anything read since is read again, and
+# the incremental states skip the submissions they already hold.
+
+class DropDirSource:
+    # Picks up *.json (a submission or a list) and *.ndjson files dropped into a directory and
+    # moves them into .processed/ at checkpoints. Writers should drop files atomically (write
+    # elsewhere or to a dot-file, then rename). A file's landing time is its modification time.
+    def __init__(self, directory):
+        self.directory = directory
+        self.read = []
+        os.makedirs(os.path.join(directory, PROCESSED_DIR), exist_ok=True)
+
+    def poll(self):
+        events = []
+        for entry in sorted(os.scandir(self.directory), key=lambda e: (e.stat().st_mtime, e.name)):
+            if not entry.is_file() or entry.name.startswith('.') or not entry.name.endswith(('.json', '.ndjson')):
+                continue
+            if entry.name in self.read:
+                continue
+            landed_at = entry.stat().st_mtime
+            try:
+                with open(entry.path) as f:
+                    if entry.name.endswith('.ndjson'):
+                        records = [json.loads(line) for line in f if line.strip()]
+                    else:
+                        records = _submissions(json.load(f))
+                events.extend((submission, landed_at) for record in records for submission in _submissions(record))
+            except ValueError as e:
+                print(f"Skipping {entry.name}: {e}")
+            self.read.append(entry.name)
+        return events
+
+    def checkpoint(self):
+        for name in self.read:
+            os.replace(os.path.join(self.directory, name), os.path.join(self.directory, PROCESSED_DIR, name))
+        self.read = []
+
+class AppendLogSource:
+    # Tails an NDJSON log standing in for the submission API: each poll reads the complete lines
+    # appended since the last one. A submission lands when the poll reads it. The byte offset
+    # is checkpointed to offset_path so a restarted watcher resumes where it left off.
+    def __init__(self, path, offset_path=None, from_end=False):
+        self.path = path
+        self.offset_path = offset_path
+        self.offset = 0
+        if from_end and os.path.exists(path):
+            self.offset = os.path.getsize(path)
+        elif offset_path and os.path.exists(offset_path):
+            with open(offset_path) as f:
+                self.offset = json.load(f)['offset']
+
+    def poll(self):
+        if not os.path.exists(self.path):
+            return []
+        if os.path.getsize(self.path) < self.offset:
+            self.offset = 0  # truncated or rotated
+        landed_at = time.time()
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read()
+        complete = data[:data.rfind(b'\n') + 1]
+        self.offset += len(complete)
+        events = []
+        for line in filter(str.strip, complete.decode().splitlines()):
+            try:
+                events.extend((submission, landed_at) for submission in _submissions(json.loads(line)))
+            except ValueError as e:
+                print(f"Skipping log line: {e}")
+        return events
+
+    def checkpoint(self):
+        if self.offset_path:
+            with AtomicWriter(self.offset_path) as f:
+                json.dump({'path': os.path.abspath(self.path), 'offset': self.offset}, f)
+
+class Watcher:
+    # Coalesces submissions per student and re-analyzes a student once no new submission has
+    # arrived for `debounce` seconds (or `max_delay` after the first one, so a busy student still
+    # refreshes). At most `queue_size` refreshes are in flight; a student has at most one, and
+    # submissions arriving meanwhile wait for the next. A failed refresh keeps its submissions and
+    # is retried with exponential backoff; after max_retries the student is parked in `failed` until
+    # new submissions arrive for them, and the sources are not checkpointed past their submissions.
+    def __init__(self, sources, output_root=DEFAULT_OUTPUT_DIR, workers=1, queue_size=None, debounce=2.0,
+                 max_delay=30.0, student_key='user_id', analysis_options=None, verbose=True, max_retries=5,
+                 retry_backoff=2.0):
+        self.sources = sources
+        self.output_root = output_root
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.student_key = student_key
+        self.options = dict(analysis_options or {})
+        self.options.setdefault('state_dir', DEFAULT_STATE_DIR)
+        self.queue_size = queue_size or 2 * workers
+        self.verbose = verbose
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.pending = {}
+        self.in_flight = {}
+        self.failed = {}
+        self.latencies = []
+        self.counters = {'events': 0, 'refreshes': 0, 'submissions_folded': 0, 'submissions_skipped': 0, 'failures': 0}
+        self.started_at = time.time()
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=batch._init_worker, initargs=({},))
+
+    def add(self, events):
+        now = time.time()
+        for submission, landed_at in events:
+            student_id = str(submission[self.student_key])
+            if student_id in self.failed:
+                # New submissions give a parked student another round of retries
+                self.pending[student_id] = dict(self.failed.pop(student_id), attempts=0, retry_at=0.0)
+            pending = self.pending.setdefault(student_id, {'submissions': [], 'landed_at': [], 'first_seen': now})
+            pending['submissions'].append(submission)
+            pending['landed_at'].append(landed_at)
+            pending['last_seen'] = now
+        self.counters['events'] += len(events)
+
+    def ready(self, now):
+        # Students due for a refresh, longest-waiting first
+        due = [student_id for student_id, pending in self.pending.items()
+               if student_id not in self.in_flight and now >= pending.get('retry_at', 0.0)
+               and (now - pending['last_seen'] >= self.debounce or now - pending['first_seen'] >= self.max_delay)]
+        return sorted(due, key=lambda student_id: self.pending[student_id]['first_seen'])
+
+    def dispatch(self, now):
+        for student_id in self.ready(now)[:max(0, self.queue_size - len(self.in_flight))]:
+            pending = self.pending.pop(student_id)
+            future = self.executor.submit(_refresh, student_id, pending['submissions'], self.output_root, self.options)
+            self.in_flight[student_id] = (future, pending)
+
+    def collect(self):
+        finished = False
+        for student_id, (future, pending) in list(self.in_flight.items()):
+            if not future.done():
+                continue
+            del self.in_flight[student_id]
+            finished = True
+            done_at = time.time()
+            try:
+                folded, skipped = future.result()
+            except Exception as e:
+                self.counters['failures'] += 1
+                self.retry(student_id, pending, f"{type(e).__name__}: {e}")
+                continue
+            self.counters['refreshes'] += 1
+            self.counters['submissions_folded'] += folded
+            self.counters['submissions_skipped'] += skipped
+            latencies = [done_at - landed_at for landed_at in pending['landed_at']]
+            self.latencies = (self.latencies + latencies)[-MAX_LATENCIES:]
+            if self.verbose:
+                print(f"• {student_id}: {len(pending['submissions'])} submissions ({folded} new) "
+                      f"fresh after {max(latencies):.2f}s")
+            if skipped:
+                # Re-read after a restart, or late: batch.py --incremental rebuilds states with late submissions
+                print(f"  ! {student_id}: {skipped} submissions not newer than the state were skipped; if they "
+                      f"arrived late, rerun batch.py --incremental to rebuild the student from the full history")
+        if finished:
+            self.write_metrics()
+
+    def retry(self, student_id, pending, error):
+        # Puts a failed refresh's submissions back in front of any that arrived while it ran
+        attempts = pending.get('attempts', 0) + 1
+        newer = self.pending.pop(student_id, None)
+        if newer:
+            pending = dict(pending, submissions=pending['submissions'] + newer['submissions'],
+                           landed_at=pending['landed_at'] + newer['landed_at'], last_seen=newer['last_seen'])
+        pending = dict(pending, attempts=attempts, error=error)
+        if attempts >= self.max_retries:
+            self.failed[student_id] = pending
+            print(f"Error refreshing {student_id}: {error}; giving up after {attempts} attempts "
+                  f"({len(pending['submissions'])} submissions kept until new ones arrive)")
+            return
+        delay = self.retry_backoff * 2 ** (attempts - 1)
+        self.pending[student_id] = dict(pending, retry_at=time.time() + delay)
+        print(f"Error refreshing {student_id}: {error}; retrying in {delay:.1f}s")
+
+    def step(self):
+        for source in self.sources:
+            self.add(source.poll())
+        self.dispatch(time.time())
+        self.collect()
+        if self.idle() and not self.failed:
+            for source in self.sources:
+                source.checkpoint()
+
+    def idle(self):
+        return not self.pending and not self.in_flight
+
+    def run(self, poll_interval=0.5, once=False):
+        # once: stop after everything already in the sources has been refreshed
+        try:
+            while True:
+                self.step()
+                if once and self.idle():
+                    break
+                time.sleep(poll_interval)
+        finally:
+            self.executor.shutdown(cancel_futures=True)
+            self.write_metrics()
+
+    def metrics(self):
+        freshness = {}
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            freshness = {f"p{round(q * 100)}": ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+            freshness.update(mean=statistics.fmean(ordered), max=ordered[-1], samples=len(ordered))
+        return dict(self.counters, pending_students=len(self.pending), in_flight=len(self.in_flight),
+                    failed_students=len(self.failed),
+                    uptime_seconds=round(time.time() - self.started_at, 3), freshness_seconds=freshness)
+
+    def write_metrics(self):
+        metrics = self.metrics()
+        with AtomicWriter(os.path.join(self.output_root, METRICS_FILE)) as f:
+            json.dump(metrics, f, indent=2)
+        with AtomicWriter(os.path.join(self.output_root, PROMETHEUS_FILE)) as f:
+            f.write(prometheus_text(metrics))
+
+def prometheus_text(metrics, prefix='quiz_watch'):
+    # Freshness (submission landing to refreshed viz_data) as a summary, plus counters and gauges
+    lines = [f"# HELP {prefix}_freshness_seconds Seconds from a submission landing to its refreshed viz_data",
+             f"# TYPE {prefix}_freshness_seconds summary"]
+    freshness = metrics['freshness_seconds']
+    for q in QUANTILES if freshness else []:
+        lines.append(f'{prefix}_freshness_seconds{{quantile="{q}"}} {freshness[f"p{round(q * 100)}"]}')
+    if freshness:
+        lines.append(f"{prefix}_freshness_seconds_count {freshness['samples']}")
+        lines.append(f"{prefix}_freshness_seconds_sum {freshness['mean'] * freshness['samples']}")
+    for name in ['events', 'refreshes', 'submissions_folded', 'submissions_skipped', 'failures']:
+        lines.append(f"# TYPE {prefix}_{name}_total counter")
+        lines.append(f"{prefix}_{name}_total {metrics[name]}")
+    for name in ['pending_students', 'in_flight', 'failed_students']:
+        lines.append(f"# TYPE {prefix}_{name} gauge")
+        lines.append(f"{prefix}_{name} {metrics[name]}")
+    return '\n'.join(lines) + '\n'
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-analyze students as new submissions land in a drop directory "
+                                                 "or an NDJSON append log")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--drop-dir', help="Directory new submission files (.json/.ndjson) are dropped into")
+    source.add_argument('--log', help="NDJSON append log of submissions, tailed from the last checkpoint (or the start)")
+    parser.add_argument('--from-end', action='store_true', help="With --log, skip submissions already in the log")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help="Root directory for per-student outputs")
+    parser.add_argument('--state-dir', default=DEFAULT_STATE_DIR, help="Per-student incremental state directory")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes")
+    parser.add_argument('--queue-size', type=int, help="Refreshes in flight at once (default: 2 per worker)")
+    parser.add_argument('--debounce', type=float, default=2.0, help="Quiet seconds before a student is re-analyzed")
+    parser.add_argument('--max-delay', type=float, default=30.0,
+                        help="Re-analyze a student at most this long after their first pending submission")
+    parser.add_argument('--poll-interval', type=float, default=0.5, help="Seconds between polls of the source")
+    parser.add_argument('--student-key', default='user_id', help="Submission field identifying the student")
+    parser.add_argument('--windows', nargs='+', help="Rolling/trend windows: attempt counts or durations (default: 3 7D 30D)")
+    parser.add_argument('--rules', help="Rules file for personas, labels and recommendations (default: rules.json)")
+    parser.add_argument('--max-retries', type=int, default=5,
+                        help="Attempts before a failing student is parked until new submissions arrive")
+    parser.add_argument('--retry-backoff', type=float, default=2.0, help="Seconds before the first retry, doubling after")
+    parser.add_argument('--once', action='store_true', help="Exit once everything already landed is refreshed")
+    parser.add_argument('--quiet', action='store_true', help="Don't log each refresh")
+    args = parser.parse_args()
+
+    if args.drop_dir:
+        sources = [DropDirSource(args.drop_dir)]
+    else:
+        sources = [AppendLogSource(args.log, os.path.join(args.state_dir, 'log_offset.json'), args.from_end)]
+    watcher = Watcher(sources, output_root=args.output_dir, workers=args.workers, queue_size=args.queue_size,
+                      debounce=args.debounce, max_delay=args.max_delay, student_key=args.student_key,
+                      analysis_options={'state_dir': args.state_dir, 'windows': args.windows, 'rules_path': args.rules},
+                      verbose=not args.quiet, max_retries=args.max_retries, retry_backoff=args.retry_backoff)
+    print(f"Watching {args.drop_dir or args.log} -> {args.output_dir}")
+    try:
+        watcher.run(args.poll_interval, once=args.once)
+    except KeyboardInterrupt:
+        pass
+    metrics = watcher.metrics()
+    freshness = metrics['freshness_seconds']
+    print(f"Refreshed {metrics['refreshes']} times for {metrics['events']} submissions"
+          + (f"; freshness p50 {freshness['p50']:.2f}s, p95 {freshness['p95']:.2f}s" if freshness else ""))
+    if watcher.failed:
+        print(f"{len(watcher.failed)} students failed; their submissions stay in the source until refreshed: "
+              + ", ".join(sorted(watcher.failed)[:10]))
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,14 @@ import {
   RadarChart, PolarGrid, PolarAngleAxis, Radar
 } from 'recharts';
 
-const StudentDashboard = () => {
+const StudentDashboard = ({ studentId }) => {
   const [dashboardData, setDashboardData] = useState(null);
   const COLORS = ['#4CAF50', '#2196F3', '#FFC107', '#FF5722', '#9C27B0'];
 
   useEffect(() => {
-    fetch('/data/viz_data.json')
+    // With a studentId, results come from the analysis service (backend/service.py)
+    const url = studentId ? `/students/${encodeURIComponent(studentId)}/viz_data` : '/data/viz_data.json';
+    fetch(url)
       .then(response => {
         if (!response.ok) {
           throw new Error('Network response was not ok');
@@ -22,7 +24,7 @@ const StudentDashboard = () => {
         setDashboardData(data);
       })
       .catch(error => console.error('Error fetching data:', error));
-  }, []);
+  }, [studentId]);
 
   if (!dashboardData) {
     return <div>Loading...</div>;